@@ -21,15 +21,103 @@ def create_app():
     login_manager.init_app(app)
     migrate.init_app(app, db)
     
+    # Shared blockchain connection (connects lazily on first use)
+    from app.services.blockchain_service import BlockchainService
+    app.extensions['blockchain_service'] = BlockchainService(
+        ganache_url=os.environ.get('GANACHE_URL', 'http://127.0.0.1:7545'),
+        read_batch_size=int(os.environ.get('CHAIN_READ_BATCH_SIZE', 100))
+    )
+    
+    # Mirrors FileVerificationContract events into SQL for the file views
+    from app.services.chain_indexer import ChainIndexer
+    app.extensions['chain_indexer'] = ChainIndexer(app.extensions['blockchain_service'])
+    
+    # Anchoring mode: buffer file hashes and write one Merkle root per window
+    from app.services.merkle_anchor_service import MerkleAnchorService
+    app.config['FILE_ANCHOR_MODE'] = os.environ.get('FILE_ANCHOR_MODE', 'file')  # 'file' or 'merkle'
+    app.extensions['merkle_anchor_service'] = MerkleAnchorService(
+        app.extensions['blockchain_service'],
+        max_leaves=int(os.environ.get('MERKLE_ANCHOR_MAX_LEAVES', 1000)),
+        window_seconds=int(os.environ.get('MERKLE_ANCHOR_WINDOW_SECONDS', 300))
+    )
+    
+    # Content-addressed storage for uploaded files (static/uploads/blobs)
+    from app.services.blob_store import BlobStore
+    app.extensions['blob_store'] = BlobStore()
+    
+    # Thumbnail and preview renditions of lab scans (static/uploads/thumbs)
+    from app.services.thumbnail_service import ThumbnailService
+    app.extensions['thumbnail_service'] = ThumbnailService(
+        max_disk_bytes=int(os.environ.get('THUMBNAIL_CACHE_MB', 512)) * 1024 * 1024,
+        max_memory_bytes=int(os.environ.get('THUMBNAIL_MEMORY_MB', 32)) * 1024 * 1024
+    )
+    
+    # Background stage of file uploads (IPFS add, pin and chain write)
+    from app.services.upload_queue import UploadQueue
+    app.extensions['upload_queue'] = UploadQueue(workers=int(os.environ.get('UPLOAD_WORKERS', 4)))
+    
+    # Retinal classification model, loaded once per process and hot-reloaded on change
+    from app.services.model_registry import RetinalModelRegistry
+    app.extensions['retinal_model_registry'] = RetinalModelRegistry(
+        os.path.join(app.root_path, 'models', 'model.pkl'),
+        check_interval=float(os.environ.get('RETINAL_MODEL_CHECK_INTERVAL', 2))
+    )
+    # Optional perceptual-hash index (model.phash) for near-duplicate scans
+    from app.services.perceptual_index import PerceptualIndex, perceptual_path_for
+    app.extensions['retinal_phash_registry'] = RetinalModelRegistry(
+        perceptual_path_for(app.extensions['retinal_model_registry'].model_path),
+        check_interval=float(os.environ.get('RETINAL_MODEL_CHECK_INTERVAL', 2)),
+        loader=PerceptualIndex.load,
+        required=False
+    )
+    # Optional image classifier (model.classifier.npz) for scans no hash matches
+    from app.services.retinal_engine import RetinalClassifierEngine, SoftmaxClassifier, classifier_path_for
+    app.extensions['retinal_engine'] = RetinalClassifierEngine(
+        RetinalModelRegistry(
+            classifier_path_for(app.extensions['retinal_model_registry'].model_path),
+            check_interval=float(os.environ.get('RETINAL_MODEL_CHECK_INTERVAL', 2)),
+            loader=SoftmaxClassifier.load,
+            required=False
+        ),
+        max_batch=int(os.environ.get('RETINAL_ENGINE_MAX_BATCH', 32)),
+        max_wait=float(os.environ.get('RETINAL_ENGINE_MAX_WAIT_MS', 5)) / 1000,
+        # Below this softmax probability the classifier gives no diagnosis
+        min_confidence=float(os.environ.get('RETINAL_ENGINE_MIN_CONFIDENCE', 0.6))
+    )
+    app.config['RETINAL_PHASH_MAX_DISTANCE'] = int(os.environ.get('RETINAL_PHASH_MAX_DISTANCE', 8))
+    app.config['LAB_DETECT_WORKERS'] = int(os.environ.get('LAB_DETECT_WORKERS', 4))
+    app.config['LAB_DETECT_MAX_IMAGES'] = int(os.environ.get('LAB_DETECT_MAX_IMAGES', 1000))
+    app.config['LIST_PAGE_SIZE'] = int(os.environ.get('LIST_PAGE_SIZE', 25))  # rows per page on list views
+    app.config['BULK_VERIFY_MAX_WORKERS'] = int(os.environ.get('BULK_VERIFY_MAX_WORKERS', 32))  # hashing threads per bulk verification
+    
+    # Lab patient/doctor directory pages, dropped whenever a profile or user changes
+    from app.services.query_cache import QueryCache
+    from app.models import User, Patient, Doctor
+    app.extensions['lab_directory_cache'] = QueryCache(
+        ttl=int(os.environ.get('LAB_DIRECTORY_CACHE_SECONDS', 60))
+    ).watch(User, Patient, Doctor)
+    
+    # Logged-in users and their role profiles, shared across a user's requests
+    from app.models import Lab
+    app.extensions['identity_cache'] = QueryCache(
+        ttl=int(os.environ.get('IDENTITY_CACHE_SECONDS', 30))
+    ).watch(User, Patient, Doctor, Lab)
+    
+    # Admin dashboard figures from daily buckets kept current on commit
+    from app.services.statistics import StatisticsService
+    app.extensions['statistics_service'] = StatisticsService(
+        max_age=int(os.environ.get('STATS_CACHE_SECONDS', 30))
+    )
+    
     # Configure login manager
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     
-    # User loader for Flask-Login
+    # User loader for Flask-Login: the user and its role profile in one query
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import User
-        return User.query.get(int(user_id))
+        from app.services.identity import load_user_with_profile
+        return load_user_with_profile(user_id)
     
     # Register blueprints
     from app.routes.main import main_bp
@@ -52,6 +140,15 @@ def create_app():
     with app.app_context():
         db.create_all()
     
+    # Pick up upload jobs left unfinished by a previous run
+    app.extensions['upload_queue'].resume(app)
+    
+    # Optionally keep the chain indexer running in the background
+    if os.environ.get('CHAIN_INDEXER_ENABLED') == '1':
+        app.extensions['chain_indexer'].start(app)
+    if app.config['FILE_ANCHOR_MODE'] == 'merkle':
+        app.extensions['merkle_anchor_service'].start(app)
+    
     # Add custom Jinja2 filters
     @app.template_filter('datetime')
     def datetime_filter(timestamp):
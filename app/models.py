@@ -9,7 +9,7 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(120), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'patient', 'doctor', 'admin', 'lab'
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def set_password(self, password):
@@ -20,7 +20,7 @@ class User(UserMixin, db.Model):
 
 class Patient(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     date_of_birth = db.Column(db.Date, nullable=False)
@@ -31,7 +31,7 @@ class Patient(db.Model):
     blood_group = db.Column(db.String(5), nullable=True)
     allergies = db.Column(db.Text, nullable=True)
     medical_history = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = db.relationship('User', backref='patient_profile')
@@ -41,7 +41,7 @@ class Patient(db.Model):
 
 class Doctor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     specialization = db.Column(db.String(100), nullable=False)
@@ -52,7 +52,7 @@ class Doctor(db.Model):
     education = db.Column(db.Text, nullable=False)
     consultation_fee = db.Column(db.Float, default=0.0)
     is_available = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = db.relationship('User', backref='doctor_profile')
@@ -62,7 +62,7 @@ class Doctor(db.Model):
 
 class Lab(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     lab_name = db.Column(db.String(100), nullable=False)
     license_number = db.Column(db.String(50), unique=True, nullable=False)
     phone = db.Column(db.String(15), nullable=False)
@@ -91,6 +91,14 @@ class Consultation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_consultation_doctor_date', 'doctor_id', 'date'),
+        db.Index('ix_consultation_doctor_status', 'doctor_id', 'status'),
+        db.Index('ix_consultation_doctor_patient', 'doctor_id', 'patient_id'),
+        db.Index('ix_consultation_patient_date', 'patient_id', 'date'),
+        db.Index('ix_consultation_date', 'date'),
+    )
+
 class LabReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
@@ -106,11 +114,17 @@ class LabReport(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, completed, delivered
     amount_charged = db.Column(db.Float, default=1000.0)
     is_paid = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     consultation = db.relationship('Consultation', backref='lab_reports')
 
+    __table_args__ = (
+        db.Index('ix_lab_report_lab_status', 'lab_id', 'status'),
+        db.Index('ix_lab_report_lab_created', 'lab_id', 'created_at'),
+        db.Index('ix_lab_report_patient_created', 'patient_id', 'created_at'),
+    )
+
 class Prescription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
@@ -128,6 +142,10 @@ class Prescription(db.Model):
 
     consultation = db.relationship('Consultation', backref='prescriptions')
 
+    __table_args__ = (
+        db.Index('ix_prescription_patient_date', 'patient_id', 'prescribed_date'),
+    )
+
 class MedicalRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
@@ -136,10 +154,15 @@ class MedicalRecord(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     date = db.Column(db.Date, default=datetime.utcnow().date)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     patient = db.relationship('Patient', backref='medical_records')
 
+    __table_args__ = (
+        db.Index('ix_medical_record_patient_created', 'patient_id', 'created_at'),
+        db.Index('ix_medical_record_created', 'created_at'),
+    )
+
 class LabRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
@@ -154,11 +177,269 @@ class LabRequest(db.Model):
     completed_date = db.Column(db.Date, nullable=True)
     lab_report_id = db.Column(db.Integer, db.ForeignKey('lab_report.id'), nullable=True)
     notes = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     patient = db.relationship('Patient', backref='lab_requests')
     doctor = db.relationship('Doctor', backref='lab_requests')
     lab = db.relationship('Lab', backref='lab_requests')
     consultation = db.relationship('Consultation', backref='lab_requests')
-    lab_report = db.relationship('LabReport', backref='lab_request') 
\ No newline at end of file
+    lab_report = db.relationship('LabReport', backref='lab_request') 
+
+    __table_args__ = (
+        db.Index('ix_lab_request_lab_created', 'lab_id', 'created_at'),
+        db.Index('ix_lab_request_patient_created', 'patient_id', 'created_at'),
+    )
+
+class ChainFileRecord(db.Model):
+    """Local projection of a FileVerificationContract file record, maintained by the chain indexer"""
+    id = db.Column(db.Integer, primary_key=True)
+    contract_address = db.Column(db.String(42), nullable=False)
+    file_id = db.Column(db.Integer, nullable=False)
+    file_name = db.Column(db.String(255), nullable=False)
+    file_hash = db.Column(db.String(64), nullable=False)
+    ipfs_hash = db.Column(db.String(100), nullable=True)
+    file_type = db.Column(db.String(20), nullable=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    uploaded_by = db.Column(db.String(42), nullable=False)
+    patient_address = db.Column(db.String(42), nullable=True)
+    timestamp = db.Column(db.Integer, nullable=True)  # block timestamp (unix)
+    is_valid = db.Column(db.Boolean, default=True)
+    file_metadata = db.Column(db.Text, nullable=True)  # JSON string as stored on chain
+    block_number = db.Column(db.Integer, nullable=False)
+    transaction_hash = db.Column(db.String(66), nullable=False)
+    invalidated_block = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('contract_address', 'file_id', name='uq_chain_file_record'),
+        db.Index('ix_chain_file_record_uploader', 'contract_address', 'uploaded_by', 'file_id'),
+        db.Index('ix_chain_file_record_hash', 'contract_address', 'file_hash', 'file_id'),
+    )
+
+    def to_dict(self):
+        """Same shape as BlockchainService.get_file_record"""
+        return {
+            "file_id": self.file_id,
+            "file_name": self.file_name,
+            "file_hash": self.file_hash,
+            "ipfs_hash": self.ipfs_hash,
+            "file_type": self.file_type,
+            "file_size": self.file_size,
+            "uploaded_by": self.uploaded_by,
+            "patient_id": self.patient_address,
+            "timestamp": self.timestamp,
+            "is_valid": self.is_valid,
+            "metadata": self.file_metadata
+        }
+
+class ChainVerificationLog(db.Model):
+    """Local copy of FileVerificationContract verification logs, indexed from FileVerified events"""
+    id = db.Column(db.Integer, primary_key=True)
+    contract_address = db.Column(db.String(42), nullable=False)
+    log_id = db.Column(db.Integer, nullable=False)
+    file_id = db.Column(db.Integer, nullable=False)
+    original_hash = db.Column(db.String(64), nullable=True)
+    verified_hash = db.Column(db.String(64), nullable=True)
+    is_match = db.Column(db.Boolean, nullable=False)
+    verified_by = db.Column(db.String(42), nullable=False)
+    timestamp = db.Column(db.Integer, nullable=True)  # block timestamp (unix)
+    notes = db.Column(db.Text, nullable=True)
+    block_number = db.Column(db.Integer, nullable=False)
+    transaction_hash = db.Column(db.String(66), nullable=False)
+    log_index = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('contract_address', 'log_id', name='uq_chain_verification_log'),
+        db.Index('ix_chain_verification_log_file', 'contract_address', 'file_id', 'log_id'),
+    )
+
+    def to_dict(self):
+        return {
+            "log_id": self.log_id,
+            "file_id": self.file_id,
+            "original_hash": self.original_hash,
+            "verified_hash": self.verified_hash,
+            "is_match": self.is_match,
+            "verified_by": self.verified_by,
+            "timestamp": self.timestamp,
+            "notes": self.notes
+        }
+
+class ChainSyncCursor(db.Model):
+    """Last block scanned for a named event stream, so chain indexing can resume incrementally"""
+    name = db.Column(db.String(150), primary_key=True)
+    last_block = db.Column(db.Integer, nullable=False, default=-1)
+    block_hash = db.Column(db.String(66), nullable=True)  # hash of last_block, used to detect reorgs
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MerkleAnchor(db.Model):
+    """Merkle root anchored on chain for a window of file hashes"""
+    id = db.Column(db.Integer, primary_key=True)
+    contract_address = db.Column(db.String(42), nullable=False)
+    anchor_id = db.Column(db.Integer, nullable=False)  # anchorCounter value in the contract
+    root = db.Column(db.String(64), nullable=False)
+    leaf_count = db.Column(db.Integer, nullable=False)
+    transaction_hash = db.Column(db.String(66), nullable=False)
+    block_number = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('contract_address', 'anchor_id', name='uq_merkle_anchor'),
+    )
+
+    def to_dict(self):
+        return {
+            "anchor_id": self.anchor_id,
+            "root": self.root,
+            "leaf_count": self.leaf_count,
+            "transaction_hash": self.transaction_hash,
+            "block_number": self.block_number,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+class AnchoredFile(db.Model):
+    """File whose hash is covered by a Merkle anchor instead of its own contract record"""
+    id = db.Column(db.Integer, primary_key=True)
+    file_name = db.Column(db.String(255), nullable=False)
+    file_hash = db.Column(db.String(64), unique=True, nullable=False)
+    ipfs_hash = db.Column(db.String(100), nullable=True)
+    file_type = db.Column(db.String(20), nullable=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    local_path = db.Column(db.String(255), nullable=True)
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    patient_id = db.Column(db.String(100), nullable=True)
+    file_metadata = db.Column(db.Text, nullable=True)  # JSON string
+    merkle_anchor_id = db.Column(db.Integer, db.ForeignKey('merkle_anchor.id'), nullable=True, index=True)
+    leaf_index = db.Column(db.Integer, nullable=True)
+    proof = db.Column(db.Text, nullable=True)  # JSON list of [side, sibling hash] from leaf to root
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    merkle_anchor = db.relationship('MerkleAnchor', backref='files')
+
+    @property
+    def is_anchored(self):
+        return self.merkle_anchor_id is not None
+
+    def to_dict(self):
+        return {
+            "anchored_file_id": self.id,
+            "file_name": self.file_name,
+            "file_hash": self.file_hash,
+            "ipfs_hash": self.ipfs_hash,
+            "file_type": self.file_type,
+            "file_size": self.file_size,
+            "local_path": self.local_path,
+            "patient_id": self.patient_id,
+            "metadata": self.file_metadata,
+            "status": "anchored" if self.is_anchored else "pending",
+            "leaf_index": self.leaf_index,
+            "anchor": self.merkle_anchor.to_dict() if self.merkle_anchor else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+class UploadJob(db.Model):
+    """Queued background stage of a file upload (IPFS add, pin and chain anchoring)"""
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, processing, completed, failed
+    anchor_mode = db.Column(db.String(20), nullable=False, default='file')  # 'file' or 'merkle'
+    file_name = db.Column(db.String(255), nullable=False)  # stored file name
+    original_filename = db.Column(db.String(255), nullable=True)
+    file_hash = db.Column(db.String(64), nullable=False)
+    file_type = db.Column(db.String(20), nullable=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    local_path = db.Column(db.String(255), nullable=False)
+    patient_id = db.Column(db.String(100), nullable=True)
+    file_metadata = db.Column(db.Text, nullable=True)  # JSON string
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)  # not retried before this time
+    lease_expires_at = db.Column(db.DateTime, nullable=True)  # a crashed worker's job is requeued after this
+    error = db.Column(db.Text, nullable=True)
+    ipfs_hash = db.Column(db.String(100), nullable=True)
+    file_id = db.Column(db.Integer, nullable=True)  # on-chain file ID
+    transaction_hash = db.Column(db.String(66), nullable=True)
+    anchored_file_id = db.Column(db.Integer, db.ForeignKey('anchored_file.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "anchor_mode": self.anchor_mode,
+            "file_name": self.original_filename or self.file_name,
+            "file_hash": self.file_hash,
+            "file_size": self.file_size,
+            "local_path": self.local_path,
+            "attempts": self.attempts,
+            "error": self.error,
+            "ipfs_hash": self.ipfs_hash,
+            "file_id": self.file_id,
+            "blockchain_tx": self.transaction_hash,
+            "anchored_file_id": self.anchored_file_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class VerificationRun(db.Model):
+    """One bulk integrity audit of locally stored files against their on-chain hashes"""
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(255), nullable=False)  # 'file_ids' or the audited directory
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    files_checked = db.Column(db.Integer, nullable=False, default=0)
+    matched = db.Column(db.Integer, nullable=False, default=0)
+    mismatched = db.Column(db.Integer, nullable=False, default=0)
+    missing = db.Column(db.Integer, nullable=False, default=0)
+    unregistered = db.Column(db.Integer, nullable=False, default=0)
+    bytes_hashed = db.Column(db.BigInteger, nullable=False, default=0)
+    duration_seconds = db.Column(db.Float, nullable=True)
+    files_per_second = db.Column(db.Float, nullable=True)
+    mb_per_second = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    results = db.relationship('VerificationRunResult', backref='run', lazy=True)
+
+    def to_dict(self):
+        return {
+            "run_id": self.id,
+            "source": self.source,
+            "files_checked": self.files_checked,
+            "matched": self.matched,
+            "mismatched": self.mismatched,
+            "missing": self.missing,
+            "unregistered": self.unregistered,
+            "bytes_hashed": self.bytes_hashed,
+            "duration_seconds": self.duration_seconds,
+            "files_per_second": self.files_per_second,
+            "mb_per_second": self.mb_per_second,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+class VerificationRunResult(db.Model):
+    """Outcome for one file in a bulk integrity audit"""
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('verification_run.id'), nullable=False, index=True)
+    file_id = db.Column(db.Integer, nullable=True)  # on-chain file ID, None for unregistered files
+    file_path = db.Column(db.String(500), nullable=False)
+    expected_hash = db.Column(db.String(64), nullable=True)
+    current_hash = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.String(20), nullable=False)  # match, mismatch, missing, unregistered
+    error = db.Column(db.Text, nullable=True)
+
+class Blob(db.Model):
+    """Content-addressed file under static/uploads/blobs, shared by every upload with the same bytes"""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), nullable=False)  # relative to app/static
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    ipfs_hash = db.Column(db.String(100), nullable=True)  # set once the content has been added to IPFS
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StatBucket(db.Model):
+    """Rows of one kind created on one day, kept current by app/services/statistics.py"""
+    metric = db.Column(db.String(40), primary_key=True)  # users, patients, doctors, records, consultations
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
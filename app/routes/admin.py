@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
 from app.models import db, User, Doctor, Patient, MedicalRecord, Consultation
 from datetime import datetime, timedelta
+from app.services.pagination import paginate_request
+from app.services.statistics import get_statistics_service
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -14,12 +16,13 @@ def require_admin():
 @admin_bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Get system statistics
-    total_users = User.query.count()
-    total_patients = Patient.query.count()
-    total_doctors = Doctor.query.count()
-    total_records = MedicalRecord.query.count()
-    total_consultations = Consultation.query.count()
+    # Get system statistics (precomputed, at most STATS_CACHE_SECONDS old)
+    stats = get_statistics_service()
+    total_users = stats.total('users')
+    total_patients = stats.total('patients')
+    total_doctors = stats.total('doctors')
+    total_records = stats.total('records')
+    total_consultations = stats.total('consultations')
     
     # Get recent activity
     recent_users = User.query.order_by(User.created_at.desc()).limit(5).all()
@@ -37,13 +40,14 @@ def dashboard():
                          total_consultations=total_consultations,
                          recent_users=recent_users,
                          recent_records=recent_records,
-                         today_consultations=today_consultations)
+                         today_consultations=today_consultations,
+                         stats_age=stats.age_seconds())
 
 @admin_bp.route('/users')
 @login_required
 def users():
-    users = User.query.order_by(User.created_at.desc()).all()
-    return render_template('admin/users.html', users=users)
+    page = paginate_request(User.query, User.created_at, User.id)
+    return render_template('admin/users.html', users=page.items, page=page)
 
 @admin_bp.route('/user/<int:user_id>')
 @login_required
@@ -85,8 +89,8 @@ def delete_user(user_id):
 @admin_bp.route('/patients')
 @login_required
 def patients():
-    patients = Patient.query.order_by(Patient.created_at.desc()).all()
-    return render_template('admin/patients.html', patients=patients)
+    page = paginate_request(Patient.query, Patient.created_at, Patient.id)
+    return render_template('admin/patients.html', patients=page.items, page=page)
 
 @admin_bp.route('/patient/<int:patient_id>')
 @login_required
@@ -103,8 +107,8 @@ def view_patient(patient_id):
 @admin_bp.route('/doctors')
 @login_required
 def doctors():
-    doctors = Doctor.query.order_by(Doctor.created_at.desc()).all()
-    return render_template('admin/doctors.html', doctors=doctors)
+    page = paginate_request(Doctor.query, Doctor.created_at, Doctor.id)
+    return render_template('admin/doctors.html', doctors=page.items, page=page)
 
 @admin_bp.route('/doctor/<int:doctor_id>')
 @login_required
@@ -121,8 +125,8 @@ def view_doctor(doctor_id):
 @admin_bp.route('/records')
 @login_required
 def records():
-    records = MedicalRecord.query.order_by(MedicalRecord.created_at.desc()).all()
-    return render_template('admin/records.html', records=records)
+    page = paginate_request(MedicalRecord.query, MedicalRecord.created_at, MedicalRecord.id)
+    return render_template('admin/records.html', records=page.items, page=page)
 
 @admin_bp.route('/record/<int:record_id>')
 @login_required
@@ -133,8 +137,8 @@ def view_record(record_id):
 @admin_bp.route('/consultations')
 @login_required
 def consultations():
-    consultations = Consultation.query.order_by(Consultation.date.desc()).all()
-    return render_template('admin/consultations.html', consultations=consultations)
+    page = paginate_request(Consultation.query, Consultation.date, Consultation.id)
+    return render_template('admin/consultations.html', consultations=page.items, page=page)
 
 @admin_bp.route('/consultation/<int:consultation_id>')
 @login_required
@@ -150,23 +154,12 @@ def reports():
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
     
-    # Weekly statistics
-    weekly_records = MedicalRecord.query.filter(
-        MedicalRecord.created_at >= week_ago
-    ).count()
-    
-    weekly_consultations = Consultation.query.filter(
-        Consultation.date >= week_ago
-    ).count()
-    
-    # Monthly statistics
-    monthly_records = MedicalRecord.query.filter(
-        MedicalRecord.created_at >= month_ago
-    ).count()
-    
-    monthly_consultations = Consultation.query.filter(
-        Consultation.date >= month_ago
-    ).count()
+    # Weekly and monthly statistics from the daily buckets
+    stats = get_statistics_service()
+    weekly_records = stats.count_since('records', week_ago)
+    weekly_consultations = stats.count_since('consultations', week_ago)
+    monthly_records = stats.count_since('records', month_ago)
+    monthly_consultations = stats.count_since('consultations', month_ago)
     
     # Top doctors by records
     from sqlalchemy import func
@@ -181,7 +174,8 @@ def reports():
                          weekly_consultations=weekly_consultations,
                          monthly_records=monthly_records,
                          monthly_consultations=monthly_consultations,
-                         top_doctors=top_doctors)
+                         top_doctors=top_doctors,
+                         stats_age=stats.age_seconds())
 
 @admin_bp.route('/settings', methods=['GET', 'POST'])
 @login_required
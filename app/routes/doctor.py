@@ -1,10 +1,21 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from app.models import db, Doctor, Patient, Consultation, LabReport, Prescription, MedicalRecord, LabRequest
+from app.services.identity import get_current_profile
 from datetime import datetime, date, timedelta
+from app.services.pagination import paginate_request
 
 doctor_bp = Blueprint('doctor', __name__)
 
+def consulted_patient_ids(doctor):
+    """
+    Subquery of the ids of patients who have consulted this doctor. Used as
+    IN (SELECT ...) so the database resolves it from the consultation index
+    instead of the route loading every consultation to collect ids.
+    """
+    return db.session.query(Consultation.patient_id).filter(Consultation.doctor_id == doctor.id).distinct()
+
 @doctor_bp.before_request
 def require_doctor():
     if not current_user.is_authenticated or current_user.role != 'doctor':
@@ -14,7 +25,7 @@ def require_doctor():
 @doctor_bp.route('/dashboard')
 @login_required
 def dashboard():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -24,7 +35,7 @@ def dashboard():
     today_consultations = Consultation.query.filter_by(
         doctor_id=doctor.id, 
         date=today
-    ).all()
+    ).options(joinedload(Consultation.patient).joinedload(Patient.user)).all()
     
     # Get pending consultations
     pending_consultations = Consultation.query.filter_by(
@@ -33,10 +44,9 @@ def dashboard():
     ).order_by(Consultation.date).limit(10).all()
     
     # Get recent medical records for patients this doctor has consulted with
-    patient_ids = [c.patient_id for c in Consultation.query.filter_by(doctor_id=doctor.id).all()]
     recent_records = MedicalRecord.query.filter(
-        MedicalRecord.patient_id.in_(patient_ids)
-    ).order_by(MedicalRecord.created_at.desc()).limit(5).all()
+        MedicalRecord.patient_id.in_(consulted_patient_ids(doctor))
+    ).options(joinedload(MedicalRecord.patient)).order_by(MedicalRecord.created_at.desc()).limit(5).all()
     
     return render_template('doctor/dashboard.html', 
                          doctor=doctor,
@@ -47,22 +57,21 @@ def dashboard():
 @doctor_bp.route('/patients')
 @login_required
 def patients():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
     
-    # Get all patients who have consulted with this doctor
-    consultations = Consultation.query.filter_by(doctor_id=doctor.id).all()
-    patient_ids = list(set([c.patient_id for c in consultations]))
-    patients = Patient.query.filter(Patient.id.in_(patient_ids)).all()
+    # Get patients who have consulted with this doctor, a page at a time
+    query = Patient.query.filter(Patient.id.in_(consulted_patient_ids(doctor))).options(joinedload(Patient.user))
+    page = paginate_request(query, Patient.created_at, Patient.id)
     
-    return render_template('doctor/patients.html', patients=patients)
+    return render_template('doctor/patients.html', patients=page.items, page=page)
 
 @doctor_bp.route('/patient/<int:patient_id>')
 @login_required
 def view_patient(patient_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -80,7 +89,7 @@ def view_patient(patient_id):
 @doctor_bp.route('/patient/<int:patient_id>/medical-history')
 @login_required
 def patient_medical_history(patient_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -115,7 +124,7 @@ def patient_medical_history(patient_id):
 @doctor_bp.route('/patient/<int:patient_id>/record/new', methods=['GET', 'POST'])
 @login_required
 def create_record(patient_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -147,7 +156,7 @@ def create_record(patient_id):
 @doctor_bp.route('/record/<int:record_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_record(record_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -178,18 +187,23 @@ def edit_record(record_id):
 @doctor_bp.route('/consultations')
 @login_required
 def consultations():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
     
-    consultations = Consultation.query.filter_by(doctor_id=doctor.id).order_by(Consultation.date.desc()).all()
-    return render_template('doctor/consultations.html', consultations=consultations)
+    query = Consultation.query.filter_by(doctor_id=doctor.id)
+    page = paginate_request(query.options(joinedload(Consultation.patient)), Consultation.date, Consultation.id)
+    # Summary cards count every consultation, not just this page
+    status_counts = dict(query.with_entities(Consultation.status, db.func.count(Consultation.id))
+                         .group_by(Consultation.status).all())
+    return render_template('doctor/consultations.html', consultations=page.items, page=page,
+                           status_counts=status_counts)
 
 @doctor_bp.route('/consultations/<int:consultation_id>/start', methods=['POST'])
 @login_required
 def start_consultation(consultation_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         return jsonify({'success': False, 'message': 'Doctor profile not found'})
     
@@ -206,7 +220,7 @@ def start_consultation(consultation_id):
 @doctor_bp.route('/consultations/<int:consultation_id>/complete', methods=['POST'])
 @login_required
 def complete_consultation(consultation_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         return jsonify({'success': False, 'message': 'Doctor profile not found'})
     
@@ -223,7 +237,7 @@ def complete_consultation(consultation_id):
 @doctor_bp.route('/consultation/<int:consultation_id>')
 @login_required
 def view_consultation(consultation_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -234,7 +248,7 @@ def view_consultation(consultation_id):
 @doctor_bp.route('/consultation/<int:consultation_id>/update', methods=['POST'])
 @login_required
 def update_consultation(consultation_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -279,7 +293,7 @@ def update_consultation(consultation_id):
 @doctor_bp.route('/schedule')
 @login_required
 def schedule():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -324,7 +338,7 @@ def schedule():
 @doctor_bp.route('/schedule/availability', methods=['POST'])
 @login_required
 def set_availability():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         return jsonify({'success': False, 'message': 'Doctor profile not found'})
     
@@ -343,7 +357,7 @@ def set_availability():
 @doctor_bp.route('/schedule/requests/<int:request_id>/approve', methods=['POST'])
 @login_required
 def approve_request(request_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         return jsonify({'success': False, 'message': 'Doctor profile not found'})
     
@@ -360,7 +374,7 @@ def approve_request(request_id):
 @doctor_bp.route('/schedule/requests/<int:request_id>/reject', methods=['POST'])
 @login_required
 def reject_request(request_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         return jsonify({'success': False, 'message': 'Doctor profile not found'})
     
@@ -377,7 +391,7 @@ def reject_request(request_id):
 @doctor_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -402,7 +416,7 @@ def profile():
 @doctor_bp.route('/profile/update', methods=['POST'])
 @login_required
 def update_profile():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         return jsonify({'success': False, 'message': 'Doctor profile not found'})
     
@@ -439,7 +453,7 @@ def update_profile():
 @doctor_bp.route('/profile/change-password', methods=['POST'])
 @login_required
 def change_password():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         return jsonify({'success': False, 'message': 'Doctor profile not found'})
     
@@ -464,24 +478,22 @@ def change_password():
 @doctor_bp.route('/lab-reports')
 @login_required
 def lab_reports():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
     
-    # Get all lab reports for patients this doctor has consulted with
-    consultations = Consultation.query.filter_by(doctor_id=doctor.id).all()
-    patient_ids = list(set([c.patient_id for c in consultations]))
-    lab_reports = LabReport.query.filter(
-        LabReport.patient_id.in_(patient_ids)
-    ).order_by(LabReport.created_at.desc()).all()
+    # Get lab reports for patients this doctor has consulted with, a page at a time
+    query = LabReport.query.filter(LabReport.patient_id.in_(consulted_patient_ids(doctor))) \
+        .options(joinedload(LabReport.patient), joinedload(LabReport.lab))
+    page = paginate_request(query, LabReport.created_at, LabReport.id)
     
-    return render_template('doctor/lab_reports.html', lab_reports=lab_reports, doctor=doctor)
+    return render_template('doctor/lab_reports.html', lab_reports=page.items, page=page, doctor=doctor)
 
 @doctor_bp.route('/lab-report/<int:report_id>')
 @login_required
 def view_lab_report(report_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -503,24 +515,22 @@ def view_lab_report(report_id):
 @doctor_bp.route('/prescriptions')
 @login_required
 def prescriptions():
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
     
-    # Get all prescriptions for patients this doctor has consulted with
-    consultations = Consultation.query.filter_by(doctor_id=doctor.id).all()
-    patient_ids = list(set([c.patient_id for c in consultations]))
-    prescriptions = Prescription.query.filter(
-        Prescription.patient_id.in_(patient_ids)
-    ).order_by(Prescription.prescribed_date.desc()).all()
+    # Get prescriptions for patients this doctor has consulted with, a page at a time
+    query = Prescription.query.filter(Prescription.patient_id.in_(consulted_patient_ids(doctor))) \
+        .options(joinedload(Prescription.patient))
+    page = paginate_request(query, Prescription.prescribed_date, Prescription.id)
     
-    return render_template('doctor/prescriptions.html', prescriptions=prescriptions, doctor=doctor)
+    return render_template('doctor/prescriptions.html', prescriptions=page.items, page=page, doctor=doctor)
 
 @doctor_bp.route('/prescription/<int:prescription_id>')
 @login_required
 def view_prescription(prescription_id):
-    doctor = Doctor.query.filter_by(user_id=current_user.id).first()
+    doctor = get_current_profile(Doctor)
     if not doctor:
         flash('Doctor profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -6,6 +6,8 @@ import json
 from datetime import datetime
 from app.models import db, User, Patient, Doctor, Lab
 from app.services.file_verification_service import FileVerificationService
+from app.services.blockchain_service import get_blockchain_service
+from app.services.upload_queue import get_upload_queue
 import io
 
 file_verification_bp = Blueprint('file_verification', __name__)
@@ -60,16 +62,18 @@ def upload_file():
             "uploaded_by_role": current_user.role
         }
         
-        # Upload file securely
-        result = file_service.upload_file_secure(
+        # Store and hash the file now; IPFS and the blockchain write run in the background
+        result = file_service.submit_upload(
             file=file,
             patient_id=patient.id,
-            metadata=metadata
+            metadata=metadata,
+            uploaded_by=current_user.id
         )
         
         if result['success']:
-            flash(f'File uploaded successfully! File ID: {result["file_id"]}', 'success')
-            return redirect(url_for('file_verification.view_file', file_id=result['file_id']))
+            flash(f'File received! Upload job {result["job_id"]} is storing it on IPFS and the blockchain; '
+                  f'it will appear in the file list once confirmed.', 'success')
+            return redirect(url_for('file_verification.list_files'))
         else:
             flash(f'Upload failed: {result["error"]}', 'error')
     
@@ -137,8 +141,8 @@ def view_file(file_id):
     
     file_service = FileVerificationService()
     
-    # Get file record from blockchain
-    file_record = file_service.blockchain_service.get_file_record(file_id)
+    # Get file record from the indexed copy of the contract
+    file_record = file_service.get_indexed_file(file_id)
     if not file_record:
         flash('File not found.', 'error')
         return redirect(url_for('file_verification.list_files'))
@@ -160,15 +164,8 @@ def list_files():
     
     file_service = FileVerificationService()
     
-    # Get user's files using the current account address
-    user_files = file_service.get_user_files(file_service.blockchain_service.account)
-    
-    # Get file details for each file ID
-    files = []
-    for file_id in user_files:
-        file_record = file_service.blockchain_service.get_file_record(file_id)
-        if file_record:
-            files.append(file_record)
+    # Get user's files (uploaded from the current account) from the indexed copy of the contract
+    files = file_service.get_indexed_files(file_service.blockchain_service.account)
     
     return render_template('file_verification/list_files.html', files=files)
 
@@ -226,11 +223,21 @@ def download_file(file_id):
     file_service = FileVerificationService()
     
     # Get file record
-    file_record = file_service.blockchain_service.get_file_record(file_id)
+    file_record = file_service.get_indexed_file(file_id)
     if not file_record:
         flash('File not found.', 'error')
         return redirect(url_for('file_verification.list_files'))
     
+    # Serve the local content-addressed copy when there is one and it is intact
+    local_path = file_service.get_local_copy(file_record['file_hash'])
+    if local_path and file_service.calculate_file_hash(local_path) == file_record['file_hash']:
+        return send_file(
+            local_path,
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=file_record['file_name']
+        )
+    
     # Get file from IPFS
     file_content = file_service.get_file_from_ipfs(file_record['ipfs_hash'])
     if not file_content:
@@ -266,9 +273,53 @@ def api_upload_file():
     except:
         metadata = {}
     
-    result = file_service.upload_file_secure(
+    # In anchoring mode the hash is covered by a later Merkle root instead of its own transaction
+    result = file_service.submit_upload(
         file=file,
         patient_id=patient_id,
+        metadata=metadata,
+        uploaded_by=current_user.id,
+        anchor_mode=current_app.config.get('FILE_ANCHOR_MODE', 'file')
+    )
+    
+    return jsonify(result)
+
+@file_verification_bp.route('/api/upload/<int:job_id>')
+@login_required
+def api_upload_status(job_id):
+    """Status of a queued upload job"""
+    if current_user.role not in ['doctor', 'lab', 'admin']:
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    job = get_upload_queue().get_job(job_id)
+    if not job or (job.uploaded_by != current_user.id and current_user.role != 'admin'):
+        return jsonify({'success': False, 'error': 'Upload job not found'}), 404
+    
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@file_verification_bp.route('/api/upload/batch', methods=['POST'])
+@login_required
+def api_upload_files_batch():
+    """API endpoint for uploading many files in batched blockchain transactions"""
+    if current_user.role not in ['doctor', 'lab', 'admin']:
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({'success': False, 'error': 'No files provided'}), 400
+    
+    patient_id = request.form.get('patient_id')
+    metadata = request.form.get('metadata', '{}')
+    
+    try:
+        metadata = json.loads(metadata)
+    except:
+        metadata = {}
+    
+    file_service = FileVerificationService()
+    result = file_service.upload_files_secure(
+        files=files,
+        patient_id=patient_id,
         metadata=metadata
     )
     
@@ -292,7 +343,68 @@ def api_verify_file():
     
     result = file_service.verify_file_integrity(
         file_id=int(file_id),
-        file_bytes=file_content
+        file_bytes=file_content,
+        anchored=request.form.get('anchored') == '1'
     )
     
     return jsonify(result)
+
+@file_verification_bp.route('/api/verify/bulk', methods=['POST'])
+@login_required
+def api_verify_files_bulk():
+    """API endpoint for auditing many stored files against their on-chain hashes"""
+    if current_user.role not in ['doctor', 'lab', 'admin']:
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    file_ids = data.get('file_ids')
+    directory = data.get('directory')
+    
+    # Auditing arbitrary server directories is limited to admins
+    if directory is not None and current_user.role != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    if file_ids is None and directory is None:
+        return jsonify({'success': False, 'error': 'Provide file_ids or directory'}), 400
+    
+    # Each worker is a thread; clients may ask for fewer than the server allows, never more
+    workers = data.get('workers')
+    if workers is not None:
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError, OverflowError):
+            workers = 0
+        if workers < 1:
+            return jsonify({'success': False, 'error': 'workers must be a positive integer'}), 400
+        workers = min(workers, current_app.config['BULK_VERIFY_MAX_WORKERS'])
+    
+    file_service = FileVerificationService()
+    result = file_service.verify_files_bulk(
+        file_ids=file_ids,
+        directory=directory,
+        workers=workers,
+        requested_by=current_user.id
+    )
+    
+    return jsonify(result)
+
+@file_verification_bp.route('/api/anchored/<int:anchored_file_id>')
+@login_required
+def api_anchored_file(anchored_file_id):
+    """Anchoring status of a file uploaded in anchoring mode"""
+    if current_user.role not in ['doctor', 'lab', 'admin', 'patient']:
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    record = FileVerificationService().get_anchored_file(anchored_file_id)
+    if not record:
+        return jsonify({'success': False, 'error': 'Anchored file not found'}), 404
+    
+    return jsonify({'success': True, 'file': record})
+
+@file_verification_bp.route('/api/blockchain/stats')
+@login_required
+def api_blockchain_stats():
+    """Connection pool and reconnect counters for the shared blockchain service"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'error': 'Access denied'}), 403
+    
+    return jsonify({'success': True, 'stats': get_blockchain_service().get_stats()})
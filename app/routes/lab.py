@@ -1,14 +1,26 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context, send_file, abort
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from werkzeug.utils import secure_filename
+import io
 import os
-import pickle
-import hashlib
+import json
+import time
+import zipfile
 from PIL import Image
 import numpy as np
 from datetime import datetime, date
 from app.models import db, User, Lab, LabReport, Patient, Doctor, Consultation, MedicalRecord, LabRequest
+from app.services.identity import get_current_profile
 from app.services.blockchain_service import BlockchainService
+from app.services.blob_store import get_blob_store
+from app.services.file_hasher import hash_file
+from app.services.model_registry import get_model_registry
+from app.services.retinal_detection import RetinalBatchDetector, classify_unmatched, upload_sources, zip_sources
+from app.services.retinal_engine import get_retinal_engine
+from app.services.thumbnail_service import get_thumbnail_service
+from app.services.query_cache import get_query_cache
+from app.services.pagination import paginate_request
 
 lab_bp = Blueprint('lab', __name__)
 
@@ -24,31 +36,24 @@ RETINAL_DISEASES = [
     'MH'   # Macular Hole
 ]
 
-# Load the AI model for retinal disease classification (hashmap)
+# The retinal model (hash -> diagnosis hashmap) is loaded once per process by
+# the app's RetinalModelRegistry and reloaded when model.pkl changes on disk
 def load_retinal_model():
-    try:
-        model_path = os.path.join(current_app.root_path, 'models', 'model.pkl')
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        return model
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        return None
+    registry = get_model_registry()
+    return registry.get() if registry is not None else None
 
 def hash_image(image_path):
     """Hash the image file using MD5 for lookup in the model hashmap."""
     try:
-        with open(image_path, 'rb') as f:
-            img_bytes = f.read()
-        return hashlib.md5(img_bytes).hexdigest()
+        return hash_file(image_path, 'md5')
     except Exception as e:
         print(f"Error hashing image: {e}")
         return None
 
 def classify_retinal_disease(image_path):
     """Classify retinal disease using the hash-based model."""
-    model = load_retinal_model()
-    if model is None:
+    registry = get_model_registry()
+    if registry is None or registry.get() is None:
         print("Model not available")
         return "Model not available", 0.0
     try:
@@ -56,29 +61,56 @@ def classify_retinal_disease(image_path):
         if img_hash is None:
             print("Image hashing failed")
             return "Image hashing failed", 0.0
-        
-        print(f"Generated hash: {img_hash}")
-        print(f"Hash length: {len(img_hash)}")
-        print(f"Hash in model: {img_hash in model}")
-        
-        if img_hash in model:
-            result = model[img_hash]
-            print(f"Found diagnosis: {result}")
-            # result can be a string or a tuple (diagnosis, confidence)
-            if isinstance(result, tuple):
-                return result[0], float(result[1])
-            else:
-                return result, 1.0
-        else:
-            print(f"Hash not found in model. Model has {len(model)} entries")
-            # Show a few sample hashes from the model
-            sample_hashes = list(model.keys())[:3]
-            print(f"Sample model hashes: {sample_hashes}")
-            return "Unknown", 0.0
+
+        result = registry.lookup(img_hash)
+        if result is None:
+            # Not a known file: a re-encoded copy of one, or left to the image classifier
+            return classify_unmatched_image(image_path) or ("Unknown", 0.0)
+        # result can be a string or a tuple (diagnosis, confidence)
+        if isinstance(result, tuple):
+            return result[0], float(result[1])
+        return result, 1.0
     except Exception as e:
         print(f"Error in classification: {e}")
         return "Classification failed", 0.0
 
+def classify_unmatched_image(image_path):
+    """Diagnosis from the perceptual index or the image classifier engine, or None if neither is available or sure."""
+    index = get_model_registry('retinal_phash_registry').get()
+    engine = get_retinal_engine()
+    if index is None and (engine is None or not engine.is_available()):
+        return None
+    try:
+        with Image.open(image_path) as image:
+            result, _ = classify_unmatched(image, index, engine, current_app.config['RETINAL_PHASH_MAX_DISTANCE'])
+            return result
+    except (OSError, ValueError) as e:
+        print(f"Error classifying image: {e}")
+        return None
+
+def render_scan_thumbnails(image_path):
+    """Render the list and preview sizes at upload time; on failure they are rendered on first view."""
+    try:
+        get_thumbnail_service().generate(image_path)
+    except Exception as e:
+        print(f"Error rendering thumbnails: {e}")
+
+def can_view_report(report):
+    """Admins, the lab that wrote the report, its patient and doctors treating the patient"""
+    if current_user.role == 'admin':
+        return True
+    if current_user.role == 'lab':
+        return Lab.query.filter_by(id=report.lab_id, user_id=current_user.id).first() is not None
+    if current_user.role == 'patient':
+        return Patient.query.filter_by(id=report.patient_id, user_id=current_user.id).first() is not None
+    if current_user.role == 'doctor':
+        doctor = get_current_profile(Doctor)
+        return doctor is not None and (
+            report.doctor_id == doctor.id or
+            Consultation.query.filter_by(doctor_id=doctor.id, patient_id=report.patient_id).first() is not None
+        )
+    return False
+
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -90,7 +122,7 @@ def dashboard():
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
@@ -102,7 +134,9 @@ def dashboard():
     total_revenue = db.session.query(db.func.sum(LabReport.amount_charged)).filter_by(lab_id=lab.id, is_paid=True).scalar() or 0
     
     # Get recent reports
-    recent_reports = LabReport.query.filter_by(lab_id=lab.id).order_by(LabReport.created_at.desc()).limit(5).all()
+    recent_reports = LabReport.query.filter_by(lab_id=lab.id) \
+        .options(joinedload(LabReport.patient), joinedload(LabReport.doctor)) \
+        .order_by(LabReport.created_at.desc()).limit(5).all()
     
     return render_template('lab/dashboard.html', 
                          lab=lab,
@@ -119,7 +153,7 @@ def upload_report():
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
@@ -161,16 +195,12 @@ def upload_report():
             return redirect(url_for('lab.upload_report'))
         
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{filename}"
-            
-            # Create upload directory if it doesn't exist
-            upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'lab_reports')
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            file_path = os.path.join(upload_dir, filename)
-            file.save(file_path)
+            # Store by content so a scan uploaded twice is kept once
+            blob_store = get_blob_store()
+            blob, created = blob_store.store_stream(file, file.filename.rsplit('.', 1)[1])
+            file_path = blob_store.absolute_path(blob.path)
+            if created:
+                render_scan_thumbnails(blob.path)
             
             # AI Classification for retinal images
             diagnosis = None
@@ -185,7 +215,7 @@ def upload_report():
                 lab_id=lab.id,
                 consultation_id=consultation_id if consultation_id else None,
                 report_type=report_type,
-                image_path=f'uploads/lab_reports/{filename}',
+                image_path=blob.path,
                 diagnosis=diagnosis,
                 confidence_score=confidence_score,
                 findings=request.form.get('findings'),
@@ -227,14 +257,15 @@ def reports():
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
     
-    reports = LabReport.query.filter_by(lab_id=lab.id).order_by(LabReport.created_at.desc()).all()
+    query = LabReport.query.filter_by(lab_id=lab.id).options(joinedload(LabReport.patient), joinedload(LabReport.doctor))
+    page = paginate_request(query, LabReport.created_at, LabReport.id)
     
-    return render_template('lab/reports.html', lab=lab, reports=reports)
+    return render_template('lab/reports.html', lab=lab, reports=page.items, page=page)
 
 @lab_bp.route('/report/<int:report_id>')
 @login_required
@@ -243,7 +274,7 @@ def view_report(report_id):
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
@@ -262,7 +293,7 @@ def profile():
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
@@ -280,24 +311,63 @@ def profile():
     
     return render_template('lab/profile.html', lab=lab)
 
+DIRECTORY_PAGE_SIZE = 20
+DIRECTORY_MAX_PAGE_SIZE = 100
+
+def _prefix(column, term):
+    """Case-insensitive prefix match; LIKE wildcards in the search term are matched literally"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return column.ilike(f"{escaped}%", escape='\\')
+
+def _name_search(profile, term):
+    """Prefix of first name, last name or email, or 'first last' prefixes"""
+    words = term.split()
+    if len(words) >= 2:
+        return db.and_(_prefix(profile.first_name, words[0]), _prefix(profile.last_name, ' '.join(words[1:])))
+    return db.or_(_prefix(profile.first_name, term), _prefix(profile.last_name, term), _prefix(User.email, term))
+
+def directory_page(profile, columns, row_to_dict):
+    """
+    One page of a patient or doctor directory as a JSON response body, with its
+    user's email joined in a single column-projected query. Supports
+    ?q= (prefix search), ?page= and ?per_page=; pages are cached until a
+    patient, doctor or user changes.
+    """
+    term = (request.args.get('q') or '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', DIRECTORY_PAGE_SIZE, type=int), 1), DIRECTORY_MAX_PAGE_SIZE)
+    
+    def render():
+        query = db.session.query(profile.id, profile.first_name, profile.last_name, User.email, *columns) \
+            .join(User, User.id == profile.user_id)
+        if term:
+            query = query.filter(_name_search(profile, term))
+        rows = query.order_by(profile.last_name, profile.first_name, profile.id) \
+            .offset((page - 1) * per_page).limit(per_page + 1).all()
+        return json.dumps({
+            'results': [row_to_dict(row) for row in rows[:per_page]],
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(rows) > per_page
+        })
+    
+    cache = get_query_cache('lab_directory_cache')
+    key = (profile.__name__, term.lower(), page, per_page)
+    body = cache.get_or_set(key, render) if cache is not None else render()
+    return Response(body, mimetype='application/json')
+
 @lab_bp.route('/api/patients')
 @login_required
 def api_patients():
     if current_user.role != 'lab':
         return jsonify({'error': 'Access denied'}), 403
     
-    patients = Patient.query.all()
-    patient_data = []
-    for patient in patients:
-        user = User.query.get(patient.user_id)
-        patient_data.append({
-            'id': patient.id,
-            'name': f"{patient.first_name} {patient.last_name}",
-            'email': user.email,
-            'phone': patient.phone
-        })
-    
-    return jsonify(patient_data)
+    return directory_page(Patient, [Patient.phone], lambda row: {
+        'id': row.id,
+        'name': f"{row.first_name} {row.last_name}",
+        'email': row.email,
+        'phone': row.phone
+    })
 
 @lab_bp.route('/api/doctors')
 @login_required
@@ -305,18 +375,55 @@ def api_doctors():
     if current_user.role != 'lab':
         return jsonify({'error': 'Access denied'}), 403
     
-    doctors = Doctor.query.all()
-    doctor_data = []
-    for doctor in doctors:
-        user = User.query.get(doctor.user_id)
-        doctor_data.append({
-            'id': doctor.id,
-            'name': f"Dr. {doctor.first_name} {doctor.last_name}",
-            'email': user.email,
-            'specialization': doctor.specialization
-        })
+    return directory_page(Doctor, [Doctor.specialization], lambda row: {
+        'id': row.id,
+        'name': f"Dr. {row.first_name} {row.last_name}",
+        'email': row.email,
+        'specialization': row.specialization
+    })
+
+@lab_bp.route('/api/model/stats')
+@login_required
+def api_model_stats():
+    if current_user.role not in ('lab', 'admin'):
+        return jsonify({'error': 'Access denied'}), 403
     
-    return jsonify(doctor_data) 
+    registry = get_model_registry()
+    if registry is None:
+        return jsonify({'error': 'Model registry not configured'}), 503
+    registry.get()
+    stats = registry.get_stats()
+    engine = get_retinal_engine()
+    stats['engine'] = engine.get_stats() if engine is not None else None
+    return jsonify(stats)
+
+@lab_bp.route('/reports/<int:report_id>/image/<size>')
+@login_required
+def report_image(report_id, size):
+    """Scan image of a report at 'thumb' or 'preview' size, or 'original'"""
+    report = db.session.get(LabReport, report_id)
+    if report is None or not report.image_path or not can_view_report(report):
+        abort(404)
+    if size == 'original':
+        return redirect(url_for('static', filename=report.image_path))
+    
+    thumbnails = get_thumbnail_service()
+    if size not in thumbnails.sizes:
+        abort(404)
+    try:
+        data = thumbnails.get(report.image_path, size)
+    except Exception as e:
+        print(f"Error rendering thumbnail: {e}")
+        data = None
+    if data is None:
+        # Not renderable (or gone); let the browser try the original
+        return redirect(url_for('static', filename=report.image_path))
+    
+    response = send_file(io.BytesIO(data), mimetype='image/jpeg', max_age=86400,
+                         etag=f"{thumbnails.cache_key(report.image_path)}-{size}")
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
 
 @lab_bp.route('/requests')
 @login_required
@@ -325,15 +432,24 @@ def requests():
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
     
-    # Get all lab requests for this lab
-    requests = LabRequest.query.filter_by(lab_id=lab.id).order_by(LabRequest.created_at.desc()).all()
-    
-    return render_template('lab/requests.html', lab=lab, requests=requests)
+    # Get this lab's requests a page at a time
+    query = LabRequest.query.filter_by(lab_id=lab.id)
+    page = paginate_request(
+        query.options(joinedload(LabRequest.doctor), joinedload(LabRequest.patient).joinedload(Patient.user)),
+        LabRequest.created_at, LabRequest.id
+    )
+    # Summary cards count every request, not just this page
+    status_counts = dict(query.with_entities(LabRequest.status, db.func.count(LabRequest.id))
+                         .group_by(LabRequest.status).all())
+    urgent_count = query.filter(LabRequest.priority == 'urgent').count()
+    
+    return render_template('lab/requests.html', lab=lab, requests=page.items, page=page,
+                           status_counts=status_counts, urgent_count=urgent_count)
 
 @lab_bp.route('/request/<int:request_id>')
 @login_required
@@ -342,7 +458,7 @@ def view_request(request_id):
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
@@ -361,7 +477,7 @@ def process_request(request_id):
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
@@ -383,16 +499,12 @@ def process_request(request_id):
             return redirect(url_for('lab.process_request', request_id=request_id))
         
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{filename}"
-            
-            # Create upload directory if it doesn't exist
-            upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'lab_reports')
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            file_path = os.path.join(upload_dir, filename)
-            file.save(file_path)
+            # Store by content so a scan uploaded twice is kept once
+            blob_store = get_blob_store()
+            blob, created = blob_store.store_stream(file, file.filename.rsplit('.', 1)[1])
+            file_path = blob_store.absolute_path(blob.path)
+            if created:
+                render_scan_thumbnails(blob.path)
             
             # AI Classification for retinal images
             diagnosis = None
@@ -407,7 +519,7 @@ def process_request(request_id):
                 lab_id=lab.id,
                 consultation_id=lab_request.consultation_id,
                 report_type=lab_request.request_type,
-                image_path=f'uploads/lab_reports/{filename}',
+                image_path=blob.path,
                 diagnosis=diagnosis,
                 confidence_score=confidence_score,
                 findings=request.form.get('findings'),
@@ -454,7 +566,7 @@ def upload_scan():
         flash('Access denied. Lab access only.', 'error')
         return redirect(url_for('auth.login'))
     
-    lab = Lab.query.filter_by(user_id=current_user.id).first()
+    lab = get_current_profile(Lab)
     if not lab:
         flash('Lab profile not found.', 'error')
         return redirect(url_for('auth.logout'))
@@ -496,16 +608,12 @@ def upload_scan():
             return redirect(url_for('lab.upload_scan'))
         
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{filename}"
-            
-            # Create upload directory if it doesn't exist
-            upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'lab_reports')
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            file_path = os.path.join(upload_dir, filename)
-            file.save(file_path)
+            # Store by content so a scan uploaded twice is kept once
+            blob_store = get_blob_store()
+            blob, created = blob_store.store_stream(file, file.filename.rsplit('.', 1)[1])
+            file_path = blob_store.absolute_path(blob.path)
+            if created:
+                render_scan_thumbnails(blob.path)
             
             # AI Classification for retinal images
             diagnosis = None
@@ -520,7 +628,7 @@ def upload_scan():
                 lab_id=lab.id,
                 consultation_id=consultation_id if consultation_id else None,
                 report_type=report_type,
-                image_path=f'uploads/lab_reports/{filename}',
+                image_path=blob.path,
                 diagnosis=diagnosis,
                 confidence_score=confidence_score,
                 findings=request.form.get('findings'),
@@ -568,16 +676,62 @@ def detect():
         return jsonify({'success': False, 'message': 'Invalid or missing image file.'}), 400
     if report_type != 'retinal':
         return jsonify({'success': False, 'message': 'AI detection is only available for retinal scans.'}), 400
-    # Save file temporarily
-    temp_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'temp')
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_path = os.path.join(temp_dir, secure_filename(file.filename))
-    file.save(temp_path)
-    # Run AI detection
-    diagnosis, confidence = classify_retinal_disease(temp_path)
-    # Remove temp file
+    # Hold a reference to the stored content only while detecting
+    blob_store = get_blob_store()
+    blob, _ = blob_store.store_stream(file, file.filename.rsplit('.', 1)[1])
+    try:
+        # Run AI detection
+        diagnosis, confidence = classify_retinal_disease(blob_store.absolute_path(blob.path))
+    finally:
+        # Drop the reference (the file is removed unless a report uses the same image)
+        blob_store.release(blob.sha256)
+    return jsonify({'success': True, 'diagnosis': diagnosis, 'confidence': confidence}) 
+
+@lab_bp.route('/detect/batch', methods=['POST'])
+@login_required
+def detect_batch():
+    """
+    Classify a set of retinal images in one request: any number of 'images'
+    files and/or a zip 'archive'. With ?stream=1 (or Accept: application/x-ndjson)
+    results are streamed as NDJSON lines as they complete, then a summary line.
+    """
+    if current_user.role != 'lab':
+        return jsonify({'success': False, 'message': 'Access denied.'}), 403
+    
+    sources = upload_sources(request.files.getlist('images'))
+    archive = request.files.get('archive')
+    if archive and archive.filename:
+        try:
+            sources.extend(zip_sources(zipfile.ZipFile(archive.stream)))
+        except zipfile.BadZipFile:
+            return jsonify({'success': False, 'message': 'Archive is not a valid zip file.'}), 400
+    if not sources:
+        return jsonify({'success': False, 'message': 'No images uploaded.'}), 400
+    max_images = current_app.config['LAB_DETECT_MAX_IMAGES']
+    if len(sources) > max_images:
+        return jsonify({'success': False, 'message': f'At most {max_images} images per batch.'}), 400
+    
+    detector = RetinalBatchDetector(
+        get_model_registry(),
+        workers=current_app.config['LAB_DETECT_WORKERS'],
+        perceptual_registry=get_model_registry('retinal_phash_registry'),
+        max_distance=current_app.config['RETINAL_PHASH_MAX_DISTANCE'],
+        engine=get_retinal_engine()
+    )
     try:
-        os.remove(temp_path)
-    except Exception:
-        pass
-    return jsonify({'success': True, 'diagnosis': diagnosis, 'confidence': confidence}) 
\ No newline at end of file
+        if request.args.get('stream') != '1' and request.accept_mimetypes.best != 'application/x-ndjson':
+            results, summary = detector.detect_all(sources)
+            return jsonify({'success': True, 'results': results, 'summary': summary})
+        results = detector.detect(sources)
+    except RuntimeError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    
+    def generate():
+        start = time.perf_counter()
+        done = []
+        for result in results:
+            done.append(result)
+            yield json.dumps(result) + '\n'
+        yield json.dumps({'done': True, 'summary': detector.summarize(done, time.perf_counter() - start)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -1,7 +1,10 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from app.models import db, Patient, MedicalRecord, Consultation, LabReport, Prescription, LabRequest, Lab
+from app.services.identity import get_current_profile
 from datetime import datetime, date, time
+from app.services.pagination import paginate_request
 
 patient_bp = Blueprint('patient', __name__)
 
@@ -14,7 +17,7 @@ def require_patient():
 @patient_bp.route('/dashboard')
 @login_required
 def dashboard():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -25,17 +28,17 @@ def dashboard():
 @patient_bp.route('/records')
 @login_required
 def records():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
-    records = MedicalRecord.query.filter_by(patient_id=patient.id).all()
-    return render_template('patient/records.html', records=records)
+    page = paginate_request(MedicalRecord.query.filter_by(patient_id=patient.id), MedicalRecord.created_at, MedicalRecord.id)
+    return render_template('patient/records.html', records=page.items, page=page)
 
 @patient_bp.route('/record/<int:record_id>')
 @login_required
 def view_record(record_id):
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -58,24 +61,28 @@ def view_record(record_id):
 @patient_bp.route('/lab-reports')
 @login_required
 def lab_reports():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
     
     # Get patient's lab reports
-    lab_reports = LabReport.query.filter_by(patient_id=patient.id).order_by(LabReport.created_at.desc()).all()
+    lab_reports = LabReport.query.filter_by(patient_id=patient.id) \
+        .options(joinedload(LabReport.doctor), joinedload(LabReport.lab)) \
+        .order_by(LabReport.created_at.desc()).all()
     
     return render_template('patient/lab_reports.html', patient=patient, lab_reports=lab_reports)
 
 @patient_bp.route('/prescriptions')
 @login_required
 def prescriptions():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
-    prescriptions = Prescription.query.filter_by(patient_id=patient.id).order_by(Prescription.prescribed_date.desc()).all()
+    prescriptions = Prescription.query.filter_by(patient_id=patient.id) \
+        .options(joinedload(Prescription.doctor)) \
+        .order_by(Prescription.prescribed_date.desc()).all()
     from datetime import datetime
     now = datetime.now()
     this_month_count = sum(
@@ -87,7 +94,7 @@ def prescriptions():
 @patient_bp.route('/lab-report/<int:report_id>')
 @login_required
 def view_lab_report(report_id):
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -103,17 +110,17 @@ def view_lab_report(report_id):
 @patient_bp.route('/consultations')
 @login_required
 def consultations():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
-    consultations = Consultation.query.filter_by(patient_id=patient.id).all()
+    consultations = Consultation.query.filter_by(patient_id=patient.id).options(joinedload(Consultation.doctor)).all()
     return render_template('patient/consultations.html', consultations=consultations)
 
 @patient_bp.route('/consultation/<int:consultation_id>')
 @login_required
 def view_consultation(consultation_id):
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -123,7 +130,7 @@ def view_consultation(consultation_id):
 @patient_bp.route('/book-consultation', methods=['GET', 'POST'])
 @login_required
 def book_consultation():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -176,7 +183,7 @@ def book_consultation():
 @patient_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -210,7 +217,7 @@ def profile():
 @patient_bp.route('/request-lab-report', methods=['GET', 'POST'])
 @login_required
 def request_lab_report():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -261,20 +268,22 @@ def request_lab_report():
 @patient_bp.route('/lab-requests')
 @login_required
 def lab_requests():
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
     
     # Get patient's lab requests
-    lab_requests = LabRequest.query.filter_by(patient_id=patient.id).order_by(LabRequest.created_at.desc()).all()
+    lab_requests = LabRequest.query.filter_by(patient_id=patient.id) \
+        .options(joinedload(LabRequest.doctor), joinedload(LabRequest.lab)) \
+        .order_by(LabRequest.created_at.desc()).all()
     
     return render_template('patient/lab_requests.html', patient=patient, lab_requests=lab_requests)
 
 @patient_bp.route('/lab-request/<int:request_id>')
 @login_required
 def view_lab_request(request_id):
-    patient = Patient.query.filter_by(user_id=current_user.id).first()
+    patient = get_current_profile(Patient)
     if not patient:
         flash('Patient profile not found. Please contact support.', 'error')
         return redirect(url_for('main.home'))
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import tempfile
+from flask import current_app, has_app_context
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Blob
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class UploadStream:
+    """
+    Reads an upload in fixed-size chunks and feeds each one to an incremental
+    SHA-256 and a file on disk while yielding it to an optional consumer, so
+    the upload is read exactly once and never held in memory whole.
+    Stops early once max_size is exceeded.
+    """
+
+    def __init__(self, file, out_file, max_size, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.file = file
+        self.out_file = out_file
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.too_large = False
+        self.done = False
+
+    def __iter__(self):
+        while not self.done:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                self.done = True
+                return
+            self.size += len(chunk)
+            if self.max_size is not None and self.size > self.max_size:
+                self.too_large = self.done = True
+                return
+            self.sha256.update(chunk)
+            self.out_file.write(chunk)
+            yield chunk
+
+    def drain(self):
+        """Consume whatever the consumer left unread"""
+        for _ in self:
+            pass
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded files.
+
+    Every file is written once to uploads/blobs/<aa>/<bb>/<sha256>.<ext> under
+    app/static, however many uploads or reports refer to it. Blob rows count
+    the references; release() deletes the file when the last one goes away.
+    Because the SHA-256 is known as soon as the upload is stored, callers can
+    skip IPFS and chain work for content that is already there.
+    """
+
+    def __init__(self, relative_root='uploads/blobs'):
+        self.relative_root = relative_root
+
+    @property
+    def static_root(self):
+        return os.path.join(current_app.root_path, 'static')
+
+    def blob_path(self, digest, extension=''):
+        """Relative static path for a digest, sharded two levels deep to keep directories small"""
+        name = f"{digest}.{extension}" if extension else digest
+        return f"{self.relative_root}/{digest[:2]}/{digest[2:4]}/{name}"
+
+    def absolute_path(self, relative_path):
+        return os.path.join(self.static_root, *relative_path.split('/'))
+
+    def store_stream(self, file, extension='', max_size=None):
+        """
+        Stream an upload into the store and take a reference to it.
+        Returns (blob, created); raises ValueError if the upload exceeds max_size.
+        """
+        tmp_dir = self.absolute_path(f"{self.relative_root}/tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out_file:
+                stream = UploadStream(file, out_file, max_size)
+                stream.drain()
+            if stream.too_large:
+                raise ValueError("File too large")
+            return self._add(tmp_path, stream.sha256.hexdigest(), stream.size, extension.lower())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _add(self, tmp_path, digest, size, extension):
+        blob = db.session.get(Blob, digest)
+        if blob is not None and os.path.exists(self.absolute_path(blob.path)):
+            self.add_reference(digest)
+            return blob, False
+
+        relative_path = blob.path if blob is not None else self.blob_path(digest, extension)
+        absolute_path = self.absolute_path(relative_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        os.replace(tmp_path, absolute_path)
+
+        if blob is not None:
+            # The row outlived its file; the new copy restores it
+            self.add_reference(digest)
+            return blob, True
+        try:
+            blob = Blob(sha256=digest, path=relative_path, size=size, ref_count=1)
+            db.session.add(blob)
+            db.session.commit()
+            return blob, True
+        except IntegrityError:
+            # Another request stored the same content at the same moment
+            db.session.rollback()
+            self.add_reference(digest)
+            return db.session.get(Blob, digest), False
+
+    def get(self, digest):
+        return db.session.get(Blob, digest.lower()) if digest else None
+
+    def resolve(self, digest):
+        """Absolute path of the stored copy of this content, or None"""
+        blob = self.get(digest)
+        if blob is None:
+            return None
+        path = self.absolute_path(blob.path)
+        return path if os.path.exists(path) else None
+
+    def add_reference(self, digest):
+        Blob.query.filter_by(sha256=digest).update({"ref_count": Blob.ref_count + 1}, synchronize_session=False)
+        db.session.commit()
+
+    def release(self, digest):
+        """Drop one reference; the file and its row are removed with the last one"""
+        Blob.query.filter_by(sha256=digest).update({"ref_count": Blob.ref_count - 1}, synchronize_session=False)
+        db.session.commit()
+        blob = db.session.get(Blob, digest)
+        if blob is None:
+            return
+        db.session.refresh(blob)
+        if blob.ref_count <= 0:
+            path = self.absolute_path(blob.path)
+            db.session.delete(blob)
+            db.session.commit()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def set_ipfs_hash(self, digest, ipfs_hash):
+        Blob.query.filter_by(sha256=digest).update({"ipfs_hash": ipfs_hash}, synchronize_session=False)
+        db.session.commit()
+
+
+def get_blob_store():
+    """Return the app-scoped BlobStore"""
+    if has_app_context():
+        store = current_app.extensions.get('blob_store')
+        if store is not None:
+            return store
+    return BlobStore()
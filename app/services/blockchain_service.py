@@ -1,11 +1,39 @@
 import json
 import hashlib
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
 from web3 import Web3
-from flask import current_app
+from web3._utils.abi import get_abi_output_types
+from hexbytes import HexBytes
+from flask import current_app, has_app_context
 import os
+from app.services.transaction_pipeline import TransactionPipeline
+from app.services.verification_log_index import VerificationLogIndex
+from app.models import db
+
+class PooledHTTPProvider(Web3.HTTPProvider):
+    """
+    HTTPProvider that sends every request through one shared requests session.
+    web3 caches a session per thread, so request threads would otherwise each
+    open their own connections instead of using the pool.
+    """
+    
+    def __init__(self, endpoint_uri, session, timeout=30):
+        super().__init__(endpoint_uri)
+        self.session = session
+        self.timeout = timeout
+    
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        response = self.session.post(self.endpoint_uri, data=request_data, timeout=self.timeout,
+                                     **self.get_request_kwargs())
+        response.raise_for_status()
+        return self.decode_rpc_response(response.content)
 
 class BlockchainService:
-    def __init__(self):
+    def __init__(self, ganache_url=None, pool_size=20, health_check_interval=30, reconnect_backoff=5, read_batch_size=100):
         self.web3 = None
         self.contract = None
         self.account = None
@@ -14,76 +42,217 @@ class BlockchainService:
         self.is_connected = False
         
         # Ganache configuration
-        self.ganache_url = "http://127.0.0.1:7545"  # Default Ganache URL
+        self.ganache_url = ganache_url or "http://127.0.0.1:7545"  # Default Ganache URL
         self.account = None
         self.contract_abi = None
         
+        # Connection pooling / lazy reconnect settings
+        self.pool_size = pool_size
+        self.health_check_interval = health_check_interval
+        self.reconnect_backoff = reconnect_backoff
+        self.read_batch_size = read_batch_size
+        self.session = None
+        self._lock = threading.RLock()
+        self._last_health_check = 0.0
+        self._last_connect_failure = 0.0
+        self._contract_source = None
+        self.stats = {
+            "connects": 0,
+            "reconnects": 0,
+            "connect_failures": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+            "contract_loads": 0,
+            "contract_cache_hits": 0,
+            "service_reuses": 0,
+            "batch_requests": 0
+        }
+        
+        # Write path: local nonce allocation + non-blocking submission with a receipt tracker
+        self.tx_pipeline = TransactionPipeline(lambda: self.web3)
+        
+        # Read path: per-file verification logs from FileVerified events, cached in SQL
+        self.verification_log_index = VerificationLogIndex(self)
+        
+        # Anchored Merkle roots are immutable, so each is read from the contract once
+        self._anchored_roots = {}
+    
+    def _create_session(self):
+        """Create a keep-alive HTTP session with a connection pool sized for request threads"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=False)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+        
     def connect_to_ganache(self):
         """Connect to Ganache local blockchain"""
-        try:
-            self.web3 = Web3(Web3.HTTPProvider(self.ganache_url))
-            
-            if self.web3.is_connected():
-                print(f"✅ Connected to Ganache at {self.ganache_url}")
-                self.is_connected = True
-                # Dynamically use the first Ganache account
-                accounts = self.web3.eth.accounts
-                if accounts and len(accounts) > 0:
-                    self.account = accounts[0]
-                    print(f"✅ Using account: {self.account}")
+        with self._lock:
+            try:
+                if self.session is None:
+                    self.session = self._create_session()
+                self.web3 = Web3(PooledHTTPProvider(self.ganache_url, self.session))
+                
+                if self.web3.is_connected():
+                    print(f"✅ Connected to Ganache at {self.ganache_url}")
+                    if self.stats["connects"] > 0:
+                        self.stats["reconnects"] += 1
+                    self.stats["connects"] += 1
+                    self.is_connected = True
+                    self._last_health_check = time.monotonic()
+                    # The chain may have been restarted, so nonces are re-read from the node
+                    self.tx_pipeline.nonce_manager.reset()
+                    # Dynamically use the first Ganache account
+                    accounts = self.web3.eth.accounts
+                    if accounts and len(accounts) > 0:
+                        self.account = accounts[0]
+                        print(f"✅ Using account: {self.account}")
+                    else:
+                        print("❌ No accounts found in Ganache.")
+                        return False
+                    return True
                 else:
-                    print("❌ No accounts found in Ganache.")
+                    print(f"❌ Failed to connect to Ganache at {self.ganache_url}")
+                    self._mark_connect_failure()
                     return False
-                return True
-            else:
-                print(f"❌ Failed to connect to Ganache at {self.ganache_url}")
+                    
+            except Exception as e:
+                print(f"❌ Error connecting to Ganache: {e}")
+                self._mark_connect_failure()
                 return False
-                
-        except Exception as e:
-            print(f"❌ Error connecting to Ganache: {e}")
-            return False
     
-    def load_contract(self, contract_address=None, contract_abi_path=None):
-        """Load the FileVerificationContract"""
-        try:
-            if not self.is_connected:
-                if not self.connect_to_ganache():
-                    return False
-            
-            # Use provided address or try to get from deployment
-            if contract_address:
-                self.contract_address = contract_address
-            else:
-                # Try to get from deployment artifacts
-                self.contract_address = self._get_deployed_contract_address()
-            
-            if not self.contract_address:
-                print("❌ No contract address found. Please deploy the contract first.")
+    def _mark_connect_failure(self):
+        self.is_connected = False
+        self.stats["connect_failures"] += 1
+        self._last_connect_failure = time.monotonic()
+    
+    def ensure_connected(self):
+        """
+        Return True if the node is reachable, reconnecting lazily.
+        A live connection is only re-probed every health_check_interval seconds,
+        and a failed connect is not retried until reconnect_backoff has passed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.is_connected and self.web3 is not None:
+                if now - self._last_health_check < self.health_check_interval:
+                    self.stats["service_reuses"] += 1
+                    return True
+                self.stats["health_checks"] += 1
+                try:
+                    healthy = self.web3.is_connected()
+                except Exception:
+                    healthy = False
+                if healthy:
+                    self._last_health_check = now
+                    self.stats["service_reuses"] += 1
+                    return True
+                print(f"⚠️ Health check failed for {self.ganache_url}, reconnecting")
+                self.stats["health_check_failures"] += 1
+                self.is_connected = False
+            elif self._last_connect_failure and now - self._last_connect_failure < self.reconnect_backoff:
                 return False
             
-            # Load ABI
-            if contract_abi_path:
-                with open(contract_abi_path, 'r') as f:
-                    self.contract_abi = json.load(f)
-            else:
-                self.contract_abi = self._get_contract_abi()
-            
-            if not self.contract_abi:
-                print("❌ No contract ABI found.")
+            if not self.connect_to_ganache():
                 return False
-            
-            # Create contract instance
-            self.contract = self.web3.eth.contract(
-                address=self.contract_address,
-                abi=self.contract_abi
-            )
-            
-            print(f"✅ Loaded FileVerificationContract at {self.contract_address}")
+            # A reconnect gets a fresh Web3 instance, so rebind the cached contract to it
+            if self.contract_address and self.contract_abi:
+                self.contract = self.web3.eth.contract(address=self.contract_address, abi=self.contract_abi)
             return True
-            
+    
+    def ensure_contract(self):
+        """Return True once connected with the contract loaded, reusing the cached handle"""
+        with self._lock:
+            if not self.ensure_connected():
+                return False
+            if self.contract is not None and self._contract_source == self._get_contract_artifact_mtime():
+                self.stats["contract_cache_hits"] += 1
+                return True
+            return self.load_contract()
+    
+    def get_stats(self):
+        """Connection, health check and pool reuse counters"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["is_connected"] = self.is_connected
+        stats["ganache_url"] = self.ganache_url
+        stats["contract_address"] = self.contract_address
+        stats.update(self._get_pool_stats())
+        stats["transactions"] = dict(self.tx_pipeline.stats, pending=self.tx_pipeline.pending_count())
+        stats["nonces"] = dict(self.tx_pipeline.nonce_manager.stats)
+        return stats
+    
+    def _get_pool_stats(self):
+        """HTTP connections opened vs. requests served by the keep-alive pool"""
+        pool_stats = {"http_requests": 0, "http_connections_opened": 0, "http_connections_reused": 0}
+        if self.session is None:
+            return pool_stats
+        try:
+            adapter = self.session.get_adapter(self.ganache_url)
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                pool_stats["http_requests"] += pool.num_requests
+                pool_stats["http_connections_opened"] += pool.num_connections
         except Exception as e:
-            print(f"❌ Error loading contract: {e}")
-            return False
+            print(f"Error reading connection pool stats: {e}")
+        pool_stats["http_connections_reused"] = max(
+            pool_stats["http_requests"] - pool_stats["http_connections_opened"], 0
+        )
+        return pool_stats
+    
+    def load_contract(self, contract_address=None, contract_abi_path=None):
+        """Load the FileVerificationContract"""
+        with self._lock:
+            try:
+                if not self.is_connected:
+                    if not self.connect_to_ganache():
+                        return False
+                
+                # Use provided address or try to get from deployment
+                if contract_address:
+                    self.contract_address = contract_address
+                else:
+                    # Try to get from deployment artifacts
+                    self.contract_address = self._get_deployed_contract_address()
+                
+                if not self.contract_address:
+                    print("❌ No contract address found. Please deploy the contract first.")
+                    return False
+                
+                # Load ABI
+                if contract_abi_path:
+                    with open(contract_abi_path, 'r') as f:
+                        self.contract_abi = json.load(f)
+                else:
+                    self.contract_abi = self._get_contract_abi()
+                
+                if not self.contract_abi:
+                    print("❌ No contract ABI found.")
+                    return False
+                
+                # Create contract instance
+                self.contract = self.web3.eth.contract(
+                    address=self.contract_address,
+                    abi=self.contract_abi
+                )
+                self._contract_source = self._get_contract_artifact_mtime()
+                self.stats["contract_loads"] += 1
+                
+                print(f"✅ Loaded FileVerificationContract at {self.contract_address}")
+                return True
+                
+            except Exception as e:
+                print(f"❌ Error loading contract: {e}")
+                return False
+    
+    def _get_contract_artifact_mtime(self):
+        """Modification time of the build artifact, used to notice a redeploy"""
+        contract_json_path = os.path.join(os.getcwd(), 'build', 'contracts', 'FileVerificationContract.json')
+        try:
+            return os.path.getmtime(contract_json_path)
+        except OSError:
+            return None
     
     def _get_deployed_contract_address(self):
         """Get deployed contract address from build artifacts"""
@@ -172,20 +341,9 @@ class BlockchainService:
         """Add doctor to blockchain"""
         if self.contract and self.account and self.is_connected:
             try:
-                # Build transaction
-                transaction = self.contract.functions.addDoctor(doctor_address).build_transaction({
-                    'from': self.account,
-                    'gas': 200000,
-                    'gasPrice': self.web3.eth.gas_price,
-                    'nonce': self.web3.eth.get_transaction_count(self.account)
-                })
-                
-                # Sign and send transaction
-                signed_txn = self.web3.eth.account.sign_transaction(transaction, private_key=self._get_private_key())
-                tx_hash = self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-                
-                # Wait for transaction receipt
-                tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+                # Submit through the pipeline and wait for the tracker to resolve the receipt
+                future = self.submit_transaction(self.contract.functions.addDoctor(doctor_address), gas=200000)
+                tx_receipt = future.result(timeout=self.tx_pipeline.receipt_timeout)
                 
                 return {
                     "status": "success",
@@ -197,6 +355,24 @@ class BlockchainService:
                 return None
         return None
     
+    def submit_transaction(self, contract_function, gas):
+        """
+        Build, sign and send a contract call from the current account without waiting.
+        The nonce comes from the local allocator; returns a Future resolving to the receipt.
+        """
+        private_key = self._get_private_key()
+        if not private_key:
+            raise ValueError(f"No private key found for account {self.account}")
+        
+        transaction = contract_function.build_transaction({
+            'from': self.account,
+            'gas': gas,
+            'gasPrice': self.web3.eth.gas_price,
+            # Placeholder so web3 does not query the node; the pipeline assigns the real nonce
+            'nonce': 0
+        })
+        return self.tx_pipeline.submit(transaction, private_key)
+    
     def _get_private_key(self):
         """Get private key for the current account"""
         try:
@@ -283,37 +459,25 @@ class BlockchainService:
                 else:
                     patient_address = patient_id
                 
-                # Build transaction
-                transaction = self.contract.functions.uploadFile(
-                    filename,
-                    file_hash,
-                    ipfs_hash,
-                    file_type,
-                    file_size,
-                    patient_address,
-                    metadata
-                ).build_transaction({
-                    'from': self.account,
-                    'gas': 1000000,  # Increased gas limit to 1M
-                    'gasPrice': self.web3.eth.gas_price,
-                    'nonce': self.web3.eth.get_transaction_count(self.account)
-                })
-                
-                # Get private key
-                private_key = self._get_private_key()
-                if not private_key:
-                    print("❌ Failed to get private key")
-                    return None
+                # Submit through the pipeline; other request threads can send while this one waits
+                future = self.submit_transaction(
+                    self.contract.functions.uploadFile(
+                        filename,
+                        file_hash,
+                        ipfs_hash,
+                        file_type,
+                        file_size,
+                        patient_address,
+                        metadata
+                    ),
+                    gas=1000000  # Increased gas limit to 1M
+                )
+                tx_receipt = future.result(timeout=self.tx_pipeline.receipt_timeout)
                 
-                # Sign and send transaction
-                signed_txn = self.web3.eth.account.sign_transaction(transaction, private_key=private_key)
-                tx_hash = self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-                
-                # Wait for transaction receipt
-                tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
-                
-                # Get the file ID from the event
-                file_id = self.contract.functions.fileCounter().call()
+                # Get the file ID from the event (fileCounter may already include concurrent uploads)
+                file_id = self._get_event_arg(tx_receipt, 'FileUploaded', 'fileId')
+                if file_id is None:
+                    raise ValueError("No FileUploaded event in the transaction receipt")
                 
                 return {
                     "file_id": file_id,
@@ -329,60 +493,252 @@ class BlockchainService:
                 return None
         return None
     
+    def upload_files_batch(self, files, max_files_per_tx=50, gas_limit_fraction=0.8):
+        """
+        Upload many file records through uploadFiles, one transaction per chunk.
+        Each item of files is a dict with filename, file_hash, ipfs_hash, file_type,
+        file_size, patient_id and metadata. Chunks are halved until their estimated gas
+        fits under gas_limit_fraction of the block gas limit, all chunks are submitted
+        without waiting, and file IDs are read back from the FileUploaded events.
+        A chunk that cannot be sent, reverts or times out fails only its own files:
+        they carry an error in the result, and chunks already mined keep their IDs.
+        """
+        if not (self.contract and self.account and self.is_connected):
+            return None
+        try:
+            results = {item["file_hash"]: {"file_hash": item["file_hash"], "file_id": None} for item in files}
+            pending = self._filter_new_files(files, results)
+            gas_budget = int(self.web3.eth.get_block('latest')['gasLimit'] * gas_limit_fraction)
+        except Exception as e:
+            print(f"Error uploading file batch to blockchain: {e}")
+            import traceback
+            print(f"Full traceback: {traceback.format_exc()}")
+            return None
+        
+        errors = []
+        submitted = []
+        while pending:
+            chunk_size = min(max_files_per_tx, len(pending))
+            try:
+                while True:
+                    chunk = pending[:chunk_size]
+                    contract_function = self.contract.functions.uploadFiles([self._file_input(item) for item in chunk])
+                    estimated_gas = contract_function.estimate_gas({'from': self.account})
+                    if estimated_gas <= gas_budget or chunk_size == 1:
+                        break
+                    chunk_size = max(chunk_size // 2, 1)
+                gas = min(int(estimated_gas * 1.2), gas_budget)
+                submitted.append((chunk, self.submit_transaction(contract_function, gas=gas)))
+            except Exception as e:
+                errors.append(self._fail_chunk(pending[:chunk_size], results, e))
+            pending = pending[chunk_size:]
+        
+        total_gas = 0
+        transaction_hashes = []
+        for chunk, future in submitted:
+            try:
+                tx_receipt = future.result(timeout=self.tx_pipeline.receipt_timeout)
+            except Exception as e:
+                errors.append(self._fail_chunk(chunk, results, e))
+                continue
+            total_gas += tx_receipt['gasUsed']
+            transaction_hashes.append(tx_receipt['transactionHash'].hex())
+            for event in self.contract.events.FileUploaded().process_receipt(tx_receipt):
+                result = results.get(event['args']['fileHash'])
+                if result is not None:
+                    result["file_id"] = event['args']['fileId']
+                    result["transaction_hash"] = tx_receipt['transactionHash'].hex()
+        
+        uploaded = sum(1 for result in results.values() if result.get("transaction_hash"))
+        return {
+            "status": "success" if not errors else "partial" if uploaded else "failed",
+            "files": list(results.values()),
+            "transactions": transaction_hashes,
+            "errors": errors,
+            "gas_used": total_gas,
+            "gas_per_file": total_gas / uploaded if uploaded else 0
+        }
+    
+    def _fail_chunk(self, chunk, results, error):
+        """Record a failed uploadFiles chunk against each of its files and return the error message"""
+        message = f"Failed to store on blockchain: {error}"
+        print(f"Error uploading file chunk of {len(chunk)} to blockchain: {error}")
+        for item in chunk:
+            results[item["file_hash"]]["error"] = message
+        return message
+    
+    def _filter_new_files(self, files, results):
+        """Drop files whose hash repeats in the batch or is already on chain, which would revert the chunk"""
+        unique = []
+        seen = set()
+        for item in files:
+            if item["file_hash"] in seen:
+                continue
+            seen.add(item["file_hash"])
+            unique.append(item)
+        
+        calls = [
+            {"to": self.contract_address, "data": self.contract.encodeABI(fn_name='getFileIdByHash', args=[item["file_hash"]])}
+            for item in unique
+        ]
+        new_files = []
+        for item, result in zip(unique, self._batch_eth_call(calls, self.read_batch_size)):
+            existing_id = 0 if isinstance(result, Exception) else int.from_bytes(result[:32] or b'\x00', 'big')
+            if existing_id:
+                results[item["file_hash"]].update(file_id=existing_id, error="File with this hash already exists")
+            else:
+                new_files.append(item)
+        return new_files
+    
+    def _file_input(self, item):
+        """FileInput tuple for uploadFiles; database patient IDs map to the current account as in upload_file_to_blockchain"""
+        patient_id = item.get("patient_id")
+        if isinstance(patient_id, str) and patient_id.startswith('0x'):
+            patient_address = patient_id
+        else:
+            patient_address = self.account
+        return (
+            item["filename"],
+            item["file_hash"],
+            item["ipfs_hash"],
+            item["file_type"],
+            item["file_size"],
+            patient_address,
+            item["metadata"]
+        )
+    
+    def _get_event(self, tx_receipt, event_name):
+        """The first matching event in a receipt, or None"""
+        try:
+            events = getattr(self.contract.events, event_name)().process_receipt(tx_receipt)
+            if events:
+                return events[0]
+        except Exception as e:
+            print(f"Error reading {event_name} event: {e}")
+        return None
+    
+    def _get_event_arg(self, tx_receipt, event_name, arg_name):
+        """Read an argument of the first matching event in a receipt, or None"""
+        event = self._get_event(tx_receipt, event_name)
+        return event['args'][arg_name] if event is not None else None
+    
     def get_file_record(self, file_id):
         """Get file record from blockchain"""
         if self.contract and self.is_connected:
             try:
                 file_data = self.contract.functions.getFile(file_id).call()
-                
-                return {
-                    "file_id": file_id,
-                    "file_name": file_data[0],
-                    "file_hash": file_data[1],
-                    "ipfs_hash": file_data[2],
-                    "file_type": file_data[3],
-                    "file_size": file_data[4],
-                    "uploaded_by": file_data[5],
-                    "patient_id": file_data[6],
-                    "timestamp": file_data[7],
-                    "is_valid": file_data[8],
-                    "metadata": file_data[9]
-                }
+                return self._format_file_record(file_id, file_data)
                 
             except Exception as e:
                 print(f"Error getting file record: {e}")
                 return None
         return None
     
+    def _format_file_record(self, file_id, file_data):
+        return {
+            "file_id": file_id,
+            "file_name": file_data[0],
+            "file_hash": file_data[1],
+            "ipfs_hash": file_data[2],
+            "file_type": file_data[3],
+            "file_size": file_data[4],
+            "uploaded_by": file_data[5],
+            "patient_id": file_data[6],
+            "timestamp": file_data[7],
+            "is_valid": file_data[8],
+            "metadata": file_data[9]
+        }
+    
+    def get_file_records(self, file_ids, batch_size=None):
+        """
+        Get many file records with getFile calls packed into JSON-RPC batch requests.
+        Returns a dict of file_id -> record; a call that fails maps to None without
+        affecting the rest of its batch.
+        """
+        file_ids = list(file_ids)
+        if not (self.contract and self.is_connected) or not file_ids:
+            return {}
+        
+        get_file_abi = self.contract.get_function_by_name('getFile').abi
+        output_types = get_abi_output_types(get_file_abi)
+        calls = [
+            {"to": self.contract_address, "data": self.contract.encodeABI(fn_name='getFile', args=[file_id])}
+            for file_id in file_ids
+        ]
+        
+        records = {}
+        results = self._batch_eth_call(calls, batch_size or self.read_batch_size)
+        for file_id, result in zip(file_ids, results):
+            if isinstance(result, Exception):
+                print(f"Error getting file record {file_id}: {result}")
+                records[file_id] = None
+                continue
+            try:
+                file_data = list(self.web3.codec.decode(output_types, result))
+                for index, output_type in enumerate(output_types):
+                    if output_type == 'address':
+                        file_data[index] = Web3.to_checksum_address(file_data[index])
+                records[file_id] = self._format_file_record(file_id, file_data)
+            except Exception as e:
+                print(f"Error decoding file record {file_id}: {e}")
+                records[file_id] = None
+        return records
+    
+    def _batch_eth_call(self, calls, batch_size):
+        """
+        Send eth_call requests as JSON-RPC batches over the pooled session.
+        Returns one entry per call: the raw return bytes, or an Exception for that call.
+        """
+        results = []
+        for start in range(0, len(calls), batch_size):
+            chunk = calls[start:start + batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": request_id, "method": "eth_call", "params": [call, "latest"]}
+                for request_id, call in enumerate(chunk)
+            ]
+            try:
+                response = self.session.post(self.ganache_url, json=payload, timeout=30)
+                response.raise_for_status()
+                by_id = {item.get("id"): item for item in response.json()}
+            except Exception as e:
+                results.extend([e] * len(chunk))
+                continue
+            self.stats["batch_requests"] += 1
+            
+            for request_id in range(len(chunk)):
+                item = by_id.get(request_id)
+                if item is None:
+                    results.append(ValueError("Missing response in batch"))
+                elif "error" in item:
+                    results.append(ValueError(item["error"].get("message", item["error"])))
+                else:
+                    results.append(bytes(HexBytes(item["result"])))
+        return results
+    
     def verify_file_on_blockchain(self, file_id, current_hash, notes):
         """Verify file on blockchain"""
         if self.contract and self.account and self.is_connected:
             try:
-                # Build transaction
-                transaction = self.contract.functions.verifyFile(
-                    file_id,
-                    current_hash,
-                    notes
-                ).build_transaction({
-                    'from': self.account,
-                    'gas': 500000,  # Increased gas limit
-                    'gasPrice': self.web3.eth.gas_price,
-                    'nonce': self.web3.eth.get_transaction_count(self.account)
-                })
-                
-                # Sign and send transaction
-                signed_txn = self.web3.eth.account.sign_transaction(transaction, private_key=self._get_private_key())
-                tx_hash = self.web3.eth.send_raw_transaction(signed_txn.rawTransaction)
+                future = self.submit_transaction(
+                    self.contract.functions.verifyFile(
+                        file_id,
+                        current_hash,
+                        notes
+                    ),
+                    gas=500000  # Increased gas limit
+                )
+                tx_receipt = future.result(timeout=self.tx_pipeline.receipt_timeout)
                 
-                # Wait for transaction receipt
-                tx_receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
-                
-                # Get the verification log ID
-                log_id = self.contract.functions.verificationCounter().call()
+                # The log ID of this transaction's FileVerified event, not the latest counter
+                event = self._get_event(tx_receipt, 'FileVerified')
+                if event is None:
+                    raise ValueError("No FileVerified event in the transaction receipt")
+                log_id = self.verification_log_index.resolve_log_id(event)
                 
                 return {
                     "log_id": log_id,
-                    "is_match": True,  # The contract returns the actual result
+                    "is_match": event['args']['isMatch'],
+                    "transaction_hash": tx_receipt.transactionHash.hex(),
                     "status": "success"
                 }
                 
@@ -391,6 +747,49 @@ class BlockchainService:
                 return None
         return None
     
+    def anchor_merkle_root(self, root, leaf_count):
+        """Anchor a Merkle root (hex string) covering leaf_count file hashes"""
+        if self.contract and self.account and self.is_connected:
+            try:
+                future = self.submit_transaction(
+                    self.contract.functions.anchorRoot(bytes.fromhex(root), leaf_count),
+                    gas=200000
+                )
+                tx_receipt = future.result(timeout=self.tx_pipeline.receipt_timeout)
+                
+                anchor_id = self._get_event_arg(tx_receipt, 'RootAnchored', 'anchorId')
+                if anchor_id is None:
+                    raise ValueError("No RootAnchored event in the transaction receipt")
+                
+                return {
+                    "anchor_id": anchor_id,
+                    "transaction_hash": tx_receipt.transactionHash.hex(),
+                    "block_number": tx_receipt.blockNumber,
+                    "gas_used": tx_receipt.gasUsed,
+                    "status": "success"
+                }
+                
+            except Exception as e:
+                print(f"Error anchoring Merkle root: {e}")
+                return None
+        return None
+    
+    def get_anchored_root(self, anchor_id):
+        """Get the Merkle root (hex string) stored on chain for an anchor, or None"""
+        cache_key = (self.contract_address, anchor_id)
+        if cache_key in self._anchored_roots:
+            return self._anchored_roots[cache_key]
+        if self.contract and self.is_connected:
+            try:
+                root = self.contract.functions.getAnchor(anchor_id).call()[0].hex()
+                # Anchors are never modified once written
+                self._anchored_roots[cache_key] = root
+                return root
+            except Exception as e:
+                print(f"Error getting anchored root: {e}")
+                return None
+        return None
+    
     def get_user_files(self, user_address):
         """Get files uploaded by user"""
         if self.contract and self.is_connected:
@@ -402,35 +801,61 @@ class BlockchainService:
                 return []
         return []
     
-    def get_file_verification_logs(self, file_id):
-        """Get verification logs for file"""
+    def get_file_id_by_hash(self, file_hash):
+        """Get the ID of the file registered with this hash, or 0"""
         if self.contract and self.is_connected:
             try:
-                # This is a simplified implementation
-                # In a real scenario, you'd need to iterate through logs
-                total_verifications = self.contract.functions.verificationCounter().call()
-                logs = []
-                
-                for log_id in range(1, total_verifications + 1):
-                    try:
-                        log_data = self.contract.functions.getVerificationLog(log_id).call()
-                        if log_data[0] == file_id:  # log_data[0] is fileId
-                            logs.append({
-                                "log_id": log_id,
-                                "file_id": log_data[0],
-                                "original_hash": log_data[1],
-                                "verified_hash": log_data[2],
-                                "is_match": log_data[3],
-                                "verified_by": log_data[4],
-                                "timestamp": log_data[5],
-                                "notes": log_data[6]
-                            })
-                    except:
-                        continue
-                
-                return logs
-                
+                return self.contract.functions.getFileIdByHash(file_hash).call()
             except Exception as e:
-                print(f"Error getting verification logs: {e}")
-                return []
-        return []
\ No newline at end of file
+                print(f"Error getting file by hash: {e}")
+                return 0
+        return 0
+    
+    def get_file_verification_logs(self, file_id):
+        """Get verification logs for file"""
+        if self.contract and self.is_connected:
+            if has_app_context():
+                try:
+                    return self.verification_log_index.get_logs(file_id)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error reading verification log index, falling back to full scan: {e}")
+            return self._scan_file_verification_logs(file_id)
+        return []
+    
+    def _scan_file_verification_logs(self, file_id):
+        """Get verification logs for file by reading every log on chain (no local index)"""
+        try:
+            total_verifications = self.contract.functions.verificationCounter().call()
+            logs = []
+            
+            for log_id in range(1, total_verifications + 1):
+                try:
+                    log_data = self.contract.functions.getVerificationLog(log_id).call()
+                    if log_data[0] == file_id:  # log_data[0] is fileId
+                        logs.append({
+                            "log_id": log_id,
+                            "file_id": log_data[0],
+                            "original_hash": log_data[1],
+                            "verified_hash": log_data[2],
+                            "is_match": log_data[3],
+                            "verified_by": log_data[4],
+                            "timestamp": log_data[5],
+                            "notes": log_data[6]
+                        })
+                except:
+                    continue
+            
+            return logs
+            
+        except Exception as e:
+            print(f"Error getting verification logs: {e}")
+            return []
+
+def get_blockchain_service():
+    """Return the app-scoped BlockchainService, or a new one outside an app context"""
+    if has_app_context():
+        service = current_app.extensions.get('blockchain_service')
+        if service is not None:
+            return service
+    return BlockchainService()
@@ -0,0 +1,227 @@
+import threading
+from flask import current_app, has_app_context
+from app.models import db, ChainFileRecord, ChainVerificationLog, ChainSyncCursor
+
+
+class ChainIndexer:
+    """
+    Mirrors FileVerificationContract state into SQL.
+
+    Reads FileUploaded, FileVerified and FileInvalidated events block range by
+    block range, projects them into ChainFileRecord / ChainVerificationLog rows
+    and checkpoints the last indexed block (and its hash) in ChainSyncCursor.
+    A restart resumes from the checkpoint. If the checkpointed block hash no
+    longer matches the chain, the last reorg_depth blocks are rolled back and
+    indexed again.
+    """
+
+    def __init__(self, blockchain_service, batch_blocks=2000, reorg_depth=12, poll_interval=2):
+        self.blockchain_service = blockchain_service
+        self.batch_blocks = batch_blocks
+        self.reorg_depth = reorg_depth
+        self.poll_interval = poll_interval
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"syncs": 0, "blocks_indexed": 0, "files_indexed": 0, "logs_indexed": 0,
+                      "invalidations_indexed": 0, "reorgs": 0, "errors": 0}
+
+    @property
+    def contract(self):
+        return self.blockchain_service.contract
+
+    @property
+    def cursor_name(self):
+        return f"indexer:{self.blockchain_service.contract_address}"
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def last_indexed_block(self):
+        """Last block the indexer has fully processed, or -1"""
+        cursor = db.session.get(ChainSyncCursor, self.cursor_name)
+        return cursor.last_block if cursor else -1
+
+    def catch_up(self):
+        """
+        Index whatever is new before a read, unless another thread is already doing it.
+        Returns False if the chain could not be reached.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return True
+        try:
+            if not self.blockchain_service.ensure_contract():
+                return False
+            self._sync_until_head()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            self.stats["errors"] += 1
+            print(f"❌ Chain indexer error: {e}")
+            return False
+        finally:
+            self._sync_lock.release()
+
+    def _sync_until_head(self):
+        while self.sync_once():
+            pass
+
+    def sync_once(self):
+        """Index the next block range. Returns True while there are more blocks to index."""
+        web3 = self.blockchain_service.web3
+        head = web3.eth.block_number
+        cursor = db.session.get(ChainSyncCursor, self.cursor_name)
+        if cursor is None:
+            cursor = ChainSyncCursor(name=self.cursor_name, last_block=-1)
+            db.session.add(cursor)
+
+        if cursor.last_block >= 0 and self._is_reorged(cursor, head):
+            self._rollback_to(cursor, max(cursor.last_block - self.reorg_depth, -1))
+
+        from_block = cursor.last_block + 1
+        if from_block > head:
+            db.session.commit()
+            return False
+        to_block = min(head, from_block + self.batch_blocks - 1)
+
+        events = []
+        for event_name in ('FileUploaded', 'FileVerified', 'FileInvalidated'):
+            event_type = getattr(self.contract.events, event_name)()
+            events.extend(event_type.get_logs(fromBlock=from_block, toBlock=to_block))
+        events.sort(key=lambda e: (e['blockNumber'], e['logIndex']))
+
+        # Verification logs are numbered in emission order, so the counter
+        # before this range gives the ID of the first FileVerified event in it
+        next_log_id = 1
+        if from_block > 0 and any(e['event'] == 'FileVerified' for e in events):
+            next_log_id = self.contract.functions.verificationCounter().call(block_identifier=from_block - 1) + 1
+
+        # File details are not in the event, so read them for all new uploads in one batch
+        contract_address = self.blockchain_service.contract_address
+        new_file_ids = [e['args']['fileId'] for e in events if e['event'] == 'FileUploaded']
+        if new_file_ids:
+            known = {file_id for (file_id,) in db.session.query(ChainFileRecord.file_id).filter(
+                ChainFileRecord.contract_address == contract_address,
+                ChainFileRecord.file_id.in_(new_file_ids)
+            )}
+            new_file_ids = [file_id for file_id in new_file_ids if file_id not in known]
+        file_records = self.blockchain_service.get_file_records(new_file_ids) if new_file_ids else {}
+
+        for event in events:
+            if event['event'] == 'FileUploaded':
+                self._index_upload(event, file_records)
+            elif event['event'] == 'FileVerified':
+                self._index_verification(event, next_log_id)
+                next_log_id += 1
+            elif event['event'] == 'FileInvalidated':
+                self._index_invalidation(event)
+
+        cursor.last_block = to_block
+        cursor.block_hash = web3.eth.get_block(to_block)['hash'].hex()
+        db.session.commit()
+
+        self.stats["syncs"] += 1
+        self.stats["blocks_indexed"] += to_block - from_block + 1
+        return to_block < head
+
+    def _is_reorged(self, cursor, head):
+        if cursor.last_block > head:
+            return True
+        if not cursor.block_hash:
+            return False
+        block = self.blockchain_service.web3.eth.get_block(cursor.last_block)
+        return block['hash'].hex() != cursor.block_hash
+
+    def _rollback_to(self, cursor, block_number):
+        """Drop everything indexed after block_number so it is re-read from the canonical chain"""
+        print(f"⚠️ Chain reorg detected at block {cursor.last_block}, re-indexing from {block_number + 1}")
+        contract_address = self.blockchain_service.contract_address
+        ChainFileRecord.query.filter(
+            ChainFileRecord.contract_address == contract_address,
+            ChainFileRecord.block_number > block_number
+        ).delete(synchronize_session=False)
+        ChainFileRecord.query.filter(
+            ChainFileRecord.contract_address == contract_address,
+            ChainFileRecord.invalidated_block > block_number
+        ).update({"is_valid": True, "invalidated_block": None}, synchronize_session=False)
+        ChainVerificationLog.query.filter(
+            ChainVerificationLog.contract_address == contract_address,
+            ChainVerificationLog.block_number > block_number
+        ).delete(synchronize_session=False)
+        # Per-file verification cursors must not point past the rollback either
+        ChainSyncCursor.query.filter(
+            ChainSyncCursor.name.like(f"FileVerified:{contract_address}:%"),
+            ChainSyncCursor.last_block > block_number
+        ).update({"last_block": block_number}, synchronize_session=False)
+        cursor.last_block = block_number
+        cursor.block_hash = None
+        self.stats["reorgs"] += 1
+
+    def _index_upload(self, event, file_records):
+        file_id = event['args']['fileId']
+        if file_id not in file_records:
+            return
+        record = file_records[file_id]
+        if record is None:
+            raise ValueError(f"Could not read file {file_id} from the contract")
+        db.session.add(ChainFileRecord(
+            contract_address=self.blockchain_service.contract_address,
+            file_id=file_id,
+            file_name=record["file_name"],
+            file_hash=record["file_hash"],
+            ipfs_hash=record["ipfs_hash"],
+            file_type=record["file_type"],
+            file_size=record["file_size"],
+            uploaded_by=record["uploaded_by"],
+            patient_address=record["patient_id"],
+            timestamp=record["timestamp"],
+            # Validity is driven by FileInvalidated events, not the current chain state
+            is_valid=True,
+            file_metadata=record["metadata"],
+            block_number=event['blockNumber'],
+            transaction_hash=event['transactionHash'].hex()
+        ))
+        db.session.flush()
+        self.stats["files_indexed"] += 1
+
+    def _index_verification(self, event, log_id):
+        if self.blockchain_service.verification_log_index.store_event(event, log_id):
+            self.stats["logs_indexed"] += 1
+
+    def _index_invalidation(self, event):
+        record = ChainFileRecord.query.filter_by(
+            contract_address=self.blockchain_service.contract_address,
+            file_id=event['args']['fileId']
+        ).first()
+        if record:
+            record.is_valid = False
+            record.invalidated_block = event['blockNumber']
+            self.stats["invalidations_indexed"] += 1
+
+    def start(self, app):
+        """Run the indexer in a daemon thread until stop() is called"""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(app,), name="chain-indexer", daemon=True)
+        self._thread.start()
+        print("✅ Chain indexer started")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+
+    def _run(self, app):
+        with app.app_context():
+            while not self._stop.is_set():
+                self.catch_up()
+                db.session.remove()
+                self._stop.wait(self.poll_interval)
+
+
+def get_chain_indexer():
+    """Return the app-scoped ChainIndexer"""
+    if has_app_context():
+        return current_app.extensions.get('chain_indexer')
+    return None
@@ -1,22 +1,33 @@
 import hashlib
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from flask import current_app
-from app.services.blockchain_service import BlockchainService
+from app.services.blockchain_service import get_blockchain_service
 from app.services.ipfs_service import IPFSService
+from app.services.file_hasher import hash_file
+from app.services.chain_indexer import get_chain_indexer
+from app.services.merkle_anchor_service import get_merkle_anchor_service
+from app.services.upload_queue import get_upload_queue
+from app.services.blob_store import get_blob_store
+from app.models import db, ChainFileRecord, AnchoredFile, UploadJob, VerificationRun, VerificationRunResult
+
+# Keeps IN (...) lookups under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
 
 class FileVerificationService:
-    def __init__(self):
-        self.blockchain_service = BlockchainService()
-        # Initialize blockchain connection
-        if not self.blockchain_service.connect_to_ganache():
-            print("❌ Failed to connect to Ganache")
-        if not self.blockchain_service.load_contract():
-            print("❌ Failed to load contract")
+    def __init__(self, blockchain_service=None):
+        # Reuse the app-scoped connection; it reconnects and reloads the contract lazily
+        self.blockchain_service = blockchain_service or get_blockchain_service()
+        if not self.blockchain_service.ensure_contract():
+            print("❌ Failed to connect to Ganache or load contract")
         
         self.ipfs_service = IPFSService()
+        self.blob_store = get_blob_store()
         self.allowed_extensions = {
             'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'pdf', 'doc', 'docx', 
             'txt', 'csv', 'xlsx', 'xls', 'zip', 'rar', 'mp4', 'avi', 'mov'
@@ -29,13 +40,9 @@ class FileVerificationService:
                filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
     
     def calculate_file_hash(self, file_path):
-        """Calculate SHA-256 hash of a file"""
+        """Calculate SHA-256 hash of a file (mmap for large files, buffered readinto otherwise)"""
         try:
-            sha256_hash = hashlib.sha256()
-            with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
-            return sha256_hash.hexdigest()
+            return hash_file(file_path)
         except Exception as e:
             print(f"Error calculating file hash: {e}")
             return None
@@ -57,94 +64,41 @@ class FileVerificationService:
         Returns: dict with upload status and blockchain info
         """
         try:
-            # Validate file
-            if not file or not file.filename:
-                return {"success": False, "error": "No file provided"}
-            
-            if not self.allowed_file(file.filename):
-                return {"success": False, "error": "File type not allowed"}
-            
-            # Read file content and calculate hash
-            file_content = file.read()
-            file_size = len(file_content)
-            
-            if file_size > self.max_file_size:
-                return {"success": False, "error": "File too large (max 50MB)"}
-            
-            # Calculate hash
-            file_hash = self.calculate_file_hash_from_bytes(file_content)
-            if not file_hash:
-                return {"success": False, "error": "Failed to calculate file hash"}
-            
-            # Save file locally first
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{filename}"
-            print(f"[DEBUG] Generated filename: {filename}")
-            upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'verified_files')
-            os.makedirs(upload_dir, exist_ok=True)
-            print(f"[DEBUG] Upload directory: {upload_dir}")
-            file_path = os.path.join(upload_dir, filename)
-            print(f"[DEBUG] File path: {file_path}")
-            # Write file content
-            try:
-                with open(file_path, 'wb') as f:
-                    f.write(file_content)
-                print(f"[DEBUG] File written to disk.")
-            except Exception as e:
-                print(f"[ERROR] Failed to write file: {e}")
-                return {"success": False, "error": f"Failed to write file: {e}"}
-            # Upload to IPFS
-            print(f"[DEBUG] Uploading to IPFS: {file_path}")
-            ipfs_hash = self.ipfs_service.upload_file(file_path)
-            print(f"[DEBUG] IPFS hash result: {ipfs_hash}")
-            if not ipfs_hash:
-                print(f"[ERROR] Failed to upload to IPFS.")
-                return {"success": False, "error": "Failed to upload to IPFS"}
-            # Pin file on IPFS
-            print(f"[DEBUG] Pinning file on IPFS: {ipfs_hash}")
-            pin_result = self.ipfs_service.pin_file(ipfs_hash)
-            print(f"[DEBUG] Pin result: {pin_result}")
-            # Prepare metadata
-            file_metadata = {
-                "original_filename": file.filename,
-                "file_size": file_size,
-                "upload_timestamp": datetime.now().isoformat(),
-                "uploaded_by": "system",  # Will be updated with actual user
-                "patient_id": patient_id,
-                "custom_metadata": metadata or {}
-            }
-            print(f"[DEBUG] File metadata: {file_metadata}")
+            prepared = self._prepare_upload(file, patient_id, metadata)
+            if not prepared["success"]:
+                return prepared
             # Store on blockchain
             try:
                 print(f"[DEBUG] Storing file on blockchain...")
                 blockchain_result = self.blockchain_service.upload_file_to_blockchain(
-                    filename=filename,
-                    file_hash=file_hash,
-                    ipfs_hash=ipfs_hash,
-                    file_type=filename.rsplit('.', 1)[1].lower(),
-                    file_size=file_size,
+                    filename=prepared["filename"],
+                    file_hash=prepared["file_hash"],
+                    ipfs_hash=prepared["ipfs_hash"],
+                    file_type=prepared["file_type"],
+                    file_size=prepared["file_size"],
                     patient_id=patient_id,
-                    metadata=json.dumps(file_metadata)
+                    metadata=json.dumps(prepared["metadata"])
                 )
                 print(f"[DEBUG] Blockchain result: {blockchain_result}")
                 if not blockchain_result:
                     print(f"[ERROR] Failed to store on blockchain.")
+                    self.blob_store.release(prepared["file_hash"])
                     return {"success": False, "error": "Failed to store on blockchain"}
             except Exception as e:
                 import traceback
                 print(f"[ERROR] Blockchain upload error: {e}")
                 print(f"[ERROR] Full traceback: {traceback.format_exc()}")
+                self.blob_store.release(prepared["file_hash"])
                 return {"success": False, "error": f"Failed to store on blockchain: {str(e)}"}
             print(f"[DEBUG] File upload complete. Returning result.")
             return {
                 "success": True,
                 "file_id": blockchain_result.get("file_id"),
-                "file_hash": file_hash,
-                "ipfs_hash": ipfs_hash,
-                "local_path": f"uploads/verified_files/{filename}",
+                "file_hash": prepared["file_hash"],
+                "ipfs_hash": prepared["ipfs_hash"],
+                "local_path": prepared["local_path"],
                 "blockchain_tx": blockchain_result.get("transaction_hash"),
-                "metadata": file_metadata
+                "metadata": prepared["metadata"]
             }
         except Exception as e:
             print(f"[ERROR] Error in secure file upload: {e}")
@@ -152,12 +106,341 @@ class FileVerificationService:
             print(f"[ERROR] Full traceback: {traceback.format_exc()}")
             return {"success": False, "error": str(e)}
     
-    def verify_file_integrity(self, file_id, file_path=None, file_bytes=None):
+    def upload_files_secure(self, files, patient_id=None, metadata=None):
+        """
+        Upload many files with integrity verification, anchoring them on chain
+        through batched uploadFiles transactions instead of one transaction per file
+        Returns: dict with per-file results and batch gas usage
+        """
+        try:
+            prepared_files = []
+            results = []
+            for file in files:
+                prepared = self._prepare_upload(file, patient_id, metadata)
+                if prepared["success"]:
+                    prepared_files.append(prepared)
+                else:
+                    results.append({"success": False, "file_name": getattr(file, 'filename', None), "error": prepared["error"]})
+            
+            if not prepared_files:
+                return {"success": False, "error": "No valid files to upload", "files": results}
+            
+            blockchain_result = self.blockchain_service.upload_files_batch([
+                {
+                    "filename": prepared["filename"],
+                    "file_hash": prepared["file_hash"],
+                    "ipfs_hash": prepared["ipfs_hash"],
+                    "file_type": prepared["file_type"],
+                    "file_size": prepared["file_size"],
+                    "patient_id": patient_id,
+                    "metadata": json.dumps(prepared["metadata"])
+                }
+                for prepared in prepared_files
+            ])
+            if not blockchain_result:
+                for prepared in prepared_files:
+                    self.blob_store.release(prepared["file_hash"])
+                return {"success": False, "error": "Failed to store on blockchain", "files": results}
+            
+            chain_results = {item["file_hash"]: item for item in blockchain_result["files"]}
+            for prepared in prepared_files:
+                chain_result = chain_results.get(prepared["file_hash"], {})
+                stored = "error" not in chain_result and chain_result.get("file_id") is not None
+                if not stored:
+                    self.blob_store.release(prepared["file_hash"])
+                results.append({
+                    "success": stored,
+                    "file_name": prepared["metadata"]["original_filename"],
+                    "file_id": chain_result.get("file_id"),
+                    "file_hash": prepared["file_hash"],
+                    "ipfs_hash": prepared["ipfs_hash"],
+                    "local_path": prepared["local_path"],
+                    "blockchain_tx": chain_result.get("transaction_hash"),
+                    "error": chain_result.get("error")
+                })
+            
+            # Chunks fail independently: files from mined chunks succeed even if another chunk failed
+            return {
+                "success": blockchain_result["status"] != "failed",
+                "files": results,
+                "transactions": blockchain_result["transactions"],
+                "errors": blockchain_result["errors"],
+                "gas_used": blockchain_result["gas_used"],
+                "gas_per_file": blockchain_result["gas_per_file"]
+            }
+        except Exception as e:
+            print(f"[ERROR] Error in secure batch upload: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def upload_file_anchored(self, file, patient_id=None, metadata=None, uploaded_by=None):
+        """
+        Upload file in anchoring mode: the hash is buffered and later covered by
+        a single Merkle root on chain instead of its own contract record
+        Returns: dict with upload status and anchoring info
+        """
+        try:
+            anchor_service = get_merkle_anchor_service()
+            if anchor_service is None:
+                return {"success": False, "error": "Merkle anchoring is not available"}
+            
+            prepared = self._prepare_upload(file, patient_id, metadata)
+            if not prepared["success"]:
+                return prepared
+            
+            record = anchor_service.add_file(
+                file_name=prepared["filename"],
+                file_hash=prepared["file_hash"],
+                ipfs_hash=prepared["ipfs_hash"],
+                file_type=prepared["file_type"],
+                file_size=prepared["file_size"],
+                local_path=prepared["local_path"],
+                uploaded_by=uploaded_by,
+                patient_id=patient_id,
+                metadata=json.dumps(prepared["metadata"])
+            )
+            if record is None:
+                self.blob_store.release(prepared["file_hash"])
+                return {"success": False, "error": "File with this hash already exists"}
+            
+            return {
+                "success": True,
+                "anchored_file_id": record.id,
+                "status": "anchored" if record.is_anchored else "pending",
+                "file_hash": prepared["file_hash"],
+                "ipfs_hash": prepared["ipfs_hash"],
+                "local_path": prepared["local_path"],
+                "anchor": record.merkle_anchor.to_dict() if record.merkle_anchor else None,
+                "metadata": prepared["metadata"]
+            }
+        except Exception as e:
+            print(f"[ERROR] Error in anchored file upload: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def submit_upload(self, file, patient_id=None, metadata=None, uploaded_by=None, anchor_mode='file'):
+        """
+        Fast synchronous stage of an upload: validate, hash and store the file
+        locally, then queue the IPFS add, pin and chain write as a background job
+        Returns: dict with the job ID to poll
+        """
+        try:
+            upload_queue = get_upload_queue()
+            if upload_queue is None:
+                return {"success": False, "error": "Upload queue is not available"}
+            
+            stored = self._store_upload(file, patient_id, metadata)
+            if not stored["success"]:
+                return stored
+            
+            # Known content is rejected before it costs an IPFS add or a failed transaction
+            existing_file_id = self._find_registered_file(stored["file_hash"])
+            if existing_file_id:
+                self.blob_store.release(stored["file_hash"])
+                return {"success": False, "error": "File with this hash already exists", "file_id": existing_file_id}
+            
+            job = upload_queue.enqueue(
+                anchor_mode=anchor_mode,
+                file_name=stored["filename"],
+                original_filename=file.filename,
+                file_hash=stored["file_hash"],
+                file_type=stored["file_type"],
+                file_size=stored["file_size"],
+                local_path=stored["local_path"],
+                patient_id=str(patient_id) if patient_id is not None else None,
+                file_metadata=json.dumps(stored["metadata"]),
+                uploaded_by=uploaded_by
+            )
+            return {
+                "success": True,
+                "job_id": job.id,
+                "status": "queued",
+                "file_hash": stored["file_hash"],
+                "local_path": stored["local_path"],
+                "metadata": stored["metadata"]
+            }
+        except Exception as e:
+            print(f"[ERROR] Error queueing file upload: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def publish_upload(self, job):
+        """
+        Background stage of a queued upload: add the stored file to IPFS, pin it
+        and write it to the chain (or buffer it for a Merkle anchor)
+        Returns: dict with success, error and whether a retry makes sense;
+        the queue releases the stored blob once the job finally fails
+        """
+        file_path = self.blob_store.absolute_path(job.local_path)
+        if not os.path.exists(file_path):
+            return {"success": False, "error": "Stored file is missing", "retry": False}
+        
+        if not job.ipfs_hash:
+            ipfs_hash = self._publish_to_ipfs(job.file_hash, file_path, job.file_name)
+            if not ipfs_hash:
+                return {"success": False, "error": "Failed to upload to IPFS", "retry": True}
+            job.ipfs_hash = ipfs_hash
+            db.session.commit()
+        
+        if job.anchor_mode == 'merkle':
+            anchor_service = get_merkle_anchor_service()
+            if anchor_service is None:
+                return {"success": False, "error": "Merkle anchoring is not available", "retry": False}
+            record = anchor_service.add_file(
+                file_name=job.file_name,
+                file_hash=job.file_hash,
+                ipfs_hash=job.ipfs_hash,
+                file_type=job.file_type,
+                file_size=job.file_size,
+                local_path=job.local_path,
+                uploaded_by=job.uploaded_by,
+                patient_id=job.patient_id,
+                metadata=job.file_metadata
+            )
+            if record is None:
+                return {"success": False, "error": "File with this hash already exists", "retry": False}
+            job.anchored_file_id = record.id
+            return {"success": True}
+        
+        if not self.blockchain_service.ensure_contract():
+            return {"success": False, "error": "Blockchain is not reachable", "retry": True}
+        if self.blockchain_service.get_file_id_by_hash(job.file_hash):
+            return {"success": False, "error": "File with this hash already exists", "retry": False}
+        
+        blockchain_result = self.blockchain_service.upload_file_to_blockchain(
+            filename=job.file_name,
+            file_hash=job.file_hash,
+            ipfs_hash=job.ipfs_hash,
+            file_type=job.file_type,
+            file_size=job.file_size,
+            patient_id=job.patient_id,
+            metadata=job.file_metadata
+        )
+        if not blockchain_result:
+            return {"success": False, "error": "Failed to store on blockchain", "retry": True}
+        job.file_id = blockchain_result.get("file_id")
+        job.transaction_hash = blockchain_result.get("transaction_hash")
+        return {"success": True}
+    
+    def _prepare_upload(self, file, patient_id=None, metadata=None):
+        """Validate, hash, store locally and pin one file on IPFS ahead of the blockchain write"""
+        prepared = self._store_upload(file, patient_id, metadata)
+        if not prepared["success"]:
+            return prepared
+        
+        # Dedup check before any network work: the contract would reject this hash anyway
+        existing_file_id = self._find_registered_file(prepared["file_hash"], check_chain=True)
+        if existing_file_id:
+            self.blob_store.release(prepared["file_hash"])
+            return {"success": False, "error": "File with this hash already exists", "file_id": existing_file_id}
+        
+        ipfs_hash = self._publish_to_ipfs(prepared["file_hash"], self.blob_store.absolute_path(prepared["local_path"]), prepared["filename"])
+        print(f"[DEBUG] IPFS hash result: {ipfs_hash}")
+        if not ipfs_hash:
+            print(f"[ERROR] Failed to upload to IPFS.")
+            self.blob_store.release(prepared["file_hash"])
+            return {"success": False, "error": "Failed to upload to IPFS"}
+        prepared["ipfs_hash"] = ipfs_hash
+        return prepared
+    
+    def _publish_to_ipfs(self, file_hash, file_path, filename):
+        """Add and pin stored content on IPFS once; later uploads of the same bytes reuse the hash"""
+        blob = self.blob_store.get(file_hash)
+        if blob is not None and blob.ipfs_hash and not blob.ipfs_hash.startswith('QmMockHash'):
+            print(f"[DEBUG] Reusing IPFS hash for stored content: {blob.ipfs_hash}")
+            return blob.ipfs_hash
+        
+        print(f"[DEBUG] Uploading to IPFS: {file_path}")
+        ipfs_hash = self.ipfs_service.upload_file(file_path, filename)
+        if not ipfs_hash:
+            return None
+        # Pin file on IPFS
+        print(f"[DEBUG] Pinning file on IPFS: {ipfs_hash}")
+        pin_result = self.ipfs_service.pin_file(ipfs_hash)
+        print(f"[DEBUG] Pin result: {pin_result}")
+        self.blob_store.set_ipfs_hash(file_hash, ipfs_hash)
+        return ipfs_hash
+    
+    def _find_registered_file(self, file_hash, check_chain=False):
+        """
+        On-chain file ID already registered for this hash, or None.
+        Uses the chain index and finished upload jobs; check_chain adds one contract read.
+        """
+        record = ChainFileRecord.query.filter_by(
+            contract_address=self.blockchain_service.contract_address,
+            file_hash=file_hash
+        ).first()
+        if record:
+            return record.file_id
+        job = UploadJob.query.filter(
+            UploadJob.file_hash == file_hash,
+            UploadJob.status == 'completed',
+            UploadJob.file_id.isnot(None)
+        ).first()
+        if job:
+            return job.file_id
+        if check_chain:
+            return self.blockchain_service.get_file_id_by_hash(file_hash) or None
+        return None
+    
+    def _store_upload(self, file, patient_id=None, metadata=None):
+        """Validate the upload and stream it into the content-addressed store, hashing it on the way"""
+        # Validate file
+        if not file or not file.filename:
+            return {"success": False, "error": "No file provided"}
+        
+        if not self.allowed_file(file.filename):
+            return {"success": False, "error": "File type not allowed"}
+        
+        filename = secure_filename(file.filename)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"{timestamp}_{filename}"
+        print(f"[DEBUG] Generated filename: {filename}")
+        file_type = filename.rsplit('.', 1)[1].lower()
+        
+        # Single pass over the request stream: hash and write to disk chunk by chunk
+        try:
+            blob, created = self.blob_store.store_stream(file, file_type, max_size=self.max_file_size)
+        except ValueError:
+            return {"success": False, "error": "File too large (max 50MB)"}
+        except Exception as e:
+            print(f"[ERROR] Failed to write file: {e}")
+            return {"success": False, "error": f"Failed to write file: {e}"}
+        print(f"[DEBUG] Stored as {blob.path} ({blob.size} bytes, {'new' if created else 'deduplicated'}).")
+        
+        # Prepare metadata
+        file_metadata = {
+            "original_filename": file.filename,
+            "file_size": blob.size,
+            "upload_timestamp": datetime.now().isoformat(),
+            "uploaded_by": "system",  # Will be updated with actual user
+            "patient_id": patient_id,
+            "custom_metadata": metadata or {}
+        }
+        print(f"[DEBUG] File metadata: {file_metadata}")
+        return {
+            "success": True,
+            "filename": filename,
+            "file_hash": blob.sha256,
+            "ipfs_hash": None,
+            "file_type": file_type,
+            "file_size": blob.size,
+            "local_path": blob.path,
+            "metadata": file_metadata
+        }
+    
+    def get_local_copy(self, file_hash):
+        """Absolute path of the locally stored copy of a file, or None"""
+        return self.blob_store.resolve(file_hash)
+    
+    def verify_file_integrity(self, file_id, file_path=None, file_bytes=None, anchored=False):
         """
         Verify file integrity against blockchain record
+        With anchored=True, file_id is an anchored file ID and the file is checked
+        against its stored Merkle proof and the root anchored on chain
         Returns: dict with verification status
         """
         try:
+            if anchored:
+                return self._verify_anchored_file(file_id, file_path, file_bytes)
+            
             # Get file record from blockchain
             file_record = self.blockchain_service.get_file_record(file_id)
             if not file_record:
@@ -199,6 +482,43 @@ class FileVerificationService:
             print(f"Error in file integrity verification: {e}")
             return {"success": False, "error": str(e)}
     
+    def _verify_anchored_file(self, anchored_file_id, file_path=None, file_bytes=None):
+        """Verify a file locally against its inclusion proof; the only chain read is the anchored root"""
+        anchor_service = get_merkle_anchor_service()
+        if anchor_service is None:
+            return {"success": False, "error": "Merkle anchoring is not available"}
+        
+        record = db.session.get(AnchoredFile, anchored_file_id)
+        if not record:
+            return {"success": False, "error": "Anchored file record not found"}
+        
+        if file_path and os.path.exists(file_path):
+            current_hash = self.calculate_file_hash(file_path)
+        elif file_bytes:
+            current_hash = self.calculate_file_hash_from_bytes(file_bytes)
+        else:
+            return {"success": False, "error": "No file provided for verification"}
+        
+        if not current_hash:
+            return {"success": False, "error": "Failed to calculate current file hash"}
+        
+        result = anchor_service.verify(record, current_hash)
+        if not result["success"]:
+            return result
+        
+        result.update({
+            "original_hash": record.file_hash,
+            "current_hash": current_hash,
+            "file_record": record.to_dict(),
+            "verification_log_id": None
+        })
+        return result
+    
+    def get_anchored_file(self, anchored_file_id):
+        """Get an anchored file record with its anchoring status"""
+        record = db.session.get(AnchoredFile, anchored_file_id)
+        return record.to_dict() if record else None
+    
     def get_file_from_ipfs(self, ipfs_hash):
         """Retrieve file from IPFS"""
         try:
@@ -215,6 +535,202 @@ class FileVerificationService:
             print(f"Error getting user files: {e}")
             return []
     
+    def _catch_up_index(self):
+        """Bring the SQL mirror up to date unless the background indexer is already doing so"""
+        indexer = get_chain_indexer()
+        if indexer is None:
+            return False
+        if indexer.is_running():
+            return True
+        # A failed catch-up would leave the mirror stale; let callers read the chain instead
+        return indexer.catch_up()
+    
+    def get_indexed_files(self, user_address):
+        """Get records of all files uploaded by a user from the SQL mirror of the contract"""
+        try:
+            if not user_address:
+                return []
+            if self._catch_up_index():
+                records = ChainFileRecord.query.filter_by(
+                    contract_address=self.blockchain_service.contract_address,
+                    uploaded_by=user_address
+                ).order_by(ChainFileRecord.file_id).all()
+                return [record.to_dict() for record in records]
+        except Exception as e:
+            print(f"Error getting indexed files: {e}")
+        
+        # No index available: read the records straight from the chain in batches
+        file_ids = self.get_user_files(user_address)
+        records = self.blockchain_service.get_file_records(file_ids)
+        return [records[file_id] for file_id in file_ids if records.get(file_id)]
+    
+    def get_indexed_file(self, file_id):
+        """Get a file record from the SQL mirror, falling back to the chain if it is not indexed yet"""
+        try:
+            if self._catch_up_index():
+                record = ChainFileRecord.query.filter_by(
+                    contract_address=self.blockchain_service.contract_address,
+                    file_id=file_id
+                ).first()
+                if record:
+                    return record.to_dict()
+        except Exception as e:
+            print(f"Error getting indexed file: {e}")
+        return self.blockchain_service.get_file_record(file_id)
+    
+    def verify_files_bulk(self, file_ids=None, directory=None, workers=None, requested_by=None):
+        """
+        Audit many stored files at once: hash the local copies in parallel and
+        compare them with the indexed on-chain hashes. Results are stored as one
+        VerificationRun with bulk-inserted VerificationRunResult rows instead of
+        one verifyFile transaction per file.
+        Returns: dict with the run summary (including files/s and MB/s) and per-file results
+        """
+        try:
+            if file_ids is None and directory is None:
+                return {"success": False, "error": "Provide file IDs or a directory"}
+            if directory is not None and not os.path.isdir(directory):
+                return {"success": False, "error": "Directory not found"}
+            
+            start = time.perf_counter()
+            if directory is not None:
+                targets = self._bulk_targets_for_directory(directory)
+            else:
+                targets = self._bulk_targets_for_ids(file_ids)
+            
+            # hashlib releases the GIL while hashing, so threads hash files in parallel
+            workers = workers or min(32, (os.cpu_count() or 1) * 2)
+            hashing_start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                hashed = list(pool.map(self._hash_for_audit, [target["file_path"] for target in targets]))
+            hashing_seconds = time.perf_counter() - hashing_start
+            
+            results = []
+            bytes_hashed = 0
+            for target, (current_hash, size, error) in zip(targets, hashed):
+                bytes_hashed += size
+                if target["expected_hash"] is None:
+                    status = "unregistered"
+                elif error:
+                    status = "missing"
+                elif current_hash.lower() == target["expected_hash"].lower():
+                    status = "match"
+                else:
+                    status = "mismatch"
+                results.append(dict(target, current_hash=current_hash, status=status, error=error))
+            
+            duration = time.perf_counter() - start
+            counts = {status: sum(1 for r in results if r["status"] == status)
+                      for status in ("match", "mismatch", "missing", "unregistered")}
+            run = VerificationRun(
+                source=directory if directory is not None else "file_ids",
+                requested_by=requested_by,
+                files_checked=len(results),
+                matched=counts["match"],
+                mismatched=counts["mismatch"],
+                missing=counts["missing"],
+                unregistered=counts["unregistered"],
+                bytes_hashed=bytes_hashed,
+                duration_seconds=duration,
+                files_per_second=len(results) / hashing_seconds if hashing_seconds else None,
+                mb_per_second=bytes_hashed / (1024 * 1024) / hashing_seconds if hashing_seconds else None
+            )
+            db.session.add(run)
+            db.session.flush()
+            if results:
+                db.session.execute(db.insert(VerificationRunResult), [dict(r, run_id=run.id) for r in results])
+            db.session.commit()
+            
+            return {"success": True, "summary": run.to_dict(), "results": results}
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error in bulk file verification: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def _bulk_targets_for_ids(self, file_ids):
+        """Local path and expected hash for each file ID, from the index with a chain fallback"""
+        upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'verified_files')
+        file_ids = list(dict.fromkeys(int(file_id) for file_id in file_ids))
+        records = {}
+        if self._catch_up_index():
+            for i in range(0, len(file_ids), LOOKUP_CHUNK_SIZE):
+                for record in ChainFileRecord.query.filter(
+                    ChainFileRecord.contract_address == self.blockchain_service.contract_address,
+                    ChainFileRecord.file_id.in_(file_ids[i:i + LOOKUP_CHUNK_SIZE])
+                ):
+                    records[record.file_id] = (record.file_name, record.file_hash)
+        unindexed = [file_id for file_id in file_ids if file_id not in records]
+        if unindexed:
+            for file_id, record in self.blockchain_service.get_file_records(unindexed).items():
+                if record:
+                    records[file_id] = (record["file_name"], record["file_hash"])
+        
+        targets = []
+        for file_id in file_ids:
+            file_name, expected_hash = records.get(file_id, (None, None))
+            # Content-addressed copy first, then the pre-blob-store location
+            file_path = self.blob_store.resolve(expected_hash) if expected_hash else None
+            if not file_path and file_name:
+                file_path = os.path.join(upload_dir, file_name)
+            targets.append({
+                "file_id": file_id,
+                "file_path": file_path or "",
+                "expected_hash": expected_hash
+            })
+        return targets
+    
+    def _bulk_targets_for_directory(self, directory):
+        """
+        Every file under directory, matched to its indexed record. Blob store files
+        are named <sha256>.<ext>, so they match on the hash in their name; files
+        kept under their original name (verified_files) match on the file name.
+        """
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(directory) for name in names)
+        digests = {path: self._blob_digest(path) for path in paths}
+        lookups = {
+            'file_hash': sorted({digest for digest in digests.values() if digest}),
+            'file_name': sorted({os.path.basename(path) for path in paths if not digests[path]})
+        }
+        records = {'file_hash': {}, 'file_name': {}}
+        if self._catch_up_index():
+            for key, values in lookups.items():
+                column = getattr(ChainFileRecord, key)
+                for i in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                    for record in ChainFileRecord.query.filter(
+                        ChainFileRecord.contract_address == self.blockchain_service.contract_address,
+                        column.in_(values[i:i + LOOKUP_CHUNK_SIZE])
+                    ).order_by(ChainFileRecord.file_id):
+                        # The same content can be registered more than once; report its first file ID
+                        records[key].setdefault(getattr(record, key), (record.file_id, record.file_hash))
+        
+        targets = []
+        for path in paths:
+            if digests[path]:
+                file_id, expected_hash = records['file_hash'].get(digests[path], (None, None))
+            else:
+                file_id, expected_hash = records['file_name'].get(os.path.basename(path), (None, None))
+            targets.append({"file_id": file_id, "file_path": path, "expected_hash": expected_hash})
+        return targets
+    
+    def _blob_digest(self, path):
+        """The SHA-256 a blob store file is named after, or None for other files"""
+        digest = os.path.basename(path).split('.', 1)[0].lower()
+        if len(digest) == 64 and all(c in '0123456789abcdef' for c in digest):
+            return digest
+        return None
+    
+    def _hash_for_audit(self, file_path):
+        """(hash, size, error) for one file; never raises so a bad file does not stop the audit"""
+        try:
+            if not file_path or not os.path.isfile(file_path):
+                return None, 0, "Local copy not found"
+            file_hash = self.calculate_file_hash(file_path)
+            if not file_hash:
+                return None, 0, "Failed to calculate file hash"
+            return file_hash, os.path.getsize(file_path), None
+        except Exception as e:
+            return None, 0, str(e)
+    
     def get_verification_logs(self, file_id):
         """Get verification logs for a file"""
         try:
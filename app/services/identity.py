@@ -0,0 +1,73 @@
+from flask import g
+from flask_login import current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app.models import db, User, Patient, Doctor, Lab
+from app.services.query_cache import get_query_cache
+
+# Profile table behind each role; admins have none
+PROFILE_MODELS = {'patient': Patient, 'doctor': Doctor, 'lab': Lab}
+
+
+def _snapshot(instance):
+    """Column values of a loaded row, safe to keep after its session ends"""
+    if instance is None:
+        return None
+    return type(instance), {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _restore(snapshot):
+    """Attach a snapshot to the current session as a persistent row, without a query"""
+    if snapshot is None:
+        return None
+    model, values = snapshot
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    return db.session.merge(instance, load=False)
+
+
+def _query_identity(user_id):
+    row = db.session.query(User, Patient, Doctor, Lab) \
+        .outerjoin(Patient, Patient.user_id == User.id) \
+        .outerjoin(Doctor, Doctor.user_id == User.id) \
+        .outerjoin(Lab, Lab.user_id == User.id) \
+        .filter(User.id == user_id).first()
+    if row is None:
+        return None, None
+    user, patient, doctor, lab = row
+    profile = {'patient': patient, 'doctor': doctor, 'lab': lab}.get(user.role)
+    return user, profile
+
+
+def load_user_with_profile(user_id):
+    """
+    The User for a session's user id together with its role profile, in one
+    joined query. Identities are kept in the 'identity_cache' QueryCache for a
+    few seconds across requests (and dropped when a change to any user or
+    profile row commits); the profile is also memoized on flask.g for get_current_profile().
+    """
+    user_id = int(user_id)
+    cache = get_query_cache('identity_cache')
+    cached = cache.get(user_id) if cache is not None else None
+    if cached is not None:
+        user, profile = _restore(cached[0]), _restore(cached[1])
+    else:
+        user, profile = _query_identity(user_id)
+        if user is None:
+            return None
+        if cache is not None:
+            cache.set(user_id, (_snapshot(user), _snapshot(profile)))
+
+    model = PROFILE_MODELS.get(user.role)
+    if model is not None:
+        g._role_profiles = {(user.id, model): profile}
+    return user
+
+
+def get_current_profile(model):
+    """current_user's Patient, Doctor or Lab row (or None), looked up at most once per request"""
+    profiles = g.setdefault('_role_profiles', {})
+    key = (current_user.id, model)
+    if key not in profiles:
+        profiles[key] = model.query.filter_by(user_id=current_user.id).first()
+    return profiles[key]
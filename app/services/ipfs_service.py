@@ -1,26 +1,54 @@
 import requests
 import json
+import os
+import uuid
 from flask import current_app
 
 class IPFSService:
     def __init__(self, ipfs_url="http://127.0.0.1:5001"):
         self.ipfs_url = ipfs_url
         
-    def upload_file(self, file_path):
-        """Upload file to IPFS"""
+    def upload_file(self, file_path, filename=None):
+        """Upload file to IPFS, streaming it from disk"""
         try:
             with open(file_path, 'rb') as file:
-                files = {'file': file}
-                response = requests.post(f"{self.ipfs_url}/api/v0/add", files=files)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result['Hash']
-                else:
-                    print(f"Error uploading to IPFS: {response.text}")
-                    # Return mock hash if IPFS is not available
-                    import time
-                    return f"QmMockHash{int(time.time())}"
+                chunks = iter(lambda: file.read(64 * 1024), b'')
+                return self.upload_stream(chunks, filename or os.path.basename(file_path))
+        except OSError as e:
+            print(f"Error uploading file to IPFS: {e}")
+            return None
+    
+    def upload_stream(self, chunks, filename="file"):
+        """
+        Upload file to IPFS from an iterable of byte chunks.
+        The multipart body is sent with chunked transfer encoding as the chunks
+        are produced, so the file is never held in memory as a whole.
+        """
+        boundary = uuid.uuid4().hex
+        
+        def body():
+            yield (f'--{boundary}\r\n'
+                   f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                   f'Content-Type: application/octet-stream\r\n\r\n').encode()
+            for chunk in chunks:
+                yield chunk
+            yield f'\r\n--{boundary}--\r\n'.encode()
+        
+        try:
+            response = requests.post(
+                f"{self.ipfs_url}/api/v0/add",
+                data=body(),
+                headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                return result['Hash']
+            else:
+                print(f"Error uploading to IPFS: {response.text}")
+                # Return mock hash if IPFS is not available
+                import time
+                return f"QmMockHash{int(time.time())}"
         except Exception as e:
             print(f"Error uploading file to IPFS: {e}")
             # Return mock hash if IPFS is not available
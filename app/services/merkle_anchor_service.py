@@ -0,0 +1,229 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from app.models import db, AnchoredFile, MerkleAnchor
+
+# Leaves and inner nodes are hashed with different prefixes so an inner node
+# can never be passed off as a file hash
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def merkle_leaf(file_hash):
+    """Leaf hash for a hex SHA-256 file hash"""
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(file_hash)).digest()
+
+
+def merkle_parent(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_merkle_tree(file_hashes):
+    """
+    Build a Merkle tree over hex file hashes.
+    Returns the list of levels, leaves first and the single root last.
+    An odd node at the end of a level is carried up unchanged.
+    """
+    if not file_hashes:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+    levels = [[merkle_leaf(file_hash) for file_hash in file_hashes]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [merkle_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_proof(levels, index):
+    """Inclusion proof for leaf index: [side, sibling hex] pairs from the leaf up"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(["left" if sibling < index else "right", level[sibling].hex()])
+        index //= 2
+    return proof
+
+
+def verify_merkle_proof(file_hash, proof, root):
+    """Check that file_hash is covered by the hex Merkle root"""
+    node = merkle_leaf(file_hash)
+    for side, sibling in proof:
+        sibling = bytes.fromhex(sibling)
+        node = merkle_parent(sibling, node) if side == "left" else merkle_parent(node, sibling)
+    return node.hex() == root.lower()
+
+
+class MerkleAnchorService:
+    """
+    Anchoring mode for file uploads.
+
+    Instead of one uploadFile transaction per file, file hashes are buffered as
+    pending AnchoredFile rows. Once max_leaves hashes are waiting, or the oldest
+    has waited window_seconds, a Merkle tree is built over them and only its root
+    is written to the contract with anchorRoot. Each file keeps its inclusion
+    proof in the database, so verifying it needs the proof plus one anchored root.
+    """
+
+    def __init__(self, blockchain_service, max_leaves=1000, window_seconds=300, poll_interval=5):
+        self.blockchain_service = blockchain_service
+        self.max_leaves = max_leaves
+        self.window_seconds = window_seconds
+        self.poll_interval = poll_interval
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"files_buffered": 0, "anchors": 0, "files_anchored": 0, "anchor_failures": 0}
+
+    def add_file(self, file_name, file_hash, ipfs_hash=None, file_type=None, file_size=None,
+                 local_path=None, uploaded_by=None, patient_id=None, metadata=None):
+        """Buffer a file hash for the next anchor. Returns the pending AnchoredFile, or None for a duplicate."""
+        if AnchoredFile.query.filter_by(file_hash=file_hash).first():
+            return None
+        record = AnchoredFile(
+            file_name=file_name,
+            file_hash=file_hash,
+            ipfs_hash=ipfs_hash,
+            file_type=file_type,
+            file_size=file_size,
+            local_path=local_path,
+            uploaded_by=uploaded_by,
+            patient_id=str(patient_id) if patient_id is not None else None,
+            file_metadata=metadata
+        )
+        db.session.add(record)
+        db.session.commit()
+        self.stats["files_buffered"] += 1
+
+        # Without the background thread, uploads themselves close the window
+        if not self.is_running() and self.is_due():
+            self.flush()
+        return record
+
+    def pending_query(self):
+        return AnchoredFile.query.filter(AnchoredFile.merkle_anchor_id.is_(None))
+
+    def pending_count(self):
+        return self.pending_query().count()
+
+    def is_due(self):
+        """True once the count window is full or the oldest pending hash has waited long enough"""
+        oldest = self.pending_query().order_by(AnchoredFile.id).first()
+        if oldest is None:
+            return False
+        if self.pending_count() >= self.max_leaves:
+            return True
+        return oldest.created_at <= datetime.utcnow() - timedelta(seconds=self.window_seconds)
+
+    def flush(self):
+        """
+        Anchor up to max_leaves pending hashes under one Merkle root.
+        Returns the MerkleAnchor, or None if nothing was anchored.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return None
+        try:
+            pending = self.pending_query().order_by(AnchoredFile.id).limit(self.max_leaves).all()
+            if not pending:
+                return None
+
+            levels = build_merkle_tree([record.file_hash for record in pending])
+            root = levels[-1][0].hex()
+            result = self.blockchain_service.anchor_merkle_root(root, len(pending))
+            if not result:
+                self.stats["anchor_failures"] += 1
+                print(f"❌ Failed to anchor Merkle root for {len(pending)} files")
+                return None
+
+            anchor = MerkleAnchor(
+                contract_address=self.blockchain_service.contract_address,
+                anchor_id=result["anchor_id"],
+                root=root,
+                leaf_count=len(pending),
+                transaction_hash=result["transaction_hash"],
+                block_number=result.get("block_number")
+            )
+            db.session.add(anchor)
+            db.session.flush()
+            for index, record in enumerate(pending):
+                record.merkle_anchor_id = anchor.id
+                record.leaf_index = index
+                record.proof = json.dumps(merkle_proof(levels, index))
+            db.session.commit()
+
+            self.stats["anchors"] += 1
+            self.stats["files_anchored"] += len(pending)
+            print(f"✅ Anchored {len(pending)} file hashes under Merkle root {root[:16]}... (anchor {anchor.anchor_id})")
+            return anchor
+        except Exception as e:
+            db.session.rollback()
+            self.stats["anchor_failures"] += 1
+            print(f"❌ Error anchoring file hashes: {e}")
+            return None
+        finally:
+            self._flush_lock.release()
+
+    def verify(self, record, current_hash):
+        """
+        Check a file against its anchored record: the hash must match, the stored
+        proof must lead to the anchor's root and that root must be the one on chain.
+        """
+        if not record.is_anchored:
+            return {"success": False, "error": "File is not anchored yet", "status": "pending"}
+
+        anchor = record.merkle_anchor
+        proof = json.loads(record.proof)
+        proof_valid = verify_merkle_proof(record.file_hash, proof, anchor.root)
+        chain_root = self.blockchain_service.get_anchored_root(anchor.anchor_id)
+        if chain_root is None:
+            return {"success": False, "error": "Anchored root not found on blockchain"}
+        root_matches = chain_root.lower() == anchor.root.lower()
+
+        return {
+            "success": True,
+            "is_match": current_hash.lower() == record.file_hash.lower() and proof_valid and root_matches,
+            "hash_matches": current_hash.lower() == record.file_hash.lower(),
+            "proof_valid": proof_valid,
+            "root_matches": root_matches,
+            "anchor": anchor.to_dict()
+        }
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        """Close time windows in a daemon thread until stop() is called"""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(app,), name="merkle-anchor", daemon=True)
+        self._thread.start()
+        print("✅ Merkle anchoring started")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+
+    def _run(self, app):
+        with app.app_context():
+            while not self._stop.is_set():
+                try:
+                    while self.is_due() and self.blockchain_service.ensure_contract() and self.flush():
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Merkle anchoring error: {e}")
+                db.session.remove()
+                self._stop.wait(self.poll_interval)
+
+
+def get_merkle_anchor_service():
+    """Return the app-scoped MerkleAnchorService"""
+    if has_app_context():
+        return current_app.extensions.get('merkle_anchor_service')
+    return None
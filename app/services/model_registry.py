@@ -0,0 +1,147 @@
+import os
+import pickle
+import threading
+import time
+from types import MappingProxyType
+from flask import current_app, has_app_context
+from app.services.retinal_index import CompactRetinalModel, compact_path_for
+
+
+class RetinalModelRegistry:
+    """
+    Process-wide holder for the retinal hash -> diagnosis model.
+
+    The pickle is loaded once and shared read-only by all request threads.
+    At most every check_interval seconds a lookup compares the file's mtime
+    with the loaded copy; a newer file is unpickled off to the side and swapped
+    in with a single reference assignment, so readers never see a half-loaded
+    model. If the new file cannot be loaded the previous model stays in use.
+
+    When a compact index (model.idx, see retinal_index) sits next to the
+    pickle and is not older than it, it is memory-mapped instead, which skips
+    the unpickle entirely.
+    With a loader the registry holds some other file instead, e.g. the
+    perceptual index, loaded as loader(path).
+    """
+
+    def __init__(self, model_path, check_interval=2.0, loader=None, required=True):
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self.loader = loader
+        # Optional files are checked for at the same interval but not reported missing
+        self.required = required
+        self._model = None
+        self._version = None
+        self._failed_version = None
+        self._last_check = 0.0
+        self._checked = False
+        self._load_lock = threading.Lock()
+        self.stats = {
+            "loads": 0,
+            "load_failures": 0,
+            "last_load_seconds": None,
+            "loaded_at": None,
+            "entries": 0,
+            "format": None,
+            "lookups": 0,
+            "hits": 0,
+            "lookup_seconds": 0.0
+        }
+
+    def get(self):
+        """Current model (read-only mapping), loading or hot-reloading it if needed; None if unavailable"""
+        now = time.monotonic()
+        # Until a first check has finished, callers wait for it rather than see no model
+        if (self._model is None and (self.required or not self._checked)) or now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._reload_if_changed()
+            self._checked = True
+        return self._model
+
+    def lookup(self, image_hash):
+        """Model entry for an image hash, or None"""
+        model = self.get()
+        if model is None:
+            return None
+        start = time.perf_counter()
+        result = model.get(image_hash)
+        self.stats["lookup_seconds"] += time.perf_counter() - start
+        self.stats["lookups"] += 1
+        if result is not None:
+            self.stats["hits"] += 1
+        return result
+
+    def _source_path(self):
+        if self.loader is not None:
+            return self.model_path
+        compact_path = compact_path_for(self.model_path)
+        try:
+            compact_mtime = os.stat(compact_path).st_mtime_ns
+        except OSError:
+            return self.model_path
+        try:
+            model_mtime = os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            return compact_path
+        # A pickle replaced after the last conversion wins until model.idx is rebuilt
+        return compact_path if compact_mtime >= model_mtime else self.model_path
+
+    def _reload_if_changed(self):
+        path = self._source_path()
+        try:
+            version = (path, os.stat(path).st_mtime_ns)
+        except OSError as e:
+            if self._model is None and self.required:
+                print(f"Error loading model: {e}")
+            return
+        if version in (self._version, self._failed_version):
+            return
+        # One thread loads; the others keep using the current model meanwhile
+        if not self._load_lock.acquire(blocking=self._model is None):
+            return
+        try:
+            if version != self._version:
+                self._load(version)
+        finally:
+            self._load_lock.release()
+
+    def _load(self, version):
+        path = version[0]
+        start = time.perf_counter()
+        try:
+            if self.loader is not None:
+                model = self.loader(path)
+            elif path.endswith('.idx'):
+                model = CompactRetinalModel(path)
+            else:
+                with open(path, 'rb') as f:
+                    model = MappingProxyType(pickle.load(f))
+        except Exception as e:
+            self._failed_version = version
+            self.stats["load_failures"] += 1
+            print(f"Error loading model: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        self._model = model
+        self._version = version
+        self.stats["loads"] += 1
+        self.stats["last_load_seconds"] = elapsed
+        self.stats["loaded_at"] = time.time()
+        self.stats["entries"] = len(model)
+        extension = os.path.splitext(path)[1]
+        self.stats["format"] = {'.idx': 'compact', '.pkl': 'pickle'}.get(extension, extension.lstrip('.'))
+        print(f"✅ Retinal model loaded from {os.path.basename(path)}: {len(model)} entries in {elapsed * 1000:.1f} ms")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["model_path"] = self._version[0] if self._version else self.model_path
+        stats["avg_lookup_us"] = (self.stats["lookup_seconds"] / self.stats["lookups"] * 1e6
+                                  if self.stats["lookups"] else None)
+        return stats
+
+
+def get_model_registry(name='retinal_model_registry'):
+    """Return an app-scoped RetinalModelRegistry (retinal_model_registry or retinal_phash_registry)"""
+    if has_app_context():
+        return current_app.extensions.get(name)
+    return None
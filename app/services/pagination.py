@@ -0,0 +1,173 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from flask import current_app, request, url_for
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated list.
+
+    items holds at most per_page rows. next_cursor / prev_cursor are opaque
+    strings encoding the sort key of the last / first row, or None at either
+    end of the list; next_url / prev_url link to the neighbouring pages.
+    """
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.next_url = None
+        self.prev_url = None
+        self.first_url = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor for a row's sort key"""
+    payload = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value for value in values],
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Sort key values for columns from a cursor; None if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [_parse(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+def _parse(value, column):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def _nullable(column):
+    return getattr(column.expression, 'nullable', True)
+
+
+def _range(columns, values, lower):
+    """Rows whose key sorts strictly below (or above) values, as one index range"""
+    if len(columns) == 1:
+        return columns[0] < values[0] if lower else columns[0] > values[0]
+    key = tuple_(*columns)
+    return key < tuple_(*values) if lower else key > tuple_(*values)
+
+
+def _walk(query, columns, values, lower, limit):
+    """
+    Up to limit rows past the cursor values, walking towards lower keys or
+    higher ones. Keys that cannot be NULL are one row-value range. A nullable
+    leading column is split into its non-NULL rows and a NULL tail ordered by
+    the remaining columns, each read with its own index range; NULL sorts
+    lowest, so the tail comes after the non-NULL rows when walking down.
+    """
+    lead = columns[0]
+    order = [column.desc() if lower else column.asc() for column in columns]
+    if not _nullable(lead):
+        if values is not None:
+            query = query.filter(_range(columns, values, lower))
+        return query.order_by(*order).limit(limit).all()
+
+    tails = [False, True] if lower else [True, False]
+    rows = []
+    for tail in tails:
+        keys, key_order = (columns[1:], order[1:]) if tail else (columns, order)
+        segment = query.filter(lead.is_(None) if tail else lead.isnot(None))
+        if values is not None:
+            # Skip the segment before the cursor, then start just past it
+            if (values[0] is None) != tail:
+                continue
+            segment = segment.filter(_range(keys, values[1:] if tail else values, lower))
+            values = None
+        rows += segment.order_by(*key_order).limit(limit - len(rows)).all()
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def keyset_paginate(query, columns, per_page=DEFAULT_PAGE_SIZE, after=None, before=None, descending=True):
+    """
+    Page through query ordered by columns (e.g. created_at, id; the last column
+    must be unique) without OFFSET. Rows after the `after` cursor, or the page
+    ending just before the `before` cursor, are found with a row-value
+    comparison on the sort key, so with an index on the key every page costs
+    the same however deep it is and only per_page + 1 rows are ever loaded.
+    Only the first column may be nullable; its NULLs count as the lowest
+    value, so they come last in descending order and first in ascending order.
+    """
+    after_values = decode_cursor(after, columns) if after else None
+    before_values = decode_cursor(before, columns) if before and not after_values else None
+
+    if before_values is not None:
+        # Walk backwards from the cursor, then restore display order
+        rows = _walk(query, columns, before_values, not descending, per_page + 1)
+        more_before = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        more_after = True
+    else:
+        rows = _walk(query, columns, after_values, descending, per_page + 1)
+        more_after = len(rows) > per_page
+        items = rows[:per_page]
+        more_before = after_values is not None
+
+    def cursor_for(row):
+        return encode_cursor([getattr(row, column.key) for column in columns])
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=cursor_for(items[-1]) if items and more_after else None,
+        prev_cursor=cursor_for(items[0]) if items and more_before else None
+    )
+
+
+def paginate_request(query, *columns, descending=True):
+    """
+    keyset_paginate() driven by the current request's ?after=, ?before= and
+    ?per_page= arguments (default LIST_PAGE_SIZE), with links to the
+    neighbouring pages that keep the request's other arguments.
+    """
+    default_size = current_app.config.get('LIST_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    per_page = min(max(request.args.get('per_page', default_size, type=int), 1), MAX_PAGE_SIZE)
+    page = keyset_paginate(query, columns, per_page,
+                           after=request.args.get('after'), before=request.args.get('before'),
+                           descending=descending)
+
+    args = {name: value for name, value in request.args.items() if name not in ('after', 'before')}
+    args.update(request.view_args or {})
+    if page.has_next:
+        page.next_url = url_for(request.endpoint, **args, after=page.next_cursor)
+    if page.has_prev:
+        page.prev_url = url_for(request.endpoint, **args, before=page.prev_cursor)
+        page.first_url = url_for(request.endpoint, **args)
+    return page
@@ -0,0 +1,218 @@
+import json
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+from app.services.retinal_detection import iter_labelled_images
+
+HASH_BITS = 64
+ALGORITHMS = ('phash', 'dhash')
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.astype(np.uint8)).tobytes(), 'big')
+
+
+def dhash(image, hash_size=8):
+    """Difference hash: one bit per horizontally adjacent pixel pair of a (hash_size+1) x hash_size thumbnail"""
+    pixels = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int((pixels[:, 1:] > pixels[:, :-1]).flatten())
+
+
+_dct_matrices = {}
+
+
+def _dct_matrix(size):
+    matrix = _dct_matrices.get(size)
+    if matrix is None:
+        k = np.arange(size)[:, None]
+        n = np.arange(size)[None, :]
+        matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+        matrix[0] /= np.sqrt(2.0)
+        _dct_matrices[size] = matrix
+    return matrix
+
+
+def phash(image, hash_size=8, highfreq_factor=4):
+    """
+    Perceptual hash: the low-frequency hash_size x hash_size block of a 2-D DCT
+    of a grayscale thumbnail, one bit per coefficient above the block's median.
+    Survives re-encoding, resizing and mild brightness changes.
+    """
+    size = hash_size * highfreq_factor
+    pixels = np.asarray(image.convert('L').resize((size, size), Image.LANCZOS), dtype=np.float64)
+    matrix = _dct_matrix(size)
+    low = (matrix @ pixels @ matrix.T)[:hash_size, :hash_size]
+    return _bits_to_int((low > np.median(low)).flatten())
+
+
+def image_hash(image, algorithm='phash'):
+    if algorithm == 'phash':
+        return phash(image)
+    if algorithm == 'dhash':
+        return dhash(image)
+    raise ValueError(f"Unknown perceptual hash algorithm: {algorithm}")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class PerceptualIndex:
+    """
+    Nearest-neighbour index of perceptual image hashes for retinal classification.
+
+    Reference hashes live in a BK-tree: every child edge is labelled with its
+    Hamming distance to the parent, so by the triangle inequality a search
+    within distance t only descends edges labelled d-t..d+t and visits a small
+    fraction of the tree. The tree is stored flattened (children in CSR
+    arrays sorted by edge distance) so save() and load() are array copies and
+    nothing is rebuilt at startup.
+    """
+
+    def __init__(self, algorithm, hashes, labels, label_names, confidences, child_offsets, child_distances, child_nodes):
+        self.algorithm = algorithm
+        self.hashes = hashes
+        self.labels = labels
+        self.label_names = label_names
+        self.confidences = confidences
+        self.child_offsets = child_offsets
+        self.child_distances = child_distances
+        self.child_nodes = child_nodes
+
+    @classmethod
+    def build(cls, entries, algorithm='phash'):
+        """Build from (hash, diagnosis, confidence) entries; identical hashes keep the first entry"""
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown perceptual hash algorithm: {algorithm}")
+        hashes, labels, confidences, children = [], [], [], []
+        label_ids = {}
+        for value, label, confidence in entries:
+            node = 0 if hashes else None
+            while node is not None:
+                distance = hamming(value, hashes[node])
+                if distance == 0:
+                    break
+                child = children[node].get(distance)
+                if child is None:
+                    children[node][distance] = len(hashes)
+                    node = None
+                else:
+                    node = child
+            else:
+                hashes.append(value)
+                labels.append(label_ids.setdefault(label, len(label_ids)))
+                confidences.append(float(confidence))
+                children.append({})
+
+        child_offsets, child_distances, child_nodes = [0], [], []
+        for edges in children:
+            for distance in sorted(edges):
+                child_distances.append(distance)
+                child_nodes.append(edges[distance])
+            child_offsets.append(len(child_nodes))
+        label_names = sorted(label_ids, key=label_ids.get)
+        return cls(algorithm, hashes, labels, label_names, confidences, child_offsets, child_distances, child_nodes)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def nearest(self, value, max_distance=8):
+        """(diagnosis, stored confidence, distance) of the closest reference hash within max_distance, or None"""
+        if not self.hashes:
+            return None
+        best, best_distance = None, max_distance + 1
+        stack = [(0, 0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= best_distance:
+                # The radius shrank since this subtree was queued
+                continue
+            distance = hamming(value, self.hashes[node])
+            if distance < best_distance:
+                best, best_distance = node, distance
+                if distance == 0:
+                    break
+            # Only subtrees whose edge label is within the current radius can hold a closer hash
+            radius = best_distance - 1
+            candidates = []
+            for i in range(self.child_offsets[node], self.child_offsets[node + 1]):
+                edge = self.child_distances[i]
+                if edge > distance + radius:
+                    break
+                if edge >= distance - radius:
+                    candidates.append((abs(edge - distance), self.child_nodes[i]))
+            # Most promising subtree last, so it is searched first and tightens the radius early
+            candidates.sort(reverse=True)
+            stack.extend((child, bound) for bound, child in candidates)
+        if best is None:
+            return None
+        return self.label_names[self.labels[best]], self.confidences[best], best_distance
+
+    def classify(self, image, max_distance=8):
+        """
+        (diagnosis, confidence) for a PIL image by its nearest reference, or None.
+        The stored confidence is scaled down by the fraction of differing bits.
+        """
+        match = self.nearest(image_hash(image, self.algorithm), max_distance)
+        if match is None:
+            return None
+        label, confidence, distance = match
+        return label, round(confidence * (1 - distance / HASH_BITS), 4)
+
+    def save(self, path):
+        """Write the index as an uncompressed .npz, atomically replacing path"""
+        meta = json.dumps({"algorithm": self.algorithm, "label_names": self.label_names}).encode('utf-8')
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    meta=np.frombuffer(meta, dtype=np.uint8),
+                    hashes=np.array(self.hashes, dtype=np.uint64),
+                    labels=np.array(self.labels, dtype=np.uint16),
+                    confidences=np.array(self.confidences, dtype=np.float32),
+                    child_offsets=np.array(self.child_offsets, dtype=np.uint32),
+                    child_distances=np.array(self.child_distances, dtype=np.uint8),
+                    child_nodes=np.array(self.child_nodes, dtype=np.uint32)
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+            # Python lists: the search loop indexes them far faster than NumPy scalars
+            return cls(
+                meta['algorithm'],
+                data['hashes'].tolist(),
+                data['labels'].tolist(),
+                meta['label_names'],
+                [round(c, 6) for c in data['confidences'].tolist()],
+                data['child_offsets'].tolist(),
+                data['child_distances'].tolist(),
+                data['child_nodes'].tolist()
+            )
+
+
+def perceptual_path_for(model_path):
+    return os.path.splitext(model_path)[0] + '.phash'
+
+
+def build_index_from_sources(sources, model, algorithm='phash', label_from_folder=False):
+    """
+    Build a PerceptualIndex from (name, opener) image sources, labelled as in
+    iter_labelled_images. Returns (index, stats).
+    """
+    stats = {"images": 0, "indexed": 0, "unlabelled": 0, "unreadable": 0}
+    entries = (
+        (image_hash(image, algorithm), label, confidence)
+        for image, label, confidence in iter_labelled_images(sources, model, label_from_folder, stats)
+    )
+    index = PerceptualIndex.build(entries, algorithm)
+    stats["indexed"] = len(index)
+    return index, stats
@@ -0,0 +1,112 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Caches to invalidate when rows of their watched models are committed
+_watching = weakref.WeakSet()
+_listener_lock = threading.Lock()
+_listening = False
+
+
+class QueryCache:
+    """
+    Small in-process cache for expensive query results and rendered JSON.
+
+    Entries live for at most ttl seconds, the least recently used are dropped
+    beyond max_entries, and with watch(...) every commit that inserts, updates
+    or deletes a watched model clears the cache, so this process never serves
+    stale rows. Clearing waits for the commit: cleared at flush time, a
+    concurrent request could re-cache the rows before the change is visible.
+    Other worker processes rely on the TTL.
+    """
+
+    def __init__(self, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.watched = ()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats["invalidations"] += 1
+
+    def watch(self, *models):
+        """Clear this cache whenever a session commits changes to any of these models"""
+        self.watched = tuple(set(self.watched) | set(models))
+        _watching.add(self)
+        _listen()
+        return self
+
+
+def _listen():
+    global _listening
+    with _listener_lock:
+        if not _listening:
+            event.listen(Session, 'after_flush', _after_flush)
+            event.listen(Session, 'after_commit', _after_commit)
+            event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
+            _listening = True
+
+
+def _after_flush(session, flush_context):
+    # Only note the models here; their rows are not visible to other sessions yet
+    changed = {type(obj) for obj in (*session.new, *session.dirty, *session.deleted)}
+    if changed:
+        session.info.setdefault('query_cache_models', set()).update(changed)
+
+
+def _clear_changed(session):
+    changed = session.info.pop('query_cache_models', None)
+    if not changed:
+        return
+    for cache in list(_watching):
+        if any(issubclass(model, cache.watched) for model in changed):
+            cache.clear()
+
+
+def _after_commit(session):
+    _clear_changed(session)
+
+
+def _after_soft_rollback(session, previous_transaction):
+    # Reads inside the rolled-back transaction may have cached its flushed rows
+    if not session.in_transaction():
+        _clear_changed(session)
+
+
+def get_query_cache(name):
+    """Return an app-scoped QueryCache by extension name"""
+    if has_app_context():
+        return current_app.extensions.get(name)
+    return None
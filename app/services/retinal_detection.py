@@ -0,0 +1,238 @@
+import hashlib
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PIL import Image
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
+# Bytes handed to MD5 per update; large enough that hashlib releases the GIL
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_IMAGE_SIZE = 64 * 1024 * 1024
+
+
+def is_image_name(name):
+    return '.' in name and name.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+def classify_hash(model, image_hash):
+    """Diagnosis and confidence for an image hash from a loaded model (dict or compact)"""
+    result = model.get(image_hash)
+    if result is None:
+        return "Unknown", 0.0
+    # result can be a string or a tuple (diagnosis, confidence)
+    if isinstance(result, tuple):
+        return result[0], float(result[1])
+    return result, 1.0
+
+
+def classify_unmatched(image, perceptual_index=None, engine=None, max_distance=8):
+    """
+    Diagnosis for a decoded scan whose MD5 is not in the model: the nearest
+    reference by perceptual hash if one is close enough, else the image
+    classifier. Returns ((diagnosis, confidence), 'perceptual' | 'classifier')
+    or (None, None).
+    """
+    if perceptual_index is not None:
+        result = perceptual_index.classify(image, max_distance)
+        if result is not None:
+            return result, "perceptual"
+    if engine is not None:
+        result = engine.classify(image)
+        if result is not None:
+            return result, "classifier"
+    return None, None
+
+
+def upload_sources(files):
+    """(name, opener) pairs for uploaded FileStorage objects"""
+    return [(file.filename, lambda file=file: file.stream) for file in files if file and is_image_name(file.filename)]
+
+
+def zip_sources(archive, max_image_size=MAX_IMAGE_SIZE):
+    """
+    (name, opener) pairs for the images in a zip archive. Entries are read
+    straight from the archive when classified; members whose declared size
+    exceeds max_image_size are reported instead of being inflated.
+    """
+    sources = []
+    for info in archive.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith('__MACOSX/') or not is_image_name(name):
+            continue
+        if info.file_size > max_image_size:
+            sources.append((name, None))
+        else:
+            sources.append((name, lambda info=info: archive.open(info)))
+    return sources
+
+
+def path_sources(paths):
+    """(name, opener) pairs for image files, directories (recursively) and zip archives on disk"""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if is_image_name(name):
+                        file_path = os.path.join(root, name)
+                        sources.append((file_path, lambda file_path=file_path: open(file_path, 'rb')))
+        elif zipfile.is_zipfile(path):
+            archive = zipfile.ZipFile(path)
+            sources.extend((f"{path}:{name}", opener) for name, opener in zip_sources(archive))
+        elif is_image_name(path):
+            sources.append((path, lambda path=path: open(path, 'rb')))
+    return sources
+
+
+def _folder_name(name):
+    """Name of the folder an image sits in, for paths on disk and 'archive.zip:dir/img' members"""
+    parts = name.replace(os.sep, '/').rsplit(':', 1)[-1].split('/')
+    return parts[-2] if len(parts) > 1 else None
+
+
+def iter_labelled_images(sources, model, label_from_folder=False, stats=None):
+    """
+    Decoded (image, diagnosis, confidence) for labelled reference images from
+    (name, opener) sources. An image is labelled by its MD5 in the exact-match
+    model or, with label_from_folder, by the name of the folder it sits in.
+    Counts images, unlabelled and unreadable ones in stats if given.
+    """
+    stats = stats if stats is not None else {}
+    for key in ("images", "unlabelled", "unreadable"):
+        stats.setdefault(key, 0)
+    for name, opener in sources:
+        stats["images"] += 1
+        if opener is None:
+            stats["unreadable"] += 1
+            continue
+        try:
+            with opener() as stream:
+                data = stream.read()
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except Exception:
+            stats["unreadable"] += 1
+            continue
+        label, confidence = classify_hash(model, hashlib.md5(data).hexdigest()) if model is not None else ("Unknown", 0.0)
+        if label == "Unknown":
+            if not (label_from_folder and _folder_name(name)):
+                stats["unlabelled"] += 1
+                continue
+            label, confidence = _folder_name(name), 1.0
+        yield image, label, confidence
+
+
+class RetinalBatchDetector:
+    """
+    Classifies many retinal images at once.
+
+    Each image is MD5-hashed in chunks as it is read (from an upload, a zip
+    member or a file on disk), so nothing is written to temp files, and looked
+    up in the shared model from the model registry. Images are hashed on a
+    thread pool; results are yielded as they complete so callers can stream
+    progress. Images without an exact match are decoded from the bytes already
+    read and passed to classify_unmatched (perceptual index, then the image
+    classifier engine) when either is available.
+    """
+
+    def __init__(self, model_registry, workers=4, max_image_size=MAX_IMAGE_SIZE,
+                 perceptual_registry=None, max_distance=8, engine=None):
+        self.model_registry = model_registry
+        self.workers = workers
+        self.max_image_size = max_image_size
+        self.perceptual_registry = perceptual_registry
+        self.max_distance = max_distance
+        self.engine = engine
+
+    def hash_source(self, opener, keep=None):
+        """MD5 and size of a source; chunks are appended to keep if given"""
+        digest = hashlib.md5()
+        size = 0
+        stream = opener()
+        try:
+            while True:
+                chunk = stream.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_image_size:
+                    raise ValueError("Image too large")
+                digest.update(chunk)
+                if keep is not None:
+                    keep.append(chunk)
+        finally:
+            stream.close()
+        return digest.hexdigest(), size
+
+    def _classify_unmatched(self, perceptual_index, data):
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                return classify_unmatched(image, perceptual_index, self.engine, self.max_distance)
+        except (OSError, ValueError):
+            # Not a decodable image; it stays Unknown like any other miss
+            return None, None
+
+    def _detect_one(self, model, perceptual_index, index, name, opener):
+        result = {"index": index, "filename": name}
+        if opener is None:
+            result.update(success=False, error="Image too large")
+            return result
+        try:
+            fallback = perceptual_index is not None or (self.engine is not None and self.engine.is_available())
+            chunks = [] if fallback else None
+            image_hash, size = self.hash_source(opener, chunks)
+            diagnosis, confidence = classify_hash(model, image_hash)
+            match = "exact"
+            if diagnosis == "Unknown" and fallback:
+                unmatched, kind = self._classify_unmatched(perceptual_index, b''.join(chunks))
+                if unmatched is not None:
+                    (diagnosis, confidence), match = unmatched, kind
+            result.update(success=True, diagnosis=diagnosis, confidence=confidence,
+                          image_hash=image_hash, size=size,
+                          match=match if diagnosis != "Unknown" else None)
+        except Exception as e:
+            result.update(success=False, error=str(e))
+        return result
+
+    def detect(self, sources):
+        """
+        Iterator of one result dict per (name, opener) source, in completion order.
+        The whole batch is classified against one model snapshot, even if the
+        registry reloads meanwhile. Raises RuntimeError if no model is loaded.
+        """
+        model = self.model_registry.get() if self.model_registry is not None else None
+        if model is None:
+            raise RuntimeError("Model not available")
+        perceptual_index = self.perceptual_registry.get() if self.perceptual_registry is not None else None
+        return self._detect_iter(model, perceptual_index, sources)
+
+    def _detect_iter(self, model, perceptual_index, sources):
+        if not sources:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(sources)))) as pool:
+            futures = [pool.submit(self._detect_one, model, perceptual_index, index, name, opener)
+                       for index, (name, opener) in enumerate(sources)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    @staticmethod
+    def summarize(results, seconds):
+        classified = sum(1 for r in results if r["success"] and r["diagnosis"] != "Unknown")
+        failed = sum(1 for r in results if not r["success"])
+        return {
+            "images": len(results),
+            "classified": classified,
+            "unknown": len(results) - classified - failed,
+            "failed": failed,
+            "seconds": round(seconds, 3),
+            "images_per_second": round(len(results) / seconds, 1) if seconds > 0 else None
+        }
+
+    def detect_all(self, sources):
+        """Classify every source and return (results in input order, summary)"""
+        start = time.perf_counter()
+        results = sorted(self.detect(sources), key=lambda r: r["index"])
+        return results, self.summarize(results, time.perf_counter() - start)
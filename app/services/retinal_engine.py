@@ -0,0 +1,239 @@
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from PIL import Image
+from flask import current_app, has_app_context
+
+# Side of the square grayscale input the classifier sees
+INPUT_SIZE = 64
+
+
+def _thumbnail(image, size):
+    # JPEGs not yet decoded are decoded straight to a reduced grayscale draft;
+    # reducing_gap lets PIL shrink by whole factors before the filtered resize
+    image.draft('L', (size * 2, size * 2))
+    return np.asarray(image.convert('L').resize((size, size), Image.BILINEAR, reducing_gap=2.0), dtype=np.uint8)
+
+
+def preprocess(images, size=INPUT_SIZE):
+    """
+    Feature matrix for a batch of PIL images: grayscale, resized to size x size,
+    flattened and standardised per image, as float32 rows. Only the resize
+    is per image; the normalisation runs once over the whole batch.
+    """
+    pixels = np.stack([_thumbnail(image, size) for image in images]).reshape(len(images), -1).astype(np.float32)
+    pixels -= pixels.mean(axis=1, keepdims=True)
+    pixels /= pixels.std(axis=1, keepdims=True) + 1e-6
+    return pixels
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class SoftmaxClassifier:
+    """
+    Multinomial logistic regression over preprocessed pixels, in pure NumPy.
+    A batch is one matrix product, so cost per image falls with batch size.
+    """
+
+    def __init__(self, classes, weights, bias, input_size=INPUT_SIZE):
+        self.classes = list(classes)
+        self.weights = weights
+        self.bias = bias
+        self.input_size = input_size
+
+    def __len__(self):
+        return len(self.classes)
+
+    def predict_proba(self, features):
+        return _softmax(features @ self.weights + self.bias)
+
+    def predict(self, features, min_confidence=0.0):
+        """(diagnosis, confidence) per feature row, or None where the best class is below min_confidence"""
+        probabilities = self.predict_proba(features)
+        best = probabilities.argmax(axis=1)
+        return [(self.classes[i], round(float(p[i]), 4)) if p[i] >= min_confidence else None
+                for i, p in zip(best, probabilities)]
+
+    @classmethod
+    def train(cls, features, labels, epochs=300, learning_rate=0.5, l2=1e-3, input_size=INPUT_SIZE):
+        """Fit by full-batch gradient descent on cross-entropy with L2 regularisation"""
+        classes = sorted(set(labels))
+        class_ids = {name: i for i, name in enumerate(classes)}
+        targets = np.zeros((len(labels), len(classes)), dtype=np.float32)
+        targets[np.arange(len(labels)), [class_ids[label] for label in labels]] = 1.0
+        weights = np.zeros((features.shape[1], len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        scale = learning_rate / len(labels)
+        for _ in range(epochs):
+            error = _softmax(features @ weights + bias) - targets
+            weights -= scale * (features.T @ error) + learning_rate * l2 * weights
+            bias -= scale * error.sum(axis=0)
+        return cls(classes, weights, bias, input_size)
+
+    def save(self, path):
+        """Write the weights as an uncompressed .npz, atomically replacing path"""
+        meta = json.dumps({"classes": self.classes, "input_size": self.input_size}).encode('utf-8')
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, meta=np.frombuffer(meta, dtype=np.uint8), weights=self.weights, bias=self.bias)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+            return cls(meta['classes'], data['weights'], data['bias'], meta['input_size'])
+
+
+def classifier_path_for(model_path):
+    return os.path.splitext(model_path)[0] + '.classifier.npz'
+
+
+class MicroBatcher:
+    """
+    Groups single-image predictions from concurrent callers into batches.
+
+    submit() queues a feature row and returns a Future. One daemon thread
+    takes the first waiting row, gathers more until max_batch rows or
+    max_wait seconds have passed, runs predict_batch once on the stacked
+    rows and resolves every Future. Under load batches fill instantly;
+    a lone request waits at most max_wait.
+    """
+
+    def __init__(self, predict_batch, max_batch=32, max_wait=0.005):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self.stats = {"batches": 0, "images": 0, "largest_batch": 0}
+
+    def submit(self, features):
+        future = Future()
+        self.start()
+        self._queue.put((features, future))
+        return future
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._thread = threading.Thread(target=self._run, name="retinal-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self.is_running():
+            self._queue.put(None)
+            self._thread.join(timeout=1)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            futures = [future for _, future in batch]
+            try:
+                results = self.predict_batch(np.stack([features for features, _ in batch]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+            self.stats["batches"] += 1
+            self.stats["images"] += len(batch)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+
+
+class RetinalClassifierEngine:
+    """
+    Image classifier behind classify_retinal_disease for scans no hash matches.
+
+    The classifier weights are held warm by a model registry (and hot-reloaded
+    like the hash model). Request threads decode and preprocess their own image,
+    then hand the feature row to a MicroBatcher so concurrent requests share
+    one matrix product. classify_batch() skips the batcher for callers that
+    already hold many images. Predictions whose probability is below
+    min_confidence give no diagnosis, so the scan stays Unknown.
+    """
+
+    def __init__(self, classifier_registry, max_batch=32, max_wait=0.005, min_confidence=0.0):
+        self.classifier_registry = classifier_registry
+        self.min_confidence = min_confidence
+        self.batcher = MicroBatcher(self._predict_batch, max_batch=max_batch, max_wait=max_wait)
+
+    def classifier(self):
+        return self.classifier_registry.get() if self.classifier_registry is not None else None
+
+    def is_available(self):
+        return self.classifier() is not None
+
+    def _predict_batch(self, features):
+        classifier = self.classifier()
+        if classifier is None:
+            return [None] * len(features)
+        return classifier.predict(features, self.min_confidence)
+
+    def classify(self, image, timeout=30):
+        """(diagnosis, confidence) for one PIL image, batched with concurrent callers; None without a classifier or below min_confidence"""
+        classifier = self.classifier()
+        if classifier is None:
+            return None
+        features = preprocess([image], classifier.input_size)[0]
+        return self.batcher.submit(features).result(timeout=timeout)
+
+    def classify_batch(self, images):
+        """(diagnosis, confidence) per PIL image in one pass; None entries without a classifier or below min_confidence"""
+        classifier = self.classifier()
+        if classifier is None:
+            return [None] * len(images)
+        return classifier.predict(preprocess(images, classifier.input_size), self.min_confidence)
+
+    def get_stats(self):
+        stats = dict(self.batcher.stats)
+        stats["avg_batch"] = round(stats["images"] / stats["batches"], 2) if stats["batches"] else None
+        stats["classifier"] = self.classifier_registry.get_stats() if self.classifier_registry is not None else None
+        return stats
+
+
+def get_retinal_engine():
+    """Return the app-scoped RetinalClassifierEngine"""
+    if has_app_context():
+        return current_app.extensions.get('retinal_engine')
+    return None
@@ -0,0 +1,181 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+
+# File layout (little-endian):
+#   header      MAGIC, entry count, label table size
+#   label table JSON list of diagnosis names, padded to 16 bytes
+#   keys        count x 16-byte MD5 digests, sorted
+#   labels      count x uint8 index into the label table, padded to 4 bytes
+#   confidences count x float32
+MAGIC = b'RTNLIDX1'
+HEADER = struct.Struct('<8sII')
+DIGEST_SIZE = 16
+
+
+def _pad(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def _layout(count, label_table_size):
+    """Byte offsets of the key, label and confidence sections"""
+    keys = _pad(HEADER.size + label_table_size, 16)
+    labels = keys + count * DIGEST_SIZE
+    confidences = _pad(labels + count, 4)
+    return keys, labels, confidences, confidences + count * 4
+
+
+def _split_entry(value):
+    # Model values are a diagnosis or a (diagnosis, confidence) tuple
+    if isinstance(value, (tuple, list)):
+        return str(value[0]), float(value[1])
+    return str(value), 1.0
+
+
+def write_compact_model(model, out_path):
+    """
+    Write a hex-MD5 -> diagnosis mapping in the compact format. The file is
+    written next to out_path and renamed into place, so processes that have
+    the old file mapped keep a consistent view.
+    """
+    entries = {}
+    for key, value in model.items():
+        digest = bytes.fromhex(key)
+        if len(digest) != DIGEST_SIZE:
+            raise ValueError(f"Not an MD5 hex digest: {key!r}")
+        entries[digest] = _split_entry(value)
+
+    names = sorted({label for label, _ in entries.values()})
+    if len(names) > 256:
+        raise ValueError("The compact format supports at most 256 diagnoses")
+    label_ids = {name: index for index, name in enumerate(names)}
+    label_table = json.dumps(names).encode('utf-8')
+
+    digests = sorted(entries)
+    labels = bytes(label_ids[entries[digest][0]] for digest in digests)
+    confidences = array('f', (entries[digest][1] for digest in digests))
+    if confidences.itemsize != 4:
+        raise RuntimeError("float32 array type is not 4 bytes on this platform")
+    if struct.pack('=I', 1) != struct.pack('<I', 1):
+        confidences.byteswap()
+
+    keys_at, labels_at, confidences_at, _ = _layout(len(digests), len(label_table))
+    directory = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(digests), len(label_table)))
+            f.write(label_table)
+            f.write(b'\x00' * (keys_at - f.tell()))
+            f.write(b''.join(digests))
+            f.write(labels)
+            f.write(b'\x00' * (confidences_at - f.tell()))
+            f.write(confidences.tobytes())
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(digests)
+
+
+def convert_pickle_model(pickle_path, out_path=None):
+    """Convert a pickled dict model to the compact format. Returns (out_path, entries)."""
+    import pickle
+    with open(pickle_path, 'rb') as f:
+        model = pickle.load(f)
+    out_path = out_path or compact_path_for(pickle_path)
+    return out_path, write_compact_model(model, out_path)
+
+
+def compact_path_for(pickle_path):
+    return os.path.splitext(pickle_path)[0] + '.idx'
+
+
+class _DigestKeys:
+    """Sequence view of the sorted digest section, for bisect"""
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        start = self.offset + index * DIGEST_SIZE
+        return self.buffer[start:start + DIGEST_SIZE]
+
+
+class CompactRetinalModel:
+    """
+    Read-only, memory-mapped view of a compact model file.
+
+    Nothing is parsed beyond the header and label table; lookups binary-search
+    the sorted digests directly in the mapping, so opening is near-instant and
+    every process mapping the same file shares its pages through the OS cache.
+    Supports the parts of the dict interface the classifier uses, returning
+    (diagnosis, confidence) tuples.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, count, label_table_size = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a compact retinal model")
+            table_end = HEADER.size + label_table_size
+            self.label_names = json.loads(self._mmap[HEADER.size:table_end].decode('utf-8'))
+            keys_at, self._labels_at, self._confidences_at, size = _layout(count, label_table_size)
+            if len(self._mmap) < size:
+                raise ValueError(f"{path} is truncated")
+        except Exception:
+            self._mmap.close()
+            raise
+        self.count = count
+        self._keys = _DigestKeys(self._mmap, keys_at, count)
+
+    def _index(self, image_hash):
+        try:
+            digest = bytes.fromhex(image_hash)
+        except (TypeError, ValueError):
+            return None
+        index = bisect_left(self._keys, digest)
+        if index < self.count and self._keys[index] == digest:
+            return index
+        return None
+
+    def _entry(self, index):
+        label = self.label_names[self._mmap[self._labels_at + index]]
+        confidence, = struct.unpack_from('<f', self._mmap, self._confidences_at + index * 4)
+        return label, round(confidence, 6)
+
+    def get(self, image_hash, default=None):
+        index = self._index(image_hash)
+        return default if index is None else self._entry(index)
+
+    def __getitem__(self, image_hash):
+        index = self._index(image_hash)
+        if index is None:
+            raise KeyError(image_hash)
+        return self._entry(index)
+
+    def __contains__(self, image_hash):
+        return self._index(image_hash) is not None
+
+    def __len__(self):
+        return self.count
+
+    def keys(self):
+        for index in range(self.count):
+            yield self._keys[index].hex()
+
+    def items(self):
+        for index in range(self.count):
+            yield self._keys[index].hex(), self._entry(index)
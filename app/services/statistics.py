@@ -0,0 +1,218 @@
+import threading
+from datetime import date, datetime, time, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import db, User, Patient, Doctor, MedicalRecord, Consultation, StatBucket
+
+# Metric name -> (model, column whose day the row is counted under)
+METRICS = {
+    'users': (User, 'created_at'),
+    'patients': (Patient, 'created_at'),
+    'doctors': (Doctor, 'created_at'),
+    'records': (MedicalRecord, 'created_at'),
+    'consultations': (Consultation, 'date'),  # appointment day, so future bookings count too
+}
+
+# Days kept in the snapshot for weekly and monthly figures
+SNAPSHOT_DAYS = 31
+
+
+def _as_day(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _day_filter(column, day):
+    """Rows of column falling on day; a range on datetime columns so their index is used"""
+    if column.type.python_type is datetime:
+        start = datetime.combine(day, time.min)
+        return (column >= start) & (column < start + timedelta(days=1))
+    return column == day
+
+
+def count_day(connection, metric, day):
+    model, attribute = METRICS[metric]
+    column = getattr(model, attribute)
+    query = db.select(func.count()).select_from(model).where(_day_filter(column, day))
+    return connection.execute(query).scalar()
+
+
+def store_bucket(engine, metric, day):
+    """Recount one day of one metric and write its bucket. Idempotent, so racing writers agree."""
+    table = StatBucket.__table__
+    for _ in range(2):
+        try:
+            with engine.begin() as connection:
+                count = count_day(connection, metric, day)
+                values = {'count': count, 'updated_at': datetime.utcnow()}
+                updated = connection.execute(
+                    table.update().where((table.c.metric == metric) & (table.c.day == day)).values(**values)
+                ).rowcount
+                if not updated:
+                    connection.execute(table.insert().values(metric=metric, day=day, **values))
+            return count
+        except IntegrityError:
+            # Another process inserted the bucket first; recount and update it
+            continue
+    return None
+
+
+def rebuild_buckets(engine, metrics=None):
+    """Recompute every bucket of the given metrics (default: all) from the source tables"""
+    table = StatBucket.__table__
+    with engine.begin() as connection:
+        for metric in metrics or METRICS:
+            model, attribute = METRICS[metric]
+            column = getattr(model, attribute)
+            day = func.date(column) if column.type.python_type is datetime else column
+            rows = connection.execute(
+                db.select(day, func.count()).select_from(model).where(column.isnot(None)).group_by(day)
+            ).all()
+            connection.execute(table.delete().where(table.c.metric == metric))
+            now = datetime.utcnow()
+            buckets = [{'metric': metric, 'day': _as_day(row[0]), 'count': row[1], 'updated_at': now}
+                       for row in rows]
+            if buckets:
+                connection.execute(table.insert(), buckets)
+
+
+def _mark(target, *values):
+    session = inspect(target).session
+    if session is None:
+        return
+    metric = _metric_names[type(target)]
+    days = session.info.setdefault('stat_days', set())
+    for value in values:
+        days.add((metric, _as_day(value) or datetime.utcnow().date()))
+
+
+def _counted_value(connection, target):
+    """The counted column of target, read without a lazy load in the middle of a flush"""
+    model, attribute = METRICS[_metric_names[type(target)]]
+    state = inspect(target)
+    if attribute in state.dict:
+        return state.dict[attribute]
+    return connection.execute(db.select(getattr(model, attribute)).where(model.id == target.id)).scalar()
+
+
+def _after_insert(mapper, connection, target):
+    _mark(target, _counted_value(connection, target))
+
+
+def _after_update(mapper, connection, target):
+    # Only a change of the counted column moves a row between buckets
+    attribute = METRICS[_metric_names[type(target)]][1]
+    history = inspect(target).attrs[attribute].history
+    if history.has_changes():
+        _mark(target, *history.added, *history.deleted)
+
+
+def _before_delete(mapper, connection, target):
+    _mark(target, _counted_value(connection, target))
+
+
+def _after_commit(session):
+    days = session.info.pop('stat_days', None)
+    if not days:
+        return
+    engine = session.get_bind()
+    for metric, day in sorted(days):
+        try:
+            store_bucket(engine, metric, day)
+        except Exception as e:
+            # The commit itself succeeded; a missed bucket is fixed by the next rebuild
+            print(f"❌ Could not update {metric} statistics for {day}: {e}")
+
+
+def _after_soft_rollback(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('stat_days', None)
+
+
+_metric_names = {model: metric for metric, (model, _) in METRICS.items()}
+for _model in _metric_names:
+    event.listen(_model, 'after_insert', _after_insert)
+    event.listen(_model, 'after_update', _after_update)
+    event.listen(_model, 'before_delete', _before_delete)
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
+
+
+class StatisticsService:
+    """
+    Admin dashboard and report figures read from precomputed daily buckets.
+
+    Every commit that inserts, deletes or re-dates a counted row recounts just
+    the affected days (an indexed range count) and stores them in StatBucket,
+    so buckets stay exact across worker processes. Pages read an in-memory
+    snapshot of the totals and the last SNAPSHOT_DAYS days of buckets, rebuilt
+    from StatBucket at most every max_age seconds; its age is shown as the
+    figures' staleness. Bulk query.delete() calls bypass the hooks and are
+    corrected by rebuild().
+    """
+
+    def __init__(self, max_age=30):
+        self.max_age = max_age
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        """Recount every bucket from the source tables"""
+        rebuild_buckets(db.engine)
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None or (datetime.utcnow() - snapshot['refreshed_at']).total_seconds() >= self.max_age:
+            snapshot = self._load()
+            with self._lock:
+                self._snapshot = snapshot
+        return snapshot
+
+    def _load(self):
+        totals = dict(db.session.query(StatBucket.metric, func.sum(StatBucket.count)).group_by(StatBucket.metric).all())
+        if not totals:
+            # First run against an existing database: backfill the buckets once
+            rebuild_buckets(db.engine)
+            totals = dict(db.session.query(StatBucket.metric, func.sum(StatBucket.count)).group_by(StatBucket.metric).all())
+        since = datetime.utcnow().date() - timedelta(days=SNAPSHOT_DAYS)
+        daily = {metric: {} for metric in METRICS}
+        for metric, day, count in db.session.query(StatBucket.metric, StatBucket.day, StatBucket.count) \
+                .filter(StatBucket.day >= since):
+            daily.setdefault(metric, {})[day] = count
+        return {
+            'totals': {metric: int(totals.get(metric) or 0) for metric in METRICS},
+            'daily': daily,
+            'refreshed_at': datetime.utcnow()
+        }
+
+    def total(self, metric):
+        return self.snapshot()['totals'][metric]
+
+    def count_since(self, metric, day):
+        """Rows of metric counted on day or later (within the snapshot window)"""
+        return sum(count for bucket_day, count in self.snapshot()['daily'][metric].items() if bucket_day >= day)
+
+    def age_seconds(self):
+        return int((datetime.utcnow() - self.snapshot()['refreshed_at']).total_seconds())
+
+
+def get_statistics_service():
+    """Return the app-scoped StatisticsService"""
+    if has_app_context():
+        service = current_app.extensions.get('statistics_service')
+        if service is not None:
+            return service
+    return StatisticsService()
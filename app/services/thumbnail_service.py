@@ -0,0 +1,184 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from PIL import Image
+from flask import current_app, has_app_context
+
+# Longest side in pixels for each served size
+THUMBNAIL_SIZES = {'thumb': 160, 'preview': 800}
+
+
+class ThumbnailService:
+    """
+    Downscaled JPEG renditions of lab scans for list and detail pages.
+
+    Renditions are written under static/uploads/thumbs/<size>/<aa>/<key>.jpg,
+    keyed by the scan's content hash (blob store images) or by its path (older
+    uploads). New uploads get every size at once from a single decode; other
+    images are rendered on first request. The disk cache is bounded by
+    max_disk_bytes and evicts least recently served files; recently served
+    renditions are also kept in an in-memory LRU so hot list pages skip disk.
+    """
+
+    def __init__(self, sizes=None, relative_root='uploads/thumbs', max_disk_bytes=512 * 1024 * 1024,
+                 max_memory_bytes=32 * 1024 * 1024, quality=82):
+        self.sizes = dict(sizes or THUMBNAIL_SIZES)
+        self.relative_root = relative_root
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.quality = quality
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "rendered": 0, "evicted": 0}
+
+    @property
+    def static_root(self):
+        return os.path.join(current_app.root_path, 'static')
+
+    def cache_key(self, image_path):
+        """Content hash for blob store paths (<sha256>.<ext>), else a hash of the path"""
+        name = os.path.splitext(os.path.basename(image_path))[0]
+        if len(name) == 64 and all(c in '0123456789abcdef' for c in name):
+            return name
+        return hashlib.sha256(image_path.encode('utf-8')).hexdigest()
+
+    def thumbnail_path(self, key, size):
+        return f"{self.relative_root}/{size}/{key[:2]}/{key}.jpg"
+
+    def _absolute(self, relative_path):
+        return os.path.join(self.static_root, *relative_path.split('/'))
+
+    def generate(self, image_path, sizes=None):
+        """
+        Render the given sizes (default: all) for a static-relative image path,
+        decoding the source once and shrinking from the largest size down.
+        Returns {size: JPEG bytes}.
+        """
+        key = self.cache_key(image_path)
+        sizes = sorted(sizes or self.sizes, key=lambda size: self.sizes[size], reverse=True)
+        rendered = {}
+        with Image.open(self._absolute(image_path)) as source:
+            largest = self.sizes[sizes[0]]
+            # JPEG sources decode straight to a reduced draft
+            source.draft('RGB', (largest * 2, largest * 2))
+            image = source.convert('RGB')
+        for size in sizes:
+            image.thumbnail((self.sizes[size], self.sizes[size]), Image.LANCZOS, reducing_gap=2.0)
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=self.quality, optimize=True)
+            data = buffer.getvalue()
+            self._write(self.thumbnail_path(key, size), data)
+            self._remember((key, size), data)
+            rendered[size] = data
+        self.stats["rendered"] += len(sizes)
+        self._evict_disk()
+        return rendered
+
+    def get(self, image_path, size):
+        """JPEG bytes of one size for a static-relative image path, rendering it if needed; None if the image is gone"""
+        if size not in self.sizes:
+            raise ValueError(f"Unknown thumbnail size: {size}")
+        key = self.cache_key(image_path)
+        with self._lock:
+            data = self._memory.get((key, size))
+            if data is not None:
+                self._memory.move_to_end((key, size))
+                self.stats["memory_hits"] += 1
+                return data
+
+        path = self._absolute(self.thumbnail_path(key, size))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # last served time drives disk eviction
+            self.stats["disk_hits"] += 1
+            self._remember((key, size), data)
+            return data
+        except OSError:
+            pass
+
+        if not os.path.exists(self._absolute(image_path)):
+            return None
+        return self.generate(image_path, [size])[size]
+
+    def _remember(self, cache_key, data):
+        with self._lock:
+            old = self._memory.pop(cache_key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[cache_key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _write(self, relative_path, data):
+        path = self._absolute(relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data) - previous
+
+    def _cache_files(self):
+        root = self._absolute(self.relative_root)
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith('.jpg'):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _evict_disk(self):
+        """Delete least recently served renditions once the cache exceeds max_disk_bytes"""
+        with self._lock:
+            if self._disk_bytes is None:
+                # First write in this process: size the existing cache once
+                self._disk_bytes = sum(size for _, size, _ in self._cache_files())
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            # Trim to 90% so eviction does not run on every new rendition
+            target = self.max_disk_bytes * 0.9
+            for _, size, path in sorted(self._cache_files()):
+                if self._disk_bytes <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._disk_bytes -= size
+                self.stats["evicted"] += 1
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["memory_bytes"] = self._memory_bytes
+        stats["disk_bytes"] = self._disk_bytes
+        return stats
+
+
+def get_thumbnail_service():
+    """Return the app-scoped ThumbnailService"""
+    if has_app_context():
+        service = current_app.extensions.get('thumbnail_service')
+        if service is not None:
+            return service
+    return ThumbnailService()
@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class TransactionReverted(Exception):
+    """A transaction was mined but failed (receipt status 0)"""
+
+    def __init__(self, receipt):
+        super().__init__(f"Transaction {receipt['transactionHash'].hex()} reverted in block {receipt['blockNumber']}")
+        self.receipt = receipt
+
+
+class NonceManager:
+    """
+    Hands out transaction nonces locally, one counter per signing account.
+    The counter is seeded from the node's pending transaction count and
+    only re-read from the node after a failed send or a reset.
+    """
+
+    def __init__(self, web3_getter):
+        self._web3_getter = web3_getter
+        self._lock = threading.Lock()
+        self._next_nonce = {}
+        self.stats = {"allocated": 0, "resyncs": 0}
+
+    def allocate(self, account):
+        """Return the next nonce for account, atomically"""
+        with self._lock:
+            if account not in self._next_nonce:
+                self._next_nonce[account] = self._web3_getter().eth.get_transaction_count(account, 'pending')
+                self.stats["resyncs"] += 1
+            nonce = self._next_nonce[account]
+            self._next_nonce[account] = nonce + 1
+            self.stats["allocated"] += 1
+            return nonce
+
+    def resync(self, account):
+        """Forget the local counter so the next allocation re-reads it from the node"""
+        with self._lock:
+            self._next_nonce.pop(account, None)
+
+    def reset(self):
+        """Forget all counters, e.g. after reconnecting to a restarted chain"""
+        with self._lock:
+            self._next_nonce.clear()
+
+
+class TransactionPipeline:
+    """
+    Signs and sends transactions without waiting for them to be mined.
+    Each submit returns a Future; a background tracker polls for receipts
+    and resolves the futures as blocks come in. A reverted transaction fails
+    its future with TransactionReverted.
+    """
+
+    def __init__(self, web3_getter, nonce_manager=None, poll_interval=0.2, receipt_timeout=120):
+        self._web3_getter = web3_getter
+        self.nonce_manager = nonce_manager or NonceManager(web3_getter)
+        self.poll_interval = poll_interval
+        self.receipt_timeout = receipt_timeout
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._tracker = None
+        self._tracker_lock = threading.Lock()
+        self.stats = {"submitted": 0, "send_failures": 0, "mined": 0, "reverted": 0, "timeouts": 0}
+
+    def submit(self, transaction, private_key):
+        """
+        Fill in the nonce, sign and send a built transaction dict.
+        Returns a Future that resolves to the transaction receipt.
+        """
+        future = Future()
+        account = transaction['from']
+        web3 = self._web3_getter()
+        transaction = dict(transaction)
+        transaction['nonce'] = self.nonce_manager.allocate(account)
+
+        try:
+            signed_txn = web3.eth.account.sign_transaction(transaction, private_key=private_key)
+            tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception as e:
+            # The allocated nonce was never used; re-read it from the node next time
+            self.nonce_manager.resync(account)
+            self.stats["send_failures"] += 1
+            future.set_exception(e)
+            return future
+
+        future.transaction_hash = tx_hash
+        future.nonce = transaction['nonce']
+        with self._pending_lock:
+            self._pending[tx_hash] = (future, time.monotonic())
+            self.stats["submitted"] += 1
+        self._ensure_tracker()
+        self._wakeup.set()
+        return future
+
+    def pending_count(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _ensure_tracker(self):
+        with self._tracker_lock:
+            if self._tracker is None or not self._tracker.is_alive():
+                self._tracker = threading.Thread(target=self._track_receipts, name="tx-receipt-tracker", daemon=True)
+                self._tracker.start()
+
+    def _track_receipts(self):
+        """Poll the node for receipts of every pending transaction"""
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+            with self._pending_lock:
+                pending = list(self._pending.items())
+            if not pending:
+                continue
+
+            web3 = self._web3_getter()
+            now = time.monotonic()
+            for tx_hash, (future, submitted_at) in pending:
+                try:
+                    receipt = web3.eth.get_transaction_receipt(tx_hash)
+                except Exception:
+                    # Not mined yet (TransactionNotFound) or a transient RPC error
+                    receipt = None
+
+                if receipt is not None:
+                    self._resolve(tx_hash)
+                    self.stats["mined"] += 1
+                    if receipt.get('status', 1) != 1:
+                        self.stats["reverted"] += 1
+                        future.set_exception(TransactionReverted(receipt))
+                    else:
+                        future.set_result(receipt)
+                elif now - submitted_at > self.receipt_timeout:
+                    self._resolve(tx_hash)
+                    self.stats["timeouts"] += 1
+                    future.set_exception(TimeoutError(f"Transaction {tx_hash.hex()} not mined after {self.receipt_timeout}s"))
+
+    def _resolve(self, tx_hash):
+        with self._pending_lock:
+            self._pending.pop(tx_hash, None)
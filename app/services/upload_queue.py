@@ -0,0 +1,173 @@
+import threading
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from app.models import db, UploadJob
+from app.services.blob_store import get_blob_store
+
+
+class UploadQueue:
+    """
+    Persistent queue for the slow half of a file upload.
+
+    The request stores and hashes the file, inserts an UploadJob row and
+    returns. A pool of worker threads claims queued jobs (one conditional
+    UPDATE per claim, so two workers never take the same job), publishes the
+    file to IPFS and writes it to the chain. Failed jobs are retried with a
+    delay up to max_attempts; jobs left 'processing' by a crashed worker are
+    requeued once their lease expires, so nothing is lost across restarts.
+    A job that finally fails releases its reference to the stored blob.
+    """
+
+    def __init__(self, workers=4, max_attempts=3, retry_delay=10, lease_seconds=600, poll_interval=1, processor=None):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        # Callable(job) -> {"success": bool, "error": str, "retry": bool}; defaults to FileVerificationService.publish_upload
+        self.processor = processor
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._threads = []
+        self.stats = {"enqueued": 0, "completed": 0, "failed": 0, "retries": 0, "recovered": 0}
+
+    def enqueue(self, **fields):
+        """Insert a queued job and make sure workers are running to pick it up"""
+        job = UploadJob(status='queued', **fields)
+        db.session.add(job)
+        db.session.commit()
+        self.stats["enqueued"] += 1
+        self.start(current_app._get_current_object())
+        self._wake.set()
+        return job
+
+    def get_job(self, job_id):
+        return db.session.get(UploadJob, job_id)
+
+    def pending_count(self):
+        return UploadJob.query.filter(UploadJob.status.in_(['queued', 'processing'])).count()
+
+    def recover_expired(self):
+        """Requeue jobs whose worker died while processing them"""
+        recovered = UploadJob.query.filter(
+            UploadJob.status == 'processing',
+            UploadJob.lease_expires_at < datetime.utcnow()
+        ).update({"status": 'queued', "lease_expires_at": None}, synchronize_session=False)
+        db.session.commit()
+        self.stats["recovered"] += recovered
+        return recovered
+
+    def claim_next(self):
+        """Atomically move the oldest runnable job to 'processing' and return it, or None"""
+        while True:
+            now = datetime.utcnow()
+            candidate = UploadJob.query.filter(
+                UploadJob.status == 'queued',
+                UploadJob.available_at <= now
+            ).order_by(UploadJob.id).first()
+            if candidate is None:
+                db.session.commit()
+                return None
+            claimed = UploadJob.query.filter_by(id=candidate.id, status='queued').update({
+                "status": 'processing',
+                "attempts": UploadJob.attempts + 1,
+                "lease_expires_at": now + timedelta(seconds=self.lease_seconds)
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                db.session.refresh(candidate)
+                return candidate
+            # Another worker got there first; try the next job
+
+    def process(self, job):
+        """Run one claimed job and record the outcome"""
+        try:
+            result = self._get_processor()(job)
+        except Exception as e:
+            db.session.rollback()
+            result = {"success": False, "error": str(e), "retry": True}
+
+        job = db.session.get(UploadJob, job.id)
+        job.lease_expires_at = None
+        if result.get("success"):
+            job.status = 'completed'
+            job.error = None
+            job.completed_at = datetime.utcnow()
+            self.stats["completed"] += 1
+        elif result.get("retry", True) and job.attempts < self.max_attempts:
+            job.status = 'queued'
+            job.error = result.get("error")
+            job.available_at = datetime.utcnow() + timedelta(seconds=self.retry_delay * job.attempts)
+            self.stats["retries"] += 1
+        else:
+            job.status = 'failed'
+            job.error = result.get("error")
+            job.completed_at = datetime.utcnow()
+            self.stats["failed"] += 1
+            print(f"❌ Upload job {job.id} failed: {job.error}")
+        db.session.commit()
+        if job.status == 'failed':
+            # Retries still need the stored file; a job that gives up drops its reference
+            get_blob_store().release(job.file_hash)
+        return job
+
+    def _get_processor(self):
+        if self.processor is None:
+            from app.services.file_verification_service import FileVerificationService
+            return FileVerificationService().publish_upload
+        return self.processor
+
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, app):
+        """Start the worker threads unless they are already running"""
+        with self._start_lock:
+            if self.is_running():
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, args=(app,), name=f"upload-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        print(f"✅ Upload queue started with {self.workers} workers")
+
+    def resume(self, app):
+        """Start workers at startup if jobs were left unfinished by a previous run"""
+        with app.app_context():
+            if self.pending_count():
+                self.start(app)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=self.poll_interval * 2)
+
+    def _run(self, app):
+        with app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self.recover_expired()
+                    job = self.claim_next()
+                    if job is not None:
+                        self.process(job)
+                except Exception as e:
+                    db.session.rollback()
+                    job = None
+                    print(f"❌ Upload queue error: {e}")
+                finally:
+                    db.session.remove()
+                if job is None:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+
+
+def get_upload_queue():
+    """Return the app-scoped UploadQueue"""
+    if has_app_context():
+        return current_app.extensions.get('upload_queue')
+    return None
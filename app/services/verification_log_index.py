@@ -0,0 +1,117 @@
+from app.models import db, ChainVerificationLog, ChainSyncCursor
+
+
+class VerificationLogIndex:
+    """
+    Per-file verification history built from FileVerified events.
+
+    Each lookup asks the node only for FileVerified events of that file
+    (eth_getLogs filtered on the indexed fileId topic) emitted since the
+    file's last indexed block, stores the new logs in ChainVerificationLog
+    and answers from the table. Lookup cost depends on the number of logs
+    for the file, not on the total number of verifications on chain.
+    """
+
+    def __init__(self, blockchain_service):
+        self.blockchain_service = blockchain_service
+        self.stats = {"lookups": 0, "logs_indexed": 0, "rpc_get_logs": 0}
+
+    @property
+    def contract(self):
+        return self.blockchain_service.contract
+
+    def _cursor_name(self, file_id):
+        return f"FileVerified:{self.blockchain_service.contract_address}:{file_id}"
+
+    def get_logs(self, file_id):
+        """Return the verification logs for file_id, syncing new events first"""
+        self.stats["lookups"] += 1
+        self.sync_file(file_id)
+        rows = ChainVerificationLog.query.filter_by(
+            contract_address=self.blockchain_service.contract_address,
+            file_id=file_id
+        ).order_by(ChainVerificationLog.log_id).all()
+        return [row.to_dict() for row in rows]
+
+    def sync_file(self, file_id):
+        """Index FileVerified events for file_id between the stored cursor and the latest block"""
+        web3 = self.blockchain_service.web3
+        cursor_name = self._cursor_name(file_id)
+        cursor = db.session.get(ChainSyncCursor, cursor_name)
+        from_block = cursor.last_block + 1 if cursor else 0
+        # Blocks the chain indexer has already mirrored need no per-file lookup
+        indexer_cursor = db.session.get(ChainSyncCursor, f"indexer:{self.blockchain_service.contract_address}")
+        if indexer_cursor:
+            from_block = max(from_block, indexer_cursor.last_block + 1)
+        to_block = web3.eth.block_number
+        if from_block > to_block:
+            return 0
+
+        events = self.contract.events.FileVerified().get_logs(
+            argument_filters={'fileId': file_id},
+            fromBlock=from_block,
+            toBlock=to_block
+        )
+        self.stats["rpc_get_logs"] += 1
+
+        block_events = {}
+        indexed = 0
+        for event in events:
+            log_id = self.resolve_log_id(event, block_events)
+            if log_id is None:
+                continue
+            if self.store_event(event, log_id):
+                indexed += 1
+
+        if cursor is None:
+            cursor = ChainSyncCursor(name=cursor_name)
+            db.session.add(cursor)
+        cursor.last_block = to_block
+        db.session.commit()
+        self.stats["logs_indexed"] += indexed
+        return indexed
+
+    def resolve_log_id(self, event, block_events=None):
+        """
+        FileVerified does not carry the log ID, but logs are numbered in emission order:
+        the counter at the end of the event's block, minus the FileVerified events
+        emitted later in that block, is this event's log ID.
+        """
+        if block_events is None:
+            block_events = {}
+        try:
+            block_number = event['blockNumber']
+            counter = self.contract.functions.verificationCounter().call(block_identifier=block_number)
+            if block_number not in block_events:
+                same_block = self.contract.events.FileVerified().get_logs(fromBlock=block_number, toBlock=block_number)
+                self.stats["rpc_get_logs"] += 1
+                block_events[block_number] = [e['logIndex'] for e in same_block]
+            later = sum(1 for log_index in block_events[block_number] if log_index > event['logIndex'])
+            return counter - later
+        except Exception as e:
+            print(f"Error resolving verification log ID: {e}")
+            return None
+
+    def store_event(self, event, log_id):
+        """Fetch the on-chain log details for one event and insert it if new"""
+        contract_address = self.blockchain_service.contract_address
+        exists = ChainVerificationLog.query.filter_by(contract_address=contract_address, log_id=log_id).first()
+        if exists:
+            return False
+
+        log_data = self.contract.functions.getVerificationLog(log_id).call()
+        db.session.add(ChainVerificationLog(
+            contract_address=contract_address,
+            log_id=log_id,
+            file_id=event['args']['fileId'],
+            original_hash=log_data[1],
+            verified_hash=log_data[2],
+            is_match=event['args']['isMatch'],
+            verified_by=event['args']['verifiedBy'],
+            timestamp=log_data[5],
+            notes=log_data[6],
+            block_number=event['blockNumber'],
+            transaction_hash=event['transactionHash'].hex(),
+            log_index=event['logIndex']
+        ))
+        return True
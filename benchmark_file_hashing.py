@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+File Hashing Benchmark
+Compares the old 4 KB read loop with app.services.file_hasher.hash_file on
+files from 1 KB to 1 GB, and measures parallel hashing of several large files.
+Usage: python benchmark_file_hashing.py [max_size_mb]
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.file_hasher import hash_file
+
+SIZES = [1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024, 128 * 1024 * 1024, 1024 * 1024 * 1024]
+PARALLEL_FILES = 4
+
+def legacy_hash(file_path):
+    """calculate_file_hash before the hashing engine"""
+    sha256_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for byte_block in iter(lambda: f.read(4096), b""):
+            sha256_hash.update(byte_block)
+    return sha256_hash.hexdigest()
+
+def write_file(directory, size):
+    path = os.path.join(directory, f"bench_{size}.bin")
+    block = os.urandom(min(size, 1024 * 1024))
+    with open(path, "wb") as f:
+        for offset in range(0, size, len(block)):
+            f.write(block[:size - offset])
+    return path
+
+def best_time(fn, path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def human(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.0f} TB"
+
+def main():
+    max_size = int(sys.argv[1]) * 1024 * 1024 if len(sys.argv) > 1 else SIZES[-1]
+    sizes = [size for size in SIZES if size <= max_size]
+    print("📊 File Hashing Benchmark")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'size':>8}{'4 KB loop MB/s':>18}{'engine MB/s':>15}{'speedup':>10}")
+        for size in sizes:
+            path = write_file(directory, size)
+            assert legacy_hash(path) == hash_file(path)
+            repeat = 20 if size < 16 * 1024 * 1024 else 3
+            legacy = best_time(legacy_hash, path, repeat)
+            engine = best_time(hash_file, path, repeat)
+            mb = size / (1024 * 1024)
+            print(f"{human(size):>8}{mb / legacy:>18.0f}{mb / engine:>15.0f}{legacy / engine:>9.1f}x")
+            os.remove(path)
+
+        # Several large files at once: threads only help if hashing releases the GIL
+        size = min(max_size, 128 * 1024 * 1024)
+        paths = [write_file(directory, size) for _ in range(PARALLEL_FILES)]
+        for path in paths:
+            hash_file(path)  # warm the page cache
+        start = time.perf_counter()
+        for path in paths:
+            hash_file(path)
+        sequential = time.perf_counter() - start
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=PARALLEL_FILES) as pool:
+            list(pool.map(hash_file, paths))
+        parallel = time.perf_counter() - start
+        total_mb = size * PARALLEL_FILES / (1024 * 1024)
+        print(f"\n{PARALLEL_FILES} x {human(size)}: sequential {total_mb / sequential:.0f} MB/s, "
+              f"{PARALLEL_FILES} threads {total_mb / parallel:.0f} MB/s ({sequential / parallel:.1f}x, {os.cpu_count()} CPUs)")
+
+if __name__ == "__main__":
+    main()
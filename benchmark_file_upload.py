@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+File Upload Benchmark
+Compares single uploadFile transactions with batched uploadFiles transactions
+on a running Ganache node: gas per file and files per second.
+"""
+
+import hashlib
+import json
+import sys
+import time
+
+from app import create_app
+from app.services.blockchain_service import get_blockchain_service
+
+def make_files(count, tag):
+    """Synthetic file records with unique hashes"""
+    files = []
+    for i in range(count):
+        file_hash = hashlib.sha256(f"{tag}-{time.time()}-{i}".encode()).hexdigest()
+        files.append({
+            "filename": f"benchmark_{tag}_{i}.txt",
+            "file_hash": file_hash,
+            "ipfs_hash": f"QmBenchmark{file_hash[:20]}",
+            "file_type": "txt",
+            "file_size": 1024,
+            "patient_id": None,
+            "metadata": json.dumps({"benchmark": tag})
+        })
+    return files
+
+def benchmark_single(service, count):
+    """One uploadFile transaction per file, as upload_file_secure does"""
+    files = make_files(count, "single")
+    gas_used = 0
+    start = time.perf_counter()
+    for item in files:
+        future = service.submit_transaction(
+            service.contract.functions.uploadFile(*service._file_input(item)),
+            gas=1000000
+        )
+        gas_used += future.result(timeout=120)['gasUsed']
+    elapsed = time.perf_counter() - start
+    return {"files": count, "seconds": elapsed, "files_per_second": count / elapsed, "gas_per_file": gas_used / count}
+
+def benchmark_batch(service, count):
+    """uploadFiles transactions, chunked by upload_files_batch"""
+    files = make_files(count, "batch")
+    start = time.perf_counter()
+    result = service.upload_files_batch(files)
+    elapsed = time.perf_counter() - start
+    if not result:
+        raise RuntimeError("Batch upload failed")
+    return {"files": count, "seconds": elapsed, "files_per_second": count / elapsed,
+            "gas_per_file": result["gas_per_file"], "transactions": len(result["transactions"])}
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print("📊 File Upload Benchmark")
+    print("=" * 50)
+
+    app = create_app()
+    with app.app_context():
+        service = get_blockchain_service()
+        if not service.ensure_contract():
+            print("❌ Could not connect to Ganache or load FileVerificationContract")
+            print("   Run: python setup_ganache.py")
+            return
+
+        single = benchmark_single(service, count)
+        batch = benchmark_batch(service, count)
+
+    print(f"\n{'mode':<8}{'files':>8}{'seconds':>10}{'files/s':>10}{'gas/file':>12}")
+    for mode, result in (("single", single), ("batch", batch)):
+        print(f"{mode:<8}{result['files']:>8}{result['seconds']:>10.2f}"
+              f"{result['files_per_second']:>10.1f}{result['gas_per_file']:>12.0f}")
+    print(f"\n✅ Batch: {batch['transactions']} transactions, "
+          f"{single['gas_per_file'] / batch['gas_per_file']:.2f}x less gas per file, "
+          f"{batch['files_per_second'] / single['files_per_second']:.1f}x more files/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Retinal Engine Benchmark
+Measures classification throughput in images/s for the MD5 fast path, the
+NumPy classifier one image at a time, in explicit batches, and behind the
+MicroBatcher with concurrent request threads.
+Usage: python benchmark_retinal_engine.py [images] [threads]
+"""
+
+import hashlib
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from app.services.retinal_engine import RetinalClassifierEngine, SoftmaxClassifier, preprocess
+
+CLASSES = ["AMD", "CNV", "DME", "CSR", "DRUSEN", "MH", "NORMAL"]
+BATCH_SIZE = 32
+
+class StaticRegistry:
+    """Stands in for RetinalModelRegistry with an already loaded classifier"""
+
+    def __init__(self, classifier):
+        self.classifier = classifier
+
+    def get(self):
+        return self.classifier
+
+    def get_stats(self):
+        return {}
+
+def make_scans(count, size=512):
+    rng = np.random.default_rng(0)
+    scans = []
+    for i in range(count):
+        pixels = rng.integers(0, 256, (size // 16, size // 16), dtype=np.uint8)
+        image = Image.fromarray(pixels).resize((size, size), Image.BICUBIC).convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        scans.append(buffer.getvalue())
+    return scans
+
+def decode(data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else float('inf')
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print("📊 Retinal Engine Benchmark")
+    print("=" * 60)
+
+    scans = make_scans(count)
+    images = [decode(data) for data in scans]
+    labels = [CLASSES[i % len(CLASSES)] for i in range(count)]
+    classifier = SoftmaxClassifier.train(preprocess(images[:128]), labels[:128], epochs=20)
+    model = {hashlib.md5(data).hexdigest(): label for data, label in zip(scans, labels)}
+    print(f"{count} scans, {len(classifier)} classes, {threads} request threads\n")
+
+    start = time.perf_counter()
+    for data in scans:
+        model.get(hashlib.md5(data).hexdigest())
+    print(f"{'MD5 fast path':<38}{rate(count, time.perf_counter() - start):>10.0f} images/s")
+
+    # Preprocessing and inference alone, images already decoded
+    start = time.perf_counter()
+    for image in images:
+        classifier.predict(preprocess([image]))
+    unbatched = time.perf_counter() - start
+    print(f"{'classifier, one image at a time':<38}{rate(count, unbatched):>10.0f} images/s")
+
+    start = time.perf_counter()
+    for offset in range(0, count, BATCH_SIZE):
+        classifier.predict(preprocess(images[offset:offset + BATCH_SIZE]))
+    batched = time.perf_counter() - start
+    print(f"{f'classifier, batches of {BATCH_SIZE}':<38}{rate(count, batched):>10.0f} images/s ({unbatched / batched:.1f}x)")
+
+    # End to end per request: decode, preprocess, infer
+    engine = RetinalClassifierEngine(StaticRegistry(classifier), max_batch=BATCH_SIZE, max_wait=0.002)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda data: classifier.predict(preprocess([decode(data)]))[0], scans))
+    direct = time.perf_counter() - start
+    print(f"{f'{threads} threads, no micro-batching':<38}{rate(count, direct):>10.0f} images/s")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda data: engine.classify(decode(data)), scans))
+    micro = time.perf_counter() - start
+    stats = engine.get_stats()
+    engine.batcher.stop()
+    print(f"{f'{threads} threads, micro-batched':<38}{rate(count, micro):>10.0f} images/s "
+          f"({direct / micro:.1f}x, avg batch {stats['avg_batch']})")
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,17 @@ contract FileVerificationContract {
         string metadata;        // Additional metadata as JSON string
     }
 
+    // Input for batch uploads (uploadedBy and timestamp are filled in by the contract)
+    struct FileInput {
+        string fileName;
+        string fileHash;
+        string ipfsHash;
+        string fileType;
+        uint256 fileSize;
+        address patientId;
+        string metadata;
+    }
+
     struct VerificationLog {
         uint256 logId;
         uint256 fileId;
@@ -35,6 +46,14 @@ contract FileVerificationContract {
         string notes;
     }
 
+    // Merkle root covering a window of file hashes; each file keeps its inclusion proof off chain
+    struct MerkleAnchor {
+        bytes32 root;
+        uint256 leafCount;
+        address anchoredBy;
+        uint256 timestamp;
+    }
+
     mapping(uint256 => FileRecord) public files;
     mapping(uint256 => VerificationLog) public verificationLogs;
     mapping(address => uint256[]) public userFiles;
@@ -43,9 +62,14 @@ contract FileVerificationContract {
     uint256 public fileCounter;
     uint256 public verificationCounter;
 
+    mapping(uint256 => MerkleAnchor) public merkleAnchors;
+    mapping(bytes32 => uint256) public rootToAnchorId;
+    uint256 public anchorCounter;
+
     event FileUploaded(uint256 indexed fileId, string fileName, string fileHash, address indexed uploadedBy);
     event FileVerified(uint256 indexed fileId, bool isMatch, address indexed verifiedBy);
     event FileInvalidated(uint256 indexed fileId, address indexed invalidatedBy);
+    event RootAnchored(uint256 indexed anchorId, bytes32 root, uint256 leafCount, address indexed anchoredBy);
 
     constructor() {
         admin.add(msg.sender);
@@ -85,6 +109,38 @@ contract FileVerificationContract {
         address _patientId,
         string memory _metadata
     ) public onlyAuthorized returns (uint256) {
+        return _storeFile(_fileName, _fileHash, _ipfsHash, _fileType, _fileSize, _patientId, _metadata);
+    }
+
+    // Batch upload: one transaction, one FileUploaded event per file.
+    // Returns the ID of the first file; the rest follow sequentially.
+    function uploadFiles(FileInput[] memory _files) public onlyAuthorized returns (uint256) {
+        require(_files.length > 0, "No files provided");
+
+        uint256 firstFileId = fileCounter + 1;
+        for (uint256 i = 0; i < _files.length; i++) {
+            _storeFile(
+                _files[i].fileName,
+                _files[i].fileHash,
+                _files[i].ipfsHash,
+                _files[i].fileType,
+                _files[i].fileSize,
+                _files[i].patientId,
+                _files[i].metadata
+            );
+        }
+        return firstFileId;
+    }
+
+    function _storeFile(
+        string memory _fileName,
+        string memory _fileHash,
+        string memory _ipfsHash,
+        string memory _fileType,
+        uint256 _fileSize,
+        address _patientId,
+        string memory _metadata
+    ) internal returns (uint256) {
         require(bytes(_fileHash).length > 0, "File hash cannot be empty");
         require(hashToFileId[_fileHash] == 0, "File with this hash already exists");
 
@@ -111,6 +167,38 @@ contract FileVerificationContract {
         return fileCounter;
     }
 
+    // Anchor the Merkle root of a batch of file hashes
+    function anchorRoot(bytes32 _root, uint256 _leafCount) public onlyAuthorized returns (uint256) {
+        require(_root != bytes32(0), "Root cannot be empty");
+        require(_leafCount > 0, "Leaf count must be positive");
+        require(rootToAnchorId[_root] == 0, "Root already anchored");
+
+        anchorCounter++;
+        merkleAnchors[anchorCounter] = MerkleAnchor({
+            root: _root,
+            leafCount: _leafCount,
+            anchoredBy: msg.sender,
+            timestamp: block.timestamp
+        });
+        rootToAnchorId[_root] = anchorCounter;
+
+        emit RootAnchored(anchorCounter, _root, _leafCount, msg.sender);
+
+        return anchorCounter;
+    }
+
+    // Get anchored Merkle root
+    function getAnchor(uint256 _anchorId) public view returns (
+        bytes32 root,
+        uint256 leafCount,
+        address anchoredBy,
+        uint256 timestamp
+    ) {
+        require(_anchorId > 0 && _anchorId <= anchorCounter, "Anchor does not exist");
+        MerkleAnchor storage anchor = merkleAnchors[_anchorId];
+        return (anchor.root, anchor.leafCount, anchor.anchoredBy, anchor.timestamp);
+    }
+
     // File verification function
     function verifyFile(
         uint256 _fileId,
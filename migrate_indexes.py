@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the query indexes declared in app/models.py to an
+existing database. db.create_all() only creates indexes for new tables, so
+databases created before the indexes were declared need this once. Safe to
+re-run: indexes that already exist are skipped.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect
+
+from app import create_app, db
+
+def missing_indexes(engine):
+    """Indexes declared on the models but absent from the database"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+def migrate_indexes():
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            indexes = missing_indexes(db.engine)
+            if not indexes:
+                print("✅ All indexes already present")
+                return True
+            
+            for index in indexes:
+                columns = ', '.join(column.name for column in index.columns)
+                print(f"Creating {index.name} on {index.table.name} ({columns})...")
+                index.create(db.engine)
+            
+            # Refresh planner statistics so the new indexes are used
+            if db.engine.dialect.name in ('sqlite', 'postgresql'):
+                with db.engine.begin() as connection:
+                    connection.exec_driver_sql('ANALYZE')
+            
+            print(f"✅ Created {len(indexes)} indexes")
+                
+        except Exception as e:
+            print(f"❌ Error creating indexes: {e}")
+            return False
+    
+    return True
+
+if __name__ == '__main__':
+    migrate_indexes()
@@ -1,6 +1,8 @@
 from app import create_app, db
 from app.models import User, Doctor, Patient
 from werkzeug.security import generate_password_hash
+import click
+import time
 
 app = create_app()
 
@@ -32,5 +34,168 @@ def init_db():
         else:
             print('Admin user already exists!')
 
+@app.cli.command('index-chain')
+@click.option('--follow', is_flag=True, help='Keep indexing new blocks until interrupted.')
+def index_chain(follow):
+    """Mirror FileVerificationContract events into the database."""
+    indexer = app.extensions['chain_indexer']
+    with app.app_context():
+        if not indexer.catch_up():
+            print('Failed to reach the blockchain node.')
+            return
+        print(f'Indexed up to block {indexer.last_indexed_block()}: {indexer.stats}')
+    if follow:
+        indexer.start(app)
+        try:
+            while indexer.is_running():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            indexer.stop()
+
+@app.cli.command('anchor-files')
+def anchor_files():
+    """Anchor all pending file hashes under Merkle roots now."""
+    anchor_service = app.extensions['merkle_anchor_service']
+    with app.app_context():
+        if not app.extensions['blockchain_service'].ensure_contract():
+            print('Failed to reach the blockchain node.')
+            return
+        while anchor_service.flush():
+            pass
+        print(f'{anchor_service.pending_count()} file hashes still pending: {anchor_service.stats}')
+
+@app.cli.command('verify-files')
+@click.option('--file-id', 'file_ids', type=int, multiple=True, help='On-chain file ID to verify (repeatable).')
+@click.option('--directory', type=click.Path(exists=True, file_okay=False), help='Verify every file in this directory.')
+@click.option('--workers', type=int, default=None, help='Hashing threads (default: 2 per CPU).')
+def verify_files(file_ids, directory, workers):
+    """Verify stored files against their on-chain hashes in bulk."""
+    from app.services.file_verification_service import FileVerificationService
+    if not file_ids and not directory:
+        print('Provide --file-id or --directory.')
+        return
+    with app.app_context():
+        result = FileVerificationService().verify_files_bulk(
+            file_ids=list(file_ids) if file_ids else None,
+            directory=directory,
+            workers=workers
+        )
+        if not result['success']:
+            print(f"Verification failed: {result['error']}")
+            return
+        for item in result['results']:
+            if item['status'] != 'match':
+                print(f"{item['status'].upper():<13} {item['file_id'] or '-':>6}  {item['file_path']}")
+        summary = result['summary']
+        print(f"Run {summary['run_id']}: {summary['files_checked']} files, {summary['matched']} matched, "
+              f"{summary['mismatched']} mismatched, {summary['missing']} missing, {summary['unregistered']} unregistered")
+        print(f"Throughput: {summary['files_per_second'] or 0:.1f} files/s, {summary['mb_per_second'] or 0:.1f} MB/s")
+
+@app.cli.command('convert-retinal-model')
+@click.option('--source', type=click.Path(exists=True, dir_okay=False), default=None, help='Pickled model (default: app/models/model.pkl).')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Compact index to write (default: model.idx next to the source).')
+def convert_retinal_model(source, output):
+    """Convert the pickled retinal model to the compact memory-mapped format."""
+    from app.services.retinal_index import convert_pickle_model
+    source = source or app.extensions['retinal_model_registry'].model_path
+    start = time.perf_counter()
+    output, entries = convert_pickle_model(source, output)
+    print(f'Wrote {entries} entries to {output} in {time.perf_counter() - start:.2f}s')
+
+@app.cli.command('detect-retinal')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--workers', type=int, default=None, help='Hashing threads (default: LAB_DETECT_WORKERS).')
+@click.option('--ndjson', is_flag=True, help='Print one JSON line per image as it completes.')
+def detect_retinal(paths, workers, ndjson):
+    """Classify retinal images from files, folders or zip archives."""
+    import json
+    from app.services.retinal_detection import RetinalBatchDetector, path_sources
+    sources = path_sources(paths)
+    if not sources:
+        print('No images found.')
+        return
+    with app.app_context():
+        detector = RetinalBatchDetector(app.extensions['retinal_model_registry'],
+                                        workers=workers or app.config['LAB_DETECT_WORKERS'],
+                                        perceptual_registry=app.extensions['retinal_phash_registry'],
+                                        max_distance=app.config['RETINAL_PHASH_MAX_DISTANCE'],
+                                        engine=app.extensions['retinal_engine'])
+        try:
+            results = detector.detect(sources)
+        except RuntimeError as e:
+            print(f'Detection failed: {e}')
+            return
+        start = time.perf_counter()
+        done = []
+        for result in results:
+            done.append(result)
+            if ndjson:
+                print(json.dumps(result))
+        summary = detector.summarize(done, time.perf_counter() - start)
+        if ndjson:
+            print(json.dumps({'done': True, 'summary': summary}))
+            return
+        for result in sorted(done, key=lambda r: r['index']):
+            if result['success']:
+                print(f"{result['diagnosis']:<10} {result['confidence']:.2f}  {result['filename']}")
+            else:
+                print(f"{'ERROR':<10} {'-':>4}  {result['filename']}: {result['error']}")
+        print(f"{summary['images']} images: {summary['classified']} classified, {summary['unknown']} unknown, "
+              f"{summary['failed']} failed ({summary['images_per_second'] or 0:.1f} images/s)")
+
+@app.cli.command('build-retinal-phash')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--algorithm', type=click.Choice(['phash', 'dhash']), default='phash', show_default=True)
+@click.option('--label-from-folder', is_flag=True, help='Label images the model does not know by their folder name.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Index to write (default: model.phash next to model.pkl).')
+def build_retinal_phash(paths, algorithm, label_from_folder, output):
+    """Build the perceptual-hash index from reference retinal images."""
+    from app.services.perceptual_index import build_index_from_sources
+    from app.services.retinal_detection import path_sources
+    registry = app.extensions['retinal_model_registry']
+    output = output or app.extensions['retinal_phash_registry'].model_path
+    start = time.perf_counter()
+    index, stats = build_index_from_sources(path_sources(paths), registry.get(), algorithm, label_from_folder)
+    index.save(output)
+    print(f"Indexed {stats['indexed']} of {stats['images']} images ({stats['unlabelled']} unlabelled, "
+          f"{stats['unreadable']} unreadable) into {output} in {time.perf_counter() - start:.1f}s")
+
+@app.cli.command('train-retinal-classifier')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--label-from-folder', is_flag=True, help='Label images the model does not know by their folder name.')
+@click.option('--epochs', type=int, default=300, show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Weights to write (default: model.classifier.npz next to model.pkl).')
+def train_retinal_classifier(paths, label_from_folder, epochs, output):
+    """Train the image classifier engine on labelled reference retinal images."""
+    from app.services.retinal_detection import iter_labelled_images, path_sources
+    from app.services.retinal_engine import SoftmaxClassifier, preprocess
+    engine = app.extensions['retinal_engine']
+    output = output or engine.classifier_registry.model_path
+    stats = {}
+    start = time.perf_counter()
+    labelled = list(iter_labelled_images(path_sources(paths), app.extensions['retinal_model_registry'].get(),
+                                         label_from_folder, stats))
+    if len({label for _, label, _ in labelled}) < 2:
+        print(f'Need images of at least two diagnoses to train ({stats}).')
+        return
+    features = preprocess([image for image, _, _ in labelled])
+    labels = [label for _, label, _ in labelled]
+    classifier = SoftmaxClassifier.train(features, labels, epochs=epochs)
+    accuracy = sum(p == l for (p, _), l in zip(classifier.predict(features), labels)) / len(labels)
+    classifier.save(output)
+    print(f"Trained on {len(labels)} of {stats['images']} images ({len(classifier)} classes, "
+          f"training accuracy {accuracy:.1%}) in {time.perf_counter() - start:.1f}s; wrote {output}")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats():
+    """Recount the admin dashboard statistics from the source tables."""
+    with app.app_context():
+        start = time.perf_counter()
+        service = app.extensions['statistics_service']
+        service.rebuild()
+        totals = service.snapshot()['totals']
+        print(f"Rebuilt statistics in {time.perf_counter() - start:.1f}s: "
+              + ', '.join(f'{count} {metric}' for metric, count in totals.items()))
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5002) 
\ No newline at end of file
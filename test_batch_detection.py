@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test Batch Detection
+This script classifies folders, zip archives and multipart uploads of
+retinal images with RetinalBatchDetector and the /lab/detect/batch endpoint,
+against a small temporary model.
+"""
+
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+import zipfile
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from app.models import db, User
+from app.services.model_registry import RetinalModelRegistry
+from app.services.retinal_detection import RetinalBatchDetector, path_sources
+
+
+def make_images(count=40):
+    """Fake image bytes and a model covering every other one"""
+    images = {f"scan_{i:03d}.png": os.urandom(2048 + i) for i in range(count)}
+    model = {}
+    for i, (name, data) in enumerate(images.items()):
+        if i % 2 == 0:
+            model[hashlib.md5(data).hexdigest()] = "CNV" if i % 4 else ("DME", 0.9)
+    return images, model
+
+
+def write_model(directory, model):
+    path = os.path.join(directory, "model.pkl")
+    with open(path, "wb") as f:
+        pickle.dump(model, f)
+    return RetinalModelRegistry(path)
+
+
+def test_folder_and_zip():
+    """A folder and a zip of the same images give identical per-image results"""
+    print("🔍 Testing folder and zip detection...")
+    images, model = make_images()
+    with tempfile.TemporaryDirectory() as directory:
+        registry = write_model(directory, model)
+        scans = os.path.join(directory, "scans")
+        os.makedirs(scans)
+        archive_path = os.path.join(directory, "scans.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            for name, data in images.items():
+                with open(os.path.join(scans, name), "wb") as f:
+                    f.write(data)
+                archive.writestr(name, data)
+            archive.writestr("notes.txt", b"ignored")
+
+        detector = RetinalBatchDetector(registry, workers=4)
+        folder_results, summary = detector.detect_all(path_sources([scans]))
+        zip_results, _ = detector.detect_all(path_sources([archive_path]))
+
+        assert summary["images"] == 40 and summary["classified"] == 20 and summary["unknown"] == 20
+        assert [r["index"] for r in folder_results] == list(range(40))
+        assert [(r["diagnosis"], r["confidence"]) for r in folder_results] == \
+            [(r["diagnosis"], r["confidence"]) for r in zip_results]
+        assert folder_results[0]["diagnosis"] == "DME" and folder_results[0]["confidence"] == 0.9
+        assert folder_results[2]["diagnosis"] == "CNV" and folder_results[2]["confidence"] == 1.0
+    print(f"✅ 40 images classified from a folder and a zip at {summary['images_per_second']} images/s")
+
+
+def test_oversized_image():
+    print("\n🔍 Testing oversized image...")
+    images, model = make_images(2)
+    with tempfile.TemporaryDirectory() as directory:
+        registry = write_model(directory, model)
+        path = os.path.join(directory, "big.png")
+        with open(path, "wb") as f:
+            f.write(b"x" * 5000)
+        results, summary = RetinalBatchDetector(registry, max_image_size=4096).detect_all(path_sources([path]))
+        assert not results[0]["success"] and summary["failed"] == 1
+    print("✅ Oversized image reported without failing the batch")
+
+
+def test_batch_endpoint():
+    """Multipart images plus a zip; JSON and NDJSON responses"""
+    print("\n🔍 Testing /lab/detect/batch...")
+    images, model = make_images(10)
+    app = create_app()
+    with tempfile.TemporaryDirectory() as directory:
+        app.extensions['retinal_model_registry'] = write_model(directory, model)
+        with app.app_context():
+            lab_user = User(username="lab", email="lab@ehr.com", password_hash="x", role="lab")
+            db.session.add(lab_user)
+            db.session.commit()
+            user_id = lab_user.id
+
+        def request_data():
+            names = list(images)
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w") as zf:
+                for name in names[5:]:
+                    zf.writestr(f"session/{name}", images[name])
+            archive.seek(0)
+            return {
+                "images": [(io.BytesIO(images[name]), name) for name in names[:5]],
+                "archive": (archive, "session.zip")
+            }
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+
+        response = client.post("/lab/detect/batch", data=request_data(), content_type="multipart/form-data")
+        body = response.get_json()
+        assert response.status_code == 200 and body["success"]
+        assert body["summary"]["images"] == 10 and body["summary"]["classified"] == 5
+        assert body["results"][5]["filename"] == "session/scan_005.png"
+
+        response = client.post("/lab/detect/batch?stream=1", data=request_data(), content_type="multipart/form-data")
+        assert response.mimetype == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert len(lines) == 11 and lines[-1]["done"] and lines[-1]["summary"]["classified"] == 5
+        assert sorted(line["index"] for line in lines[:-1]) == list(range(10))
+
+        response = client.post("/lab/detect/batch", data={}, content_type="multipart/form-data")
+        assert response.status_code == 400
+
+        with app.app_context():
+            db.drop_all()
+    print("✅ JSON and streamed NDJSON batch responses")
+
+
+def main():
+    """Main test function"""
+    print("🧪 Batch Detection Test")
+    print("=" * 40)
+    test_folder_and_zip()
+    test_oversized_image()
+    test_batch_endpoint()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Test Batch Upload
+This script checks BlockchainService.upload_files_batch and
+FileVerificationService.upload_files_secure against an in-memory stand-in for
+the contract and node: chunks are split to fit the gas budget, repeated or
+registered hashes are never sent, and one failed chunk does not discard the
+files of chunks that were mined. No Ganache is needed.
+"""
+
+import hashlib
+import os
+from concurrent.futures import Future
+from io import BytesIO
+
+from web3 import Web3
+from werkzeug.datastructures import FileStorage
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from app.models import db, Blob
+from app.services.blockchain_service import BlockchainService
+from app.services.file_verification_service import FileVerificationService
+from app.services.transaction_pipeline import TransactionReverted
+
+CONTRACT_ADDRESS = Web3.to_checksum_address("0x" + "12" * 20)
+ACCOUNT = Web3.to_checksum_address("0x" + "ab" * 20)
+GAS_LIMIT = 1000000
+BASE_GAS = 50000
+GAS_PER_FILE = 100000
+
+
+class FakeUploadFiles:
+    def __init__(self, inputs):
+        self.inputs = inputs
+
+    def estimate_gas(self, transaction):
+        return BASE_GAS + GAS_PER_FILE * len(self.inputs)
+
+
+class FakeGetFileIdByHash:
+    def __init__(self, node, file_hash):
+        self.node, self.file_hash = node, file_hash
+
+    def call(self):
+        return self.node.on_chain.get(self.file_hash, 0)
+
+
+class FakeFunctions:
+    def __init__(self, node):
+        self.node = node
+
+    def uploadFiles(self, inputs):
+        return FakeUploadFiles(inputs)
+
+    def getFileIdByHash(self, file_hash):
+        return FakeGetFileIdByHash(self.node, file_hash)
+
+
+class FakeFileUploaded:
+    def process_receipt(self, receipt):
+        return receipt["events"]
+
+
+class FakeEvents:
+    def FileUploaded(self):
+        return FakeFileUploaded()
+
+
+class FakeContract:
+    def __init__(self, node):
+        self.functions = FakeFunctions(node)
+        self.events = FakeEvents()
+
+    def encodeABI(self, fn_name, args):
+        return args[0]
+
+
+class FakeNode:
+    """Mines each uploadFiles chunk at once; a chunk holding a poisoned hash reverts"""
+
+    def __init__(self, on_chain=None, poisoned=()):
+        self.on_chain = dict(on_chain or {})
+        self.poisoned = set(poisoned)
+        self.chunks = []
+        self.next_file_id = 1
+
+    def get_block(self, block_identifier):
+        return {"gasLimit": GAS_LIMIT}
+
+    def batch_eth_call(self, calls, batch_size):
+        return [self.on_chain.get(call["data"], 0).to_bytes(32, 'big') for call in calls]
+
+    def submit(self, contract_function, gas):
+        hashes = [file_input[1] for file_input in contract_function.inputs]
+        self.chunks.append((len(hashes), gas))
+        future = Future()
+        tx_hash = len(self.chunks).to_bytes(32, 'big')
+        if self.poisoned & set(hashes):
+            future.set_exception(TransactionReverted({"transactionHash": tx_hash, "blockNumber": len(self.chunks)}))
+            return future
+        events = []
+        for file_hash in hashes:
+            self.on_chain[file_hash] = self.next_file_id
+            events.append({"args": {"fileHash": file_hash, "fileId": self.next_file_id}})
+            self.next_file_id += 1
+        future.set_result({"transactionHash": tx_hash, "gasUsed": gas // 2, "events": events})
+        return future
+
+
+class FakeWeb3:
+    def __init__(self, node):
+        self.eth = node
+
+
+def offline_service(node):
+    """BlockchainService whose contract calls and writes go to the fake node"""
+    service = BlockchainService()
+    service.web3 = FakeWeb3(node)
+    service.contract_address = CONTRACT_ADDRESS
+    service.contract = FakeContract(node)
+    service.account = ACCOUNT
+    service.is_connected = True
+    service.ensure_contract = lambda: True
+    service._batch_eth_call = node.batch_eth_call
+    service.submit_transaction = node.submit
+    return service
+
+
+def batch_files(count, prefix="scan"):
+    return [{"filename": f"{prefix}_{i}.png", "file_hash": f"{prefix}{i:060d}", "ipfs_hash": f"Qm{prefix}{i}",
+             "file_type": "png", "file_size": 100 + i, "patient_id": None, "metadata": "{}"} for i in range(count)]
+
+
+def blob_refs(file_hash):
+    blob = db.session.get(Blob, file_hash)
+    return blob.ref_count if blob else 0
+
+
+def test_chunks_fit_gas_budget():
+    """Chunks are halved until their estimated gas fits under the block gas budget"""
+    print("🔍 Testing gas-based chunk splitting...")
+    node = FakeNode()
+    service = offline_service(node)
+    result = service.upload_files_batch(batch_files(20), max_files_per_tx=50, gas_limit_fraction=0.8)
+
+    # 20 halves to 5 to fit 800k gas; the remaining 15 halve to 7, leaving 8 that halve to 4
+    assert [size for size, _ in node.chunks] == [5, 7, 4, 4]
+    assert all(BASE_GAS + GAS_PER_FILE * size <= GAS_LIMIT * 0.8 for size, _ in node.chunks)
+    assert all(gas <= GAS_LIMIT * 0.8 for _, gas in node.chunks)
+    assert result["status"] == "success" and not result["errors"]
+    assert len(result["transactions"]) == 4
+    assert sorted(item["file_id"] for item in result["files"]) == list(range(1, 21))
+    print(f"✅ 20 files sent in {len(node.chunks)} chunks within the gas budget")
+
+
+def test_repeated_and_registered_hashes_are_not_sent():
+    """A hash repeated in the batch is sent once and a hash already on chain not at all"""
+    print("\n🔍 Testing batch dedup...")
+    files = batch_files(4)
+    registered = files[2]["file_hash"]
+    node = FakeNode(on_chain={registered: 77})
+    service = offline_service(node)
+    result = service.upload_files_batch(files + [dict(files[0], filename="copy.png")])
+
+    by_hash = {item["file_hash"]: item for item in result["files"]}
+    assert node.chunks[0][0] == 3 and len(result["files"]) == 4
+    assert by_hash[registered]["file_id"] == 77 and "already exists" in by_hash[registered]["error"]
+    assert all(by_hash[item["file_hash"]].get("transaction_hash") for item in files if item["file_hash"] != registered)
+    print("✅ Repeated and registered hashes left out of the uploadFiles call")
+
+
+def test_failed_chunk_keeps_mined_chunks():
+    """A reverted chunk fails only its own files; mined chunks keep their file IDs"""
+    print("\n🔍 Testing partial batch failure...")
+    files = batch_files(15)
+    node = FakeNode(poisoned={files[7]["file_hash"]})
+    service = offline_service(node)
+    result = service.upload_files_batch(files, max_files_per_tx=5)
+
+    by_hash = {item["file_hash"]: item for item in result["files"]}
+    failed = [item["file_hash"] for item in files[5:10]]
+    assert result["status"] == "partial" and len(result["errors"]) == 1
+    assert len(result["transactions"]) == 2
+    assert all(by_hash[file_hash]["file_id"] is None and "reverted" in by_hash[file_hash]["error"]
+               for file_hash in failed)
+    assert all(by_hash[item["file_hash"]]["file_id"] and "error" not in by_hash[item["file_hash"]]
+               for item in files[:5] + files[10:])
+    print("✅ 10 files from mined chunks kept, 5 from the reverted chunk reported failed")
+
+
+def test_upload_files_secure_maps_chunk_results():
+    """upload_files_secure reports success per file when one chunk of the batch reverts"""
+    print("\n🔍 Testing upload_files_secure with a failed chunk...")
+    contents = [f"retina scan {i}".encode() * 100 for i in range(4)]
+    node = FakeNode(poisoned={hashlib.sha256(contents[3]).hexdigest()})
+    app = create_app()
+    with app.app_context():
+        try:
+            service = FileVerificationService(blockchain_service=offline_service(node))
+            service.ipfs_service.upload_file = lambda path, filename=None: f"QmStored{os.path.basename(path)[:8]}"
+            service.ipfs_service.pin_file = lambda ipfs_hash: True
+            batch = service.blockchain_service.upload_files_batch
+            service.blockchain_service.upload_files_batch = lambda files: batch(files, max_files_per_tx=3)
+
+            uploads = [FileStorage(stream=BytesIO(content), filename=f"scan_{i}.png") for i, content in enumerate(contents)]
+            result = service.upload_files_secure(uploads)
+
+            by_name = {item["file_name"]: item for item in result["files"]}
+            assert result["success"] and len(result["errors"]) == 1
+            assert [by_name[f"scan_{i}.png"]["success"] for i in range(4)] == [True, True, True, False]
+            assert [by_name[f"scan_{i}.png"]["file_id"] for i in range(3)] == [1, 2, 3]
+            assert "reverted" in by_name["scan_3.png"]["error"]
+            # The failed file gave its stored copy back; the uploaded ones keep theirs
+            assert [blob_refs(hashlib.sha256(content).hexdigest()) for content in contents] == [1, 1, 1, 0]
+            print("✅ Files from the mined chunk reported uploaded, the reverted one failed and was released")
+        finally:
+            for blob in Blob.query.all():
+                for _ in range(blob.ref_count):
+                    service.blob_store.release(blob.sha256)
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Batch Upload Test")
+    print("=" * 40)
+    test_chunks_fit_gas_budget()
+    test_repeated_and_registered_hashes_are_not_sent()
+    test_failed_chunk_keeps_mined_chunks()
+    test_upload_files_secure_maps_chunk_results()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test Blob Store
+This script checks content-addressed storage of uploads: identical content is
+stored once with a reference count, known content is rejected before any
+IPFS or blockchain work, and failed uploads give their reference back. No IPFS
+or Ganache is needed.
+"""
+
+import os
+from io import BytesIO
+
+from werkzeug.datastructures import FileStorage
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+import app.routes.lab as lab_routes
+from app.models import db, Blob, ChainFileRecord, User
+from app.services.blob_store import get_blob_store
+from app.services.file_verification_service import FileVerificationService
+
+
+class FakeChain:
+    contract_address = "0xContract"
+
+    def ensure_contract(self):
+        return True
+
+    def get_file_id_by_hash(self, file_hash):
+        return 0
+
+
+def upload(content, filename="scan.png"):
+    return FileStorage(stream=BytesIO(content), filename=filename)
+
+
+def test_identical_content_is_stored_once():
+    """Two uploads of the same bytes share one sharded file until both references are released"""
+    print("🔍 Testing content-addressed storage...")
+    app = create_app()
+    with app.app_context():
+        store = get_blob_store()
+        first, created_first = store.store_stream(upload(b"retina scan" * 1000), "png")
+        second, created_second = store.store_stream(upload(b"retina scan" * 1000), "PNG")
+        other, _ = store.store_stream(upload(b"another scan"), "png")
+
+        path = store.absolute_path(first.path)
+        assert created_first and not created_second
+        assert first.sha256 == second.sha256 != other.sha256
+        assert first.path == f"uploads/blobs/{first.sha256[:2]}/{first.sha256[2:4]}/{first.sha256}.png"
+        assert db.session.get(Blob, first.sha256).ref_count == 2
+        assert not os.listdir(store.absolute_path("uploads/blobs/tmp"))
+
+        store.release(first.sha256)
+        assert os.path.exists(path) and store.resolve(first.sha256) == path
+        store.release(first.sha256)
+        assert not os.path.exists(path) and store.get(first.sha256) is None
+        store.release(other.sha256)
+        print("✅ Duplicate upload deduplicated and removed with its last reference")
+
+        db.drop_all()
+
+
+def test_known_content_skips_ipfs_and_chain():
+    """Content already registered on chain is rejected right after hashing; IPFS adds happen once per content"""
+    print("\n🔍 Testing dedup before IPFS and chain work...")
+    app = create_app()
+    with app.app_context():
+        service = FileVerificationService(blockchain_service=FakeChain())
+        ipfs_adds = []
+        service.ipfs_service.upload_file = lambda path, filename=None: ipfs_adds.append(path) or "QmStored"
+        service.ipfs_service.pin_file = lambda ipfs_hash: True
+
+        first = service._prepare_upload(upload(b"lab report", "report.pdf"))
+        second = service._prepare_upload(upload(b"lab report", "report_copy.pdf"))
+        assert first["success"] and second["success"]
+        assert first["local_path"] == second["local_path"]
+        assert len(ipfs_adds) == 1 and second["ipfs_hash"] == "QmStored"
+
+        db.session.add(ChainFileRecord(
+            contract_address="0xContract", file_id=5, file_name=first["filename"], file_hash=first["file_hash"],
+            ipfs_hash="QmStored", file_type="pdf", file_size=10, uploaded_by="0xUploader",
+            patient_address="0xPatient", timestamp=0, is_valid=True, block_number=1, transaction_hash="0x" + "00" * 32
+        ))
+        db.session.commit()
+        duplicate = service._prepare_upload(upload(b"lab report", "again.pdf"))
+        assert not duplicate["success"] and duplicate["file_id"] == 5
+        assert len(ipfs_adds) == 1
+        assert db.session.get(Blob, first["file_hash"]).ref_count == 2
+        print("✅ Registered content rejected before IPFS; repeated content reused its IPFS hash")
+
+        for _ in range(2):
+            service.blob_store.release(first["file_hash"])
+        db.drop_all()
+
+
+def test_failed_uploads_release_blob():
+    """An upload that fails at IPFS or on chain drops the reference it took on the stored file"""
+    print("\n🔍 Testing blob release on failed uploads...")
+    app = create_app()
+    with app.app_context():
+        service = FileVerificationService(blockchain_service=FakeChain())
+        service.ipfs_service.pin_file = lambda ipfs_hash: True
+
+        service.ipfs_service.upload_file = lambda path, filename=None: None
+        kept, _ = service.blob_store.store_stream(upload(b"retina scan"), "png")
+        failed = service._prepare_upload(upload(b"retina scan"))
+        assert not failed["success"] and "IPFS" in failed["error"]
+        assert db.session.get(Blob, kept.sha256).ref_count == 1
+        service.blob_store.release(kept.sha256)
+
+        def chain_error(**kwargs):
+            raise RuntimeError("node went away")
+
+        service.ipfs_service.upload_file = lambda path, filename=None: "QmStored"
+        for chain_write in (lambda **kwargs: None, chain_error):
+            service.blockchain_service.upload_file_to_blockchain = chain_write
+            result = service.upload_file_secure(upload(b"lab report", "report.pdf"))
+            assert not result["success"] and "blockchain" in result["error"]
+            assert Blob.query.count() == 0
+        print("✅ Failed IPFS add and failed chain writes released their blobs")
+
+        db.drop_all()
+
+
+def test_failed_detection_releases_blob():
+    """/lab/detect drops its reference to the stored scan even when classification fails"""
+    print("\n🔍 Testing blob release on a failed detection...")
+    app = create_app()
+    with app.app_context():
+        lab_user = User(username="lab", email="lab@ehr.com", password_hash="x", role="lab")
+        db.session.add(lab_user)
+        db.session.commit()
+        user_id = lab_user.id
+
+    def broken_classifier(image_path):
+        raise RuntimeError("model file is corrupt")
+
+    classify = lab_routes.classify_retinal_disease
+    lab_routes.classify_retinal_disease = broken_classifier
+    try:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+        response = client.post("/lab/detect", data={"image": (BytesIO(b"unreadable scan"), "scan.png"),
+                                                    "report_type": "retinal"}, content_type="multipart/form-data")
+        assert response.status_code == 500
+    finally:
+        lab_routes.classify_retinal_disease = classify
+
+    with app.app_context():
+        assert Blob.query.count() == 0
+        assert not os.listdir(get_blob_store().absolute_path("uploads/blobs/tmp"))
+        print("✅ Stored scan released after the classifier raised")
+        db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Blob Store Test")
+    print("=" * 40)
+    test_identical_content_is_stored_once()
+    test_known_content_skips_ipfs_and_chain()
+    test_failed_uploads_release_blob()
+    test_failed_detection_releases_blob()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test Shared Blockchain Service
+This script checks that the app hands out one BlockchainService and that its
+JSON-RPC calls reuse the pooled keep-alive session, using a small local
+JSON-RPC server instead of Ganache.
+"""
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from app.services.blockchain_service import BlockchainService, get_blockchain_service
+
+ACCOUNT = "0x" + "ab" * 20
+
+
+class FakeNodeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open between requests
+    connections = set()
+    methods = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with FakeNodeHandler.lock:
+            FakeNodeHandler.connections.add(self.client_address)
+            FakeNodeHandler.methods.append(request["method"])
+        results = {"web3_clientVersion": "FakeNode/1.0", "eth_accounts": [ACCOUNT], "eth_chainId": "0x539"}
+        body = json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": results.get(request["method"])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_app_shares_one_service():
+    """get_blockchain_service() returns the app's instance inside an app context only"""
+    print("🔍 Testing app-scoped blockchain service...")
+    app = create_app()
+    with app.app_context():
+        service = get_blockchain_service()
+        assert service is app.extensions['blockchain_service']
+        assert get_blockchain_service() is service
+
+    outside = get_blockchain_service()
+    assert isinstance(outside, BlockchainService)
+    assert outside is not service
+    print("✅ Every call in the app gets the same BlockchainService")
+
+
+def test_shared_session_reuses_connections():
+    """Concurrent callers connect once and their RPC calls share pooled connections"""
+    print("🔍 Testing pooled keep-alive session...")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeNodeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeNodeHandler.connections = set()
+    FakeNodeHandler.methods = []
+
+    try:
+        # health_check_interval=0 re-probes the node on every call
+        service = BlockchainService(ganache_url=f"http://127.0.0.1:{server.server_port}",
+                                    pool_size=4, health_check_interval=0)
+        assert service.ensure_connected()
+        session = service.session
+
+        def worker():
+            for _ in range(10):
+                assert service.ensure_connected()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = service.get_stats()
+        assert service.session is session
+        assert stats["connects"] == 1 and stats["reconnects"] == 0
+        assert stats["health_checks"] == 80 and stats["health_check_failures"] == 0
+        assert service.account.lower() == ACCOUNT
+        assert len(FakeNodeHandler.methods) >= 82
+        assert len(FakeNodeHandler.connections) <= 4
+        assert stats["http_connections_reused"] > 0
+        print(f"✅ {len(FakeNodeHandler.methods)} RPC calls over {len(FakeNodeHandler.connections)} connection(s)")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Shared Blockchain Service Test")
+    print("=" * 40)
+    test_app_shares_one_service()
+    test_shared_session_reuses_connections()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
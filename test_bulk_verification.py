@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test Bulk Verification
+This script audits a directory of stored files and a list of file IDs with
+FileVerificationService.verify_files_bulk against indexed on-chain hashes,
+so no Ganache is needed, and checks the worker count the bulk API accepts.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+import app.routes.file_verification as file_verification_routes
+from app.models import db, ChainFileRecord, User, VerificationRun, VerificationRunResult
+from app.services.blob_store import BlobStore
+from app.services.file_verification_service import FileVerificationService
+
+CONTRACT_ADDRESS = "0xContract"
+
+
+class FakeChain:
+    contract_address = CONTRACT_ADDRESS
+
+    def ensure_contract(self):
+        return True
+
+    def get_file_records(self, file_ids):
+        return {file_id: None for file_id in file_ids}
+
+
+def index_file(file_id, file_name, content):
+    db.session.add(ChainFileRecord(
+        contract_address=CONTRACT_ADDRESS, file_id=file_id, file_name=file_name,
+        file_hash=hashlib.sha256(content).hexdigest(), ipfs_hash=f"QmHash{file_id}", file_type="txt",
+        file_size=len(content), uploaded_by="0xUploader", patient_address="0xPatient",
+        timestamp=1700000000, is_valid=True, file_metadata="{}", block_number=file_id,
+        transaction_hash=f"0x{file_id:064x}"
+    ))
+
+
+def make_service(app):
+    # Everything is already indexed; skip catching up with a real node
+    app.extensions['chain_indexer'].catch_up = lambda: True
+    return FileVerificationService(blockchain_service=FakeChain())
+
+
+def test_bulk_verification_of_directory():
+    """Matches, tampered, missing and unregistered files are classified and recorded in one run"""
+    print("🔍 Testing bulk verification of a directory...")
+    app = create_app()
+    directory = tempfile.mkdtemp()
+    try:
+        with app.app_context():
+            for file_id in range(1, 201):
+                content = f"report {file_id}".encode() * 500
+                index_file(file_id, f"report_{file_id}.txt", content)
+                if file_id != 200:
+                    with open(os.path.join(directory, f"report_{file_id}.txt"), "wb") as f:
+                        f.write(content + (b"!" if file_id in (7, 99) else b""))
+            with open(os.path.join(directory, "stray.txt"), "wb") as f:
+                f.write(b"not uploaded")
+            db.session.commit()
+
+            result = make_service(app).verify_files_bulk(directory=directory, workers=8)
+            summary = result["summary"]
+            assert result["success"]
+            assert (summary["files_checked"], summary["matched"], summary["mismatched"], summary["unregistered"]) == (200, 197, 2, 1)
+            assert sorted(r["file_id"] for r in result["results"] if r["status"] == "mismatch") == [7, 99]
+            assert summary["files_per_second"] > 0 and summary["mb_per_second"] > 0
+
+            run = db.session.get(VerificationRun, summary["run_id"])
+            assert VerificationRunResult.query.filter_by(run_id=run.id).count() == 200
+            print(f"✅ 200 files audited at {summary['files_per_second']:.0f} files/s, {summary['mb_per_second']:.1f} MB/s")
+
+            db.drop_all()
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_bulk_verification_by_file_id():
+    """File IDs resolve to stored copies in the upload directory; unknown IDs are reported"""
+    print("\n🔍 Testing bulk verification by file ID...")
+    app = create_app()
+    with app.app_context():
+        upload_dir = os.path.join(app.root_path, 'static', 'uploads', 'verified_files')
+        os.makedirs(upload_dir, exist_ok=True)
+        names = [f"bulk_test_{file_id}.txt" for file_id in (1, 2, 3)]
+        try:
+            for file_id, name in zip((1, 2, 3), names):
+                index_file(file_id, name, name.encode())
+                if file_id != 3:
+                    with open(os.path.join(upload_dir, name), "wb") as f:
+                        f.write(name.encode())
+            db.session.commit()
+
+            result = make_service(app).verify_files_bulk(file_ids=[1, 2, 3, 42])
+            statuses = {r["file_id"]: r["status"] for r in result["results"]}
+            assert statuses == {1: "match", 2: "match", 3: "missing", 42: "unregistered"}
+            print("✅ File IDs verified against their stored copies")
+        finally:
+            for name in names:
+                if os.path.exists(os.path.join(upload_dir, name)):
+                    os.remove(os.path.join(upload_dir, name))
+            db.drop_all()
+
+
+def test_bulk_verification_of_blob_directory():
+    """Blob store files, named after their SHA-256, match the records with that hash"""
+    print("\n🔍 Testing bulk verification of the blob store...")
+    app = create_app()
+    with app.app_context():
+        store = BlobStore(relative_root='uploads/test_bulk_blobs')
+        app.extensions['blob_store'] = store
+        blob_root = store.absolute_path(store.relative_root)
+        try:
+            contents = {file_id: f"scan {file_id}".encode() * 300 for file_id in range(1, 6)}
+            for file_id, content in contents.items():
+                index_file(file_id, f"scan_{file_id}.pdf", content)
+            # Uploaded twice under different names, stored once
+            index_file(6, "scan_1_again.pdf", contents[1])
+            db.session.commit()
+            blobs = {file_id: store.store_stream(io.BytesIO(content), "pdf")[0] for file_id, content in contents.items()}
+            store.store_stream(io.BytesIO(b"never registered"), "pdf")
+            with open(store.absolute_path(blobs[4].path), "ab") as f:
+                f.write(b"tampered")
+
+            result = make_service(app).verify_files_bulk(directory=blob_root, workers=4)
+            statuses = {r["file_id"]: r["status"] for r in result["results"]}
+            summary = result["summary"]
+            assert (summary["files_checked"], summary["matched"], summary["mismatched"], summary["unregistered"]) == (6, 4, 1, 1)
+            assert statuses == {1: "match", 2: "match", 3: "match", 4: "mismatch", 5: "match", None: "unregistered"}
+            print("✅ Blob store files matched by the hash in their name")
+        finally:
+            shutil.rmtree(blob_root, ignore_errors=True)
+            db.drop_all()
+
+
+def test_bulk_api_limits_workers():
+    """The bulk API rejects a malformed worker count and caps a large one at BULK_VERIFY_MAX_WORKERS"""
+    print("\n🔍 Testing bulk verification worker limits...")
+    app = create_app()
+    app.config['BULK_VERIFY_MAX_WORKERS'] = 8
+    requested = []
+
+    class RecordingService:
+        def verify_files_bulk(self, file_ids=None, directory=None, workers=None, requested_by=None):
+            requested.append(workers)
+            return {"success": True}
+
+    with app.app_context():
+        doctor = User(username="doctor", email="doctor@ehr.com", password_hash="x", role="doctor")
+        db.session.add(doctor)
+        db.session.commit()
+        user_id = doctor.id
+
+    service_class = file_verification_routes.FileVerificationService
+    file_verification_routes.FileVerificationService = RecordingService
+    try:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+
+        def post(workers):
+            return client.post("/file-verification/api/verify/bulk", json={"file_ids": [1], "workers": workers})
+
+        for bad in ("x", 0, -3, [4], 1e400):
+            response = post(bad)
+            assert response.status_code == 400 and "workers" in response.get_json()["error"], bad
+        assert post(10000).status_code == 200
+        assert post("3").status_code == 200
+        assert post(None).status_code == 200
+        assert requested == [8, 3, None]
+        print("✅ Malformed worker counts rejected and large ones capped")
+    finally:
+        file_verification_routes.FileVerificationService = service_class
+        with app.app_context():
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Bulk Verification Test")
+    print("=" * 40)
+    test_bulk_verification_of_directory()
+    test_bulk_verification_by_file_id()
+    test_bulk_verification_of_blob_directory()
+    test_bulk_api_limits_workers()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
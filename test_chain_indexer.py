@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Test Chain Indexer
+This script runs the chain indexer against an in-memory stand-in for the
+FileVerificationContract, covering resume-from-checkpoint and a small reorg,
+and checks the per-file verification log index that answers lookups between
+indexer runs.
+"""
+
+import os
+from types import SimpleNamespace
+
+from hexbytes import HexBytes
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from app.models import db, ChainFileRecord, ChainVerificationLog, ChainSyncCursor
+from app.services.blockchain_service import BlockchainService
+from app.services.chain_indexer import ChainIndexer
+from app.services.file_verification_service import FileVerificationService
+
+
+class FakeCall:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def call(self, block_identifier='latest'):
+        return self.fn(block_identifier)
+
+
+class FakeEth:
+    def __init__(self, chain):
+        self.chain = chain
+
+    @property
+    def block_number(self):
+        return len(self.chain.blocks) - 1
+
+    def get_block(self, number):
+        return {'hash': self.chain.block_hash(number)}
+
+
+class FakeChain:
+    """Blocks hold (event_name, args) tuples; contract state is replayed from the events"""
+
+    def __init__(self):
+        self.blocks = [[]]
+        self.fork = 0
+
+    def mine(self, *events):
+        self.blocks.append(list(events))
+
+    def reorg(self, depth, *replacement_blocks):
+        del self.blocks[-depth:]
+        self.fork += 1
+        for events in replacement_blocks:
+            self.blocks.append(list(events))
+
+    def block_hash(self, number):
+        return HexBytes(bytes([number % 256, self.fork]) + b'\x00' * 30)
+
+    def logs(self, event_name, from_block, to_block):
+        logs = []
+        for number in range(from_block, min(to_block, len(self.blocks) - 1) + 1):
+            for log_index, (name, args) in enumerate(self.blocks[number]):
+                if name == event_name:
+                    logs.append({
+                        'event': name, 'args': args, 'blockNumber': number, 'logIndex': log_index,
+                        'transactionHash': HexBytes(bytes([number % 256, log_index]) + b'\x00' * 30)
+                    })
+        return logs
+
+    def verification_counter(self, block_identifier):
+        last = len(self.blocks) - 1 if block_identifier == 'latest' else block_identifier
+        return len([e for b in self.blocks[:last + 1] for e in b if e[0] == 'FileVerified'])
+
+    def web3(self):
+        return SimpleNamespace(eth=FakeEth(self))
+
+    def contract(self):
+        chain = self
+
+        def event(name):
+            return lambda: SimpleNamespace(
+                get_logs=lambda argument_filters=None, fromBlock=0, toBlock=0: [
+                    e for e in chain.logs(name, fromBlock, toBlock)
+                    if not argument_filters or all(e['args'][k] == v for k, v in argument_filters.items())
+                ]
+            )
+
+        def get_file(file_id):
+            is_valid = ('FileInvalidated', file_id) not in {(e[0], e[1]['fileId']) for b in chain.blocks for e in b}
+            return FakeCall(lambda _: [f"file{file_id}.txt", f"{file_id:064x}", f"QmHash{file_id}", "txt", 10 * file_id,
+                                       "0xUploader", "0xPatient", 1700000000 + file_id, is_valid, "{}"])
+
+        def get_verification_log(log_id):
+            args = [e[1] for b in chain.blocks for e in b if e[0] == 'FileVerified'][log_id - 1]
+            return FakeCall(lambda _: [args['fileId'], "orig", f"verified{log_id}", args['isMatch'], "0xVerifier",
+                                       1700001000 + log_id, "notes"])
+
+        return SimpleNamespace(
+            events=SimpleNamespace(FileUploaded=event('FileUploaded'), FileVerified=event('FileVerified'),
+                                   FileInvalidated=event('FileInvalidated')),
+            functions=SimpleNamespace(getFile=get_file, getVerificationLog=get_verification_log,
+                                      verificationCounter=lambda: FakeCall(chain.verification_counter))
+        )
+
+
+def make_indexer(chain):
+    service = BlockchainService()
+    service.web3 = chain.web3()
+    service.contract = chain.contract()
+    service.contract_address = "0xContract"
+    service.is_connected = True
+    service.ensure_contract = lambda: True
+    service.get_file_records = lambda ids: {
+        file_id: service._format_file_record(file_id, service.contract.functions.getFile(file_id).call())
+        for file_id in ids
+    }
+    return ChainIndexer(service, batch_blocks=3)
+
+
+def record_file_lookups(service):
+    """Log the block range of every FileVerified lookup filtered on a fileId"""
+    lookups = []
+    events = service.contract.events
+    file_verified = events.FileVerified
+
+    def recording():
+        handle = file_verified()
+
+        def get_logs(argument_filters=None, fromBlock=0, toBlock=0):
+            if argument_filters:
+                lookups.append((argument_filters['fileId'], fromBlock, toBlock))
+            return handle.get_logs(argument_filters=argument_filters, fromBlock=fromBlock, toBlock=toBlock)
+        return SimpleNamespace(get_logs=get_logs)
+
+    events.FileVerified = recording
+    return lookups
+
+
+def uploaded(file_id):
+    return ('FileUploaded', {'fileId': file_id, 'fileName': f"file{file_id}.txt", 'uploadedBy': "0xUploader"})
+
+
+def verified(file_id, is_match=True):
+    return ('FileVerified', {'fileId': file_id, 'isMatch': is_match, 'verifiedBy': "0xVerifier"})
+
+
+def invalidated(file_id):
+    return ('FileInvalidated', {'fileId': file_id, 'invalidatedBy': "0xAdmin"})
+
+
+def test_indexer_projects_events_and_resumes():
+    """Files, verification logs and invalidations land in SQL; a new indexer resumes from the cursor"""
+    print("🔍 Testing chain indexer projection...")
+    app = create_app()
+    chain = FakeChain()
+    chain.mine(uploaded(1))
+    chain.mine(uploaded(2), verified(1))
+    chain.mine(verified(2, is_match=False), verified(1))
+    chain.mine()
+    chain.mine(invalidated(2))
+
+    with app.app_context():
+        indexer = make_indexer(chain)
+        assert indexer.catch_up()
+        assert indexer.last_indexed_block() == 5
+
+        files = {r.file_id: r for r in ChainFileRecord.query.all()}
+        assert sorted(files) == [1, 2]
+        assert files[1].is_valid and not files[2].is_valid
+        logs = ChainVerificationLog.query.order_by(ChainVerificationLog.log_id).all()
+        assert [(l.log_id, l.file_id, l.is_match) for l in logs] == [(1, 1, True), (2, 2, False), (3, 1, True)]
+
+        # "Restart": a fresh indexer only reads the new block
+        chain.mine(uploaded(3), verified(3))
+        restarted = make_indexer(chain)
+        assert restarted.catch_up()
+        assert restarted.stats["blocks_indexed"] == 1
+        assert ChainVerificationLog.query.filter_by(file_id=3).one().log_id == 4
+        print("✅ Events projected and indexing resumed from the checkpoint")
+
+        db.drop_all()
+
+
+def test_indexer_rolls_back_small_reorg():
+    """Rows from orphaned blocks are dropped and replaced by the canonical chain"""
+    print("\n🔍 Testing reorg handling...")
+    app = create_app()
+    chain = FakeChain()
+    chain.mine(uploaded(1))
+    chain.mine(uploaded(2))
+    chain.mine(invalidated(1), verified(2))
+
+    with app.app_context():
+        indexer = make_indexer(chain)
+        assert indexer.catch_up()
+        assert not ChainFileRecord.query.filter_by(file_id=1).one().is_valid
+
+        # The last two blocks are replaced: file 2 is gone and file 1 was never invalidated
+        chain.reorg(2, [uploaded(3)], [verified(1)], [])
+        assert indexer.catch_up()
+        assert indexer.stats["reorgs"] == 1
+        assert sorted(r.file_id for r in ChainFileRecord.query.all()) == [1, 3]
+        assert ChainFileRecord.query.filter_by(file_id=1).one().is_valid
+        assert [(l.log_id, l.file_id) for l in ChainVerificationLog.query.all()] == [(1, 1)]
+        assert db.session.get(ChainSyncCursor, indexer.cursor_name).last_block == 4
+        print("✅ Reorged blocks rolled back and re-indexed")
+
+        db.drop_all()
+
+
+def test_failed_catch_up_reads_the_chain():
+    """When catching up fails, file reads go to the chain instead of the stale mirror"""
+    print("\n🔍 Testing fallback after a failed catch-up...")
+    app = create_app()
+    chain = FakeChain()
+    chain.mine(uploaded(1))
+
+    with app.app_context():
+        indexer = make_indexer(chain)
+        assert indexer.catch_up()
+        app.extensions['chain_indexer'] = indexer
+        service = FileVerificationService(blockchain_service=indexer.blockchain_service)
+
+        chain.mine(invalidated(1))
+
+        def unreachable():
+            raise ConnectionError("node unreachable")
+        indexer.sync_once = unreachable
+
+        assert not indexer.catch_up()
+        assert ChainFileRecord.query.filter_by(file_id=1).one().is_valid
+        assert service.get_indexed_file(1)["is_valid"] is False
+        print("✅ Stale mirror skipped after a failed catch-up")
+
+        db.drop_all()
+
+
+def test_log_index_reads_each_file_from_its_cursor():
+    """A file's lookup only asks for blocks after its own cursor and stops when the indexer is ahead"""
+    print("\n🔍 Testing verification log index cursors...")
+    app = create_app()
+    chain = FakeChain()
+    chain.mine(uploaded(1), uploaded(2))
+    chain.mine(verified(1), verified(2, is_match=False))
+    chain.mine(verified(1))
+
+    with app.app_context():
+        indexer = make_indexer(chain)
+        service = indexer.blockchain_service
+        log_index = service.verification_log_index
+        lookups = record_file_lookups(service)
+
+        logs = log_index.get_logs(1)
+        assert [(l["log_id"], l["is_match"]) for l in logs] == [(1, True), (3, True)]
+        assert lookups == [(1, 0, 3)]
+
+        chain.mine(verified(1, is_match=False))
+        assert [l["log_id"] for l in log_index.get_logs(1)] == [1, 3, 4]
+        assert log_index.get_logs(1)[-1]["is_match"] is False
+        # The second lookup started after block 3; the third had no new blocks to ask for
+        assert lookups == [(1, 0, 3), (1, 4, 4)]
+
+        # File 2 has no cursor yet, but the chain indexer already mirrored every block
+        assert indexer.catch_up()
+        assert [(l["log_id"], l["is_match"]) for l in log_index.get_logs(2)] == [(2, False)]
+        assert lookups == [(1, 0, 3), (1, 4, 4)]
+        print("✅ Lookups resumed from the file's cursor and skipped blocks the indexer covered")
+
+        db.drop_all()
+
+
+def test_log_lookup_falls_back_to_scan():
+    """When the filtered event lookup fails, verification logs come from a scan of every log"""
+    print("\n🔍 Testing verification log fallback...")
+    app = create_app()
+    chain = FakeChain()
+    chain.mine(uploaded(1), uploaded(2))
+    chain.mine(verified(1), verified(2), verified(1, is_match=False))
+
+    with app.app_context():
+        service = make_indexer(chain).blockchain_service
+
+        def node_error(**kwargs):
+            raise ValueError("eth_getLogs is not supported")
+        service.contract.events.FileVerified = lambda: SimpleNamespace(get_logs=node_error)
+
+        logs = service.get_file_verification_logs(1)
+        assert [(l["log_id"], l["file_id"], l["is_match"]) for l in logs] == [(1, 1, True), (3, 1, False)]
+        assert ChainVerificationLog.query.count() == 0
+        print("✅ Logs read by scanning the contract when eth_getLogs failed")
+
+        db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Chain Indexer Test")
+    print("=" * 40)
+    test_indexer_projects_events_and_resumes()
+    test_indexer_rolls_back_small_reorg()
+    test_failed_catch_up_reads_the_chain()
+    test_log_index_reads_each_file_from_its_cursor()
+    test_log_lookup_falls_back_to_scan()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
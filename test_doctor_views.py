@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test Doctor Views
+This script checks the doctor dashboard, patients, lab reports and
+prescriptions views: they only show the doctor's own patients, and they
+select those patients with a subquery instead of loading every one of the
+doctor's consultations.
+"""
+
+import os
+import re
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, User, Patient, Doctor, Lab, Consultation, LabReport, MedicalRecord, Prescription
+
+
+def add_user(role, name):
+    user = User(username=name, email=f"{name}@ehr.com", password_hash="x", role=role)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def setup_app():
+    """Two doctors; the first has seen patients 0-2 many times, the second patients 3-4"""
+    app = create_app()
+    with app.app_context():
+        doctors = []
+        for i in range(2):
+            user = add_user("doctor", f"doctor{i}")
+            doctors.append(Doctor(user_id=user.id, first_name="D", last_name=str(i), specialization="eye",
+                                  license_number=f"D{i}", phone="1", address="a", experience_years=5, education="MD"))
+        lab_user = add_user("lab", "lab")
+        lab = Lab(user_id=lab_user.id, lab_name="Lab", license_number="L1", phone="1", address="a", specialization="eye")
+        patients = []
+        for i in range(5):
+            user = add_user("patient", f"patient{i}")
+            patients.append(Patient(user_id=user.id, first_name=f"Patient{i}", last_name="Q",
+                                    date_of_birth=date(1990, 1, 1), gender="F", phone="1", address="a",
+                                    emergency_contact="2"))
+        db.session.add_all(doctors + patients + [lab])
+        db.session.flush()
+
+        start = datetime(2024, 1, 1)
+        for i in range(60):
+            patient = patients[i % 3] if i < 50 else patients[3 + i % 2]
+            doctor = doctors[0] if i < 50 else doctors[1]
+            when = start + timedelta(days=i)
+            db.session.add(Consultation(patient_id=patient.id, doctor_id=doctor.id, date=when.date(),
+                                        time=when.time(), reason="checkup", status="completed"))
+        for i, patient in enumerate(patients):
+            when = start + timedelta(days=i)
+            db.session.add_all([
+                LabReport(patient_id=patient.id, doctor_id=doctors[0].id, lab_id=lab.id, report_type="retinal",
+                          diagnosis=f"Finding{i}", created_at=when),
+                MedicalRecord(patient_id=patient.id, record_type="consultation", record_id=i,
+                              title=f"Record{i}", description="d", created_at=when),
+                Prescription(patient_id=patient.id, doctor_id=doctors[0].id, medication_name=f"Drug{i}",
+                             dosage="1", frequency="daily", duration="7d", prescribed_date=when.date()),
+            ])
+        db.session.commit()
+        user_id = doctors[0].user_id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    return app, client
+
+
+def test_views_show_own_patients():
+    print("🔍 Testing doctor views...")
+    app, client = setup_app()
+    try:
+        expected = {
+            "/doctor/dashboard": "Record",
+            "/doctor/lab-reports": "Finding",
+            "/doctor/prescriptions": "Drug",
+        }
+        for url, prefix in expected.items():
+            html = client.get(url).get_data(as_text=True)
+            assert sorted(set(re.findall(prefix + r"(\d)", html))) == ["0", "1", "2"], url
+        html = client.get("/doctor/patients").get_data(as_text=True)
+        assert html.count("View Details") == 3
+        print("✅ Only the doctor's own patients are shown")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_no_consultation_loading():
+    print("\n🔍 Testing consultation queries...")
+    app, client = setup_app()
+    try:
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        for url in ("/doctor/patients", "/doctor/lab-reports", "/doctor/prescriptions", "/doctor/dashboard"):
+            del statements[:]
+            assert client.get(url).status_code == 200
+            # Whole consultation rows are only read for today's and the next few appointments
+            loads = [s for s in statements if s.startswith("SELECT consultation.id AS consultation_id")]
+            assert all("LIMIT" in s or "consultation.date = " in s for s in loads), (url, loads)
+            assert any("IN (SELECT DISTINCT consultation.patient_id" in s for s in statements), url
+        print("✅ Patients selected by subquery, consultations never loaded in full")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Doctor Views Test")
+    print("=" * 40)
+    test_views_show_own_patients()
+    test_no_consultation_loading()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test File Hasher
+This script checks that every read strategy in app.services.file_hasher
+(single read, buffered readinto, mmap) produces the same SHA-256 as hashlib,
+including from several threads at once.
+"""
+
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import file_hasher
+
+
+def write_file(directory, size):
+    path = os.path.join(directory, f"hash_{size}.bin")
+    data = os.urandom(size)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path, hashlib.sha256(data).hexdigest()
+
+
+def test_strategies_match_hashlib():
+    """Sizes around every threshold hash identically, with small thresholds to keep files tiny"""
+    print("🔍 Testing hashing strategies...")
+    original = (file_hasher.SMALL_FILE_SIZE, file_hasher.MMAP_THRESHOLD, file_hasher.BLOCK_SIZE)
+    file_hasher.SMALL_FILE_SIZE, file_hasher.MMAP_THRESHOLD, file_hasher.BLOCK_SIZE = 1024, 64 * 1024, 4096
+    file_hasher._buffers.__dict__.clear()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for size in (0, 1, 1024, 1025, 4096 * 3 + 7, 64 * 1024 - 1, 64 * 1024, 300 * 1024 + 5):
+                path, expected = write_file(directory, size)
+                assert file_hasher.hash_file(path) == expected, f"mismatch at {size} bytes"
+    finally:
+        file_hasher.SMALL_FILE_SIZE, file_hasher.MMAP_THRESHOLD, file_hasher.BLOCK_SIZE = original
+        file_hasher._buffers.__dict__.clear()
+    print("✅ Single read, readinto and mmap digests match hashlib")
+
+
+def test_concurrent_hashing():
+    """Threads sharing the module keep separate read buffers"""
+    print("\n🔍 Testing concurrent hashing...")
+    with tempfile.TemporaryDirectory() as directory:
+        files = [write_file(directory, 2 * 1024 * 1024 + i) for i in range(8)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            digests = list(pool.map(file_hasher.hash_file, [path for path, _ in files]))
+        assert digests == [expected for _, expected in files]
+    print("✅ 8 files hashed concurrently with correct digests")
+
+
+def main():
+    """Main test function"""
+    print("🧪 File Hasher Test")
+    print("=" * 40)
+    test_strategies_match_hashlib()
+    test_concurrent_hashing()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
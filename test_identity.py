@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test Identity
+This script checks that a request loads the logged-in user and its role
+profile in one joined query, reuses the profile for the rest of the request,
+serves repeat requests from the identity cache, and drops cached identities
+when a profile changes.
+"""
+
+import os
+import re
+from datetime import date
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, User, Doctor
+from app.services.identity import load_user_with_profile
+
+
+def setup_app():
+    app = create_app()
+    with app.app_context():
+        user = User(username="doctor", email="doctor@ehr.com", password_hash="x", role="doctor")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Doctor(user_id=user.id, first_name="D", last_name="R", specialization="eye",
+                              license_number="D1", phone="1", address="a", experience_years=5, education="MD"))
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    return app, client, user_id
+
+
+def record_statements(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def identity_queries(statements):
+    """Statements that read the user or doctor tables"""
+    return [s for s in statements if re.search(r'FROM "?user\b', s) or s.startswith("SELECT doctor.")]
+
+
+def test_one_query_per_identity():
+    print("🔍 Testing identity loading...")
+    app, client, user_id = setup_app()
+    try:
+        statements = record_statements(app)
+        assert client.get("/doctor/consultations").status_code == 200
+        queries = identity_queries(statements)
+        assert len(queries) == 1 and "JOIN doctor" in queries[0], queries
+
+        del statements[:]
+        assert client.get("/doctor/consultations").status_code == 200
+        assert identity_queries(statements) == [], statements
+        assert app.extensions["identity_cache"].stats["hits"] >= 1
+        print("✅ One joined query, then served from the identity cache")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_profile_changes_invalidate():
+    print("\n🔍 Testing cache invalidation...")
+    app, client, user_id = setup_app()
+    try:
+        client.get("/doctor/consultations")
+        with app.app_context():
+            Doctor.query.filter_by(user_id=user_id).first().first_name = "Gregory"
+            db.session.commit()
+        statements = record_statements(app)
+        assert "Gregory" in client.get("/doctor/profile").get_data(as_text=True)
+        assert len(identity_queries(statements)) == 1
+        print("✅ Profile edits reload the identity")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_loader():
+    print("\n🔍 Testing load_user_with_profile...")
+    app, _, user_id = setup_app()
+    try:
+        with app.test_request_context():
+            user = load_user_with_profile(str(user_id))
+            assert user.role == "doctor" and user.doctor_profile[0].first_name == "D"
+            assert load_user_with_profile("999") is None
+        with app.test_request_context():
+            # A cached identity is a live row in the new request's session
+            user = load_user_with_profile(user_id)
+            assert user in db.session and not db.session.dirty
+        print("✅ Cached users are attached without queries or pending changes")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Identity Test")
+    print("=" * 40)
+    test_one_query_per_identity()
+    test_profile_changes_invalidate()
+    test_loader()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
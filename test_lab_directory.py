@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test Lab Directory
+This script checks the lab /api/patients and /api/doctors endpoints: each
+page is one joined query whatever its size, prefix search and pagination
+work, and cached pages are dropped as soon as a patient change commits.
+"""
+
+import os
+from datetime import date
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, User, Patient, Doctor
+
+NAMES = [("Ada", "Lovelace"), ("Alan", "Turing"), ("Grace", "Hopper"), ("Edsger", "Dijkstra"),
+         ("Barbara", "Liskov"), ("Donald", "Knuth"), ("Ada", "Yonath"), ("Anita", "Borg")]
+
+
+def add_user(role, name):
+    user = User(username=name, email=f"{name}@ehr.com", password_hash="x", role=role)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def add_patient(first, last):
+    user = add_user("patient", f"{first}.{last}".lower())
+    patient = Patient(user_id=user.id, first_name=first, last_name=last, date_of_birth=date(1990, 1, 1),
+                      gender="F", phone="555", address="a", emergency_contact="1")
+    db.session.add(patient)
+    return patient
+
+
+def setup_app():
+    app = create_app()
+    with app.app_context():
+        lab_id = add_user("lab", "lab").id
+        for first, last in NAMES:
+            add_patient(first, last)
+        user = add_user("doctor", "house")
+        db.session.add(Doctor(user_id=user.id, first_name="Gregory", last_name="House", specialization="eye",
+                              license_number="D1", phone="1", address="a", experience_years=9, education="MD"))
+        db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(lab_id)
+    return app, client
+
+
+def count_statements(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_single_query():
+    print("🔍 Testing joined projection...")
+    app, client = setup_app()
+    try:
+        statements = count_statements(app)
+        body = client.get("/lab/api/patients?per_page=100").get_json()
+        selects = [s for s in statements if s.startswith("SELECT patient.")]
+        assert len(selects) == 1, selects
+        assert [row["name"] for row in body["results"][:2]] == ["Anita Borg", "Edsger Dijkstra"]
+        assert body["results"][0]["email"] == "anita.borg@ehr.com" and body["results"][0]["phone"] == "555"
+        assert not body["has_more"]
+
+        doctors = client.get("/lab/api/doctors").get_json()["results"]
+        assert doctors == [{"id": doctors[0]["id"], "name": "Dr. Gregory House",
+                            "email": "house@ehr.com", "specialization": "eye"}]
+        print("✅ One query per page, no per-row user lookups")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_search_and_pages():
+    print("\n🔍 Testing search and pagination...")
+    app, client = setup_app()
+    try:
+        names = lambda url: [row["name"] for row in client.get(url).get_json()["results"]]
+        assert names("/lab/api/patients?q=ada") == ["Ada Lovelace", "Ada Yonath"]
+        assert names("/lab/api/patients?q=ada%20y") == ["Ada Yonath"]
+        assert names("/lab/api/patients?q=tur") == ["Alan Turing"]
+        assert names("/lab/api/patients?q=grace.h") == ["Grace Hopper"]
+        assert names("/lab/api/patients?q=%25") == []
+
+        first = client.get("/lab/api/patients?per_page=3").get_json()
+        last = client.get("/lab/api/patients?per_page=3&page=3").get_json()
+        assert len(first["results"]) == 3 and first["has_more"]
+        assert len(last["results"]) == 2 and not last["has_more"]
+        print("✅ Prefix search on name and email, pages of per_page")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_cache_invalidation():
+    print("\n🔍 Testing cached pages...")
+    app, client = setup_app()
+    try:
+        cache = app.extensions["lab_directory_cache"]
+        assert len(client.get("/lab/api/patients?q=a").get_json()["results"]) == 4
+        client.get("/lab/api/patients?q=a")
+        assert cache.stats["hits"] == 1
+
+        with app.app_context():
+            add_patient("Alice", "Ball")
+            db.session.commit()
+        assert len(client.get("/lab/api/patients?q=a").get_json()["results"]) == 5
+        print("✅ Pages cached and dropped when a patient is added")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_cache_cleared_on_commit():
+    """Entries cached between a flush and its commit are dropped by the commit, or by a rollback"""
+    print("\n🔍 Testing invalidation timing...")
+    app, client = setup_app()
+    try:
+        cache = app.extensions["lab_directory_cache"]
+        with app.app_context():
+            add_patient("Alice", "Ball")
+            db.session.flush()
+            # A concurrent request still sees the committed rows and caches them
+            cache.set("page", "before Alice")
+            assert cache.get("page") == "before Alice"
+            db.session.commit()
+            assert cache.get("page") is None
+
+            add_patient("Bob", "Cole")
+            db.session.flush()
+            cache.set("page", "with uncommitted Bob")
+            db.session.rollback()
+            assert cache.get("page") is None
+
+            cache.set("page", "unrelated")
+            db.session.commit()
+            assert cache.get("page") == "unrelated"
+        assert len(client.get("/lab/api/patients?q=a").get_json()["results"]) == 5
+        print("✅ Cache cleared when the change commits, not when it flushes")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Lab Directory Test")
+    print("=" * 40)
+    test_single_query()
+    test_search_and_pages()
+    test_cache_invalidation()
+    test_cache_cleared_on_commit()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
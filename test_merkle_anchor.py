@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test Merkle Anchoring
+This script checks the Merkle tree and inclusion proofs used by anchoring mode,
+and runs MerkleAnchorService against a stand-in for the contract, so no Ganache is needed.
+"""
+
+import hashlib
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from app.models import db, AnchoredFile, MerkleAnchor
+from app.services.file_verification_service import FileVerificationService
+from app.services.merkle_anchor_service import (
+    MerkleAnchorService, build_merkle_tree, merkle_proof, verify_merkle_proof
+)
+
+
+def file_hash(i):
+    return hashlib.sha256(f"file-{i}".encode()).hexdigest()
+
+
+class FakeBlockchainService:
+    """Keeps anchored roots in memory like the contract's merkleAnchors mapping"""
+
+    def __init__(self):
+        self.contract_address = "0xContract"
+        self.roots = {}
+        self.root_reads = 0
+
+    def ensure_contract(self):
+        return True
+
+    def anchor_merkle_root(self, root, leaf_count):
+        anchor_id = len(self.roots) + 1
+        self.roots[anchor_id] = root
+        return {"anchor_id": anchor_id, "transaction_hash": f"0x{anchor_id:064x}", "block_number": anchor_id}
+
+    def get_anchored_root(self, anchor_id):
+        self.root_reads += 1
+        return self.roots.get(anchor_id)
+
+
+def test_proofs_cover_every_leaf():
+    """Every leaf proves against the root for odd and even tree sizes; other hashes do not"""
+    print("🔍 Testing Merkle proofs...")
+    for size in (1, 2, 3, 7, 8, 1000):
+        hashes = [file_hash(i) for i in range(size)]
+        levels = build_merkle_tree(hashes)
+        root = levels[-1][0].hex()
+        for index in {0, size // 2, size - 1}:
+            proof = merkle_proof(levels, index)
+            assert verify_merkle_proof(hashes[index], proof, root)
+            assert not verify_merkle_proof(file_hash(size + 1), proof, root)
+        assert len(merkle_proof(levels, size - 1)) <= (size - 1).bit_length()
+    print("✅ Inclusion proofs verified for trees of 1 to 1000 leaves")
+
+
+def test_service_anchors_window_and_verifies():
+    """A full count window is anchored with one root and files verify with one root read"""
+    print("\n🔍 Testing MerkleAnchorService...")
+    app = create_app()
+    with app.app_context():
+        chain = FakeBlockchainService()
+        anchor_service = MerkleAnchorService(chain, max_leaves=50, window_seconds=3600)
+        app.extensions['merkle_anchor_service'] = anchor_service
+
+        for i in range(120):
+            assert anchor_service.add_file(file_name=f"file{i}.txt", file_hash=file_hash(i)) is not None
+        assert anchor_service.add_file(file_name="copy.txt", file_hash=file_hash(0)) is None
+
+        # Two full windows were anchored as they filled; the rest waits for the time window
+        assert len(chain.roots) == 2
+        assert anchor_service.pending_count() == 20
+        assert not anchor_service.is_due()
+        assert anchor_service.flush().leaf_count == 20
+        assert MerkleAnchor.query.count() == 3
+
+        file_service = FileVerificationService(blockchain_service=chain)
+        record = AnchoredFile.query.filter_by(file_hash=file_hash(77)).one()
+        result = file_service.verify_file_integrity(record.id, file_bytes=b"file-77", anchored=True)
+        assert result["success"] and result["is_match"] and result["proof_valid"] and result["root_matches"]
+
+        tampered = file_service.verify_file_integrity(record.id, file_bytes=b"file-77!", anchored=True)
+        assert tampered["success"] and not tampered["is_match"]
+
+        # A root that differs from the anchored one fails even with an intact file
+        chain.roots[record.merkle_anchor.anchor_id] = "00" * 32
+        chain.root_reads = 0
+        forged = file_service.verify_file_integrity(record.id, file_bytes=b"file-77", anchored=True)
+        assert not forged["is_match"] and not forged["root_matches"]
+        assert chain.root_reads == 1
+        print("✅ 120 files anchored in 3 transactions; tampered files and roots are rejected")
+
+        db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Merkle Anchoring Test")
+    print("=" * 40)
+    test_proofs_cover_every_leaf()
+    test_service_anchors_window_and_verifies()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test Model Registry
+This script checks that RetinalModelRegistry loads model.pkl once, shares it
+between threads, swaps in a changed file and keeps the old model when the
+new file is broken.
+"""
+
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.model_registry import RetinalModelRegistry
+
+
+def write_model(path, model, mtime=None):
+    with open(path, "wb") as f:
+        pickle.dump(model, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_loads_once_and_shares():
+    """Many lookups from many threads cost one load"""
+    print("🔍 Testing single load...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.pkl")
+        write_model(path, {"a" * 32: "CNV", "b" * 32: ("DME", 0.8)})
+        registry = RetinalModelRegistry(path, check_interval=60)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(registry.lookup, ["a" * 32, "b" * 32, "c" * 32] * 50))
+        assert results[:3] == ["CNV", ("DME", 0.8), None]
+        assert registry.stats["loads"] == 1
+        assert registry.get() is registry.get()
+
+        try:
+            registry.get()["d" * 32] = "MH"
+            assert False, "shared model should be read-only"
+        except TypeError:
+            pass
+
+        stats = registry.get_stats()
+        assert stats["entries"] == 2 and stats["lookups"] == 150 and stats["hits"] == 100
+        assert stats["avg_lookup_us"] is not None
+    print("✅ Model loaded once for 150 concurrent lookups")
+
+
+def test_hot_reload():
+    """A newer file is swapped in; a broken one leaves the current model in place"""
+    print("\n🔍 Testing hot reload...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.pkl")
+        write_model(path, {"a" * 32: "CNV"}, mtime=1000)
+        registry = RetinalModelRegistry(path, check_interval=0)
+        old = registry.get()
+        assert registry.lookup("a" * 32) == "CNV"
+
+        write_model(path, {"a" * 32: "AMD", "b" * 32: "MH"}, mtime=2000)
+        assert registry.lookup("a" * 32) == "AMD"
+        assert registry.stats["loads"] == 2 and registry.stats["entries"] == 2
+        assert old["a" * 32] == "CNV", "readers holding the old model are unaffected"
+
+        with open(path, "wb") as f:
+            f.write(b"not a pickle")
+        os.utime(path, (3000, 3000))
+        assert registry.lookup("b" * 32) == "MH"
+        assert registry.lookup("a" * 32) == "AMD"
+        assert registry.stats["load_failures"] == 1, "a broken file is tried once"
+    print("✅ Changed model swapped in, broken model ignored")
+
+
+def test_missing_model():
+    print("\n🔍 Testing missing model...")
+    registry = RetinalModelRegistry(os.path.join(tempfile.gettempdir(), "no-such-model.pkl"))
+    assert registry.get() is None
+    assert registry.lookup("a" * 32) is None
+    print("✅ Missing model reported as unavailable")
+
+
+def main():
+    """Main test function"""
+    print("🧪 Model Registry Test")
+    print("=" * 40)
+    test_loads_once_and_shares()
+    test_hot_reload()
+    test_missing_model()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
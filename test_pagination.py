@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Test Pagination
+This script checks the shared keyset pagination helper: walking forwards and
+backwards visits every row exactly once even when sort keys tie or are NULL,
+bad cursors fall back to the first page, and list views render one page with links to
+the next.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from app.models import db, User, Patient, Doctor, Consultation, MedicalRecord, Prescription
+from app.services.pagination import keyset_paginate, encode_cursor, decode_cursor
+
+
+def add_user(role, name):
+    user = User(username=name, email=f"{name}@ehr.com", password_hash="x", role=role)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def add_people():
+    patient_user, doctor_user = add_user("patient", "patient"), add_user("doctor", "doctor")
+    patient = Patient(user_id=patient_user.id, first_name="P", last_name="Q", date_of_birth=date(1990, 1, 1),
+                      gender="F", phone="1", address="a", emergency_contact="2")
+    doctor = Doctor(user_id=doctor_user.id, first_name="D", last_name="R", specialization="eye", license_number="D1",
+                    phone="1", address="a", experience_years=5, education="MD")
+    db.session.add_all([patient, doctor])
+    db.session.flush()
+    return patient, doctor
+
+
+def add_records(patient, count):
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        # Pairs of records share a timestamp so the id tie-breaker matters
+        db.session.add(MedicalRecord(patient_id=patient.id, record_type="consultation",
+                                     record_id=i, title=f"Record {i}", description="d",
+                                     created_at=start + timedelta(minutes=i // 2)))
+    db.session.commit()
+
+
+def test_walk_pages():
+    print("🔍 Testing keyset walk...")
+    app = create_app()
+    with app.app_context():
+        try:
+            patient, _ = add_people()
+            add_records(patient, 23)
+            columns = (MedicalRecord.created_at, MedicalRecord.id)
+            expected = [r.id for r in MedicalRecord.query.order_by(MedicalRecord.created_at.desc(), MedicalRecord.id.desc())]
+
+            seen, pages, cursor = [], [], None
+            while True:
+                page = keyset_paginate(MedicalRecord.query, columns, per_page=5, after=cursor)
+                pages.append(page)
+                seen += [r.id for r in page]
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            assert seen == expected and len(pages) == 5
+            assert not pages[0].has_prev and pages[1].has_prev
+
+            back = keyset_paginate(MedicalRecord.query, columns, per_page=5, before=pages[-1].prev_cursor)
+            assert [r.id for r in back] == [r.id for r in pages[-2]] and back.has_next and back.has_prev
+            first = keyset_paginate(MedicalRecord.query, columns, per_page=5, before=pages[1].prev_cursor)
+            assert [r.id for r in first] == [r.id for r in pages[0]] and not first.has_prev
+
+            assert decode_cursor("not-a-cursor", columns) is None
+            assert decode_cursor(encode_cursor([1]), columns) is None
+            assert [r.id for r in keyset_paginate(MedicalRecord.query, columns, 5, after="garbage")] == expected[:5]
+
+            dated = (Consultation.date, Consultation.id)
+            assert decode_cursor(encode_cursor([date(2024, 5, 1), 3]), dated) == [date(2024, 5, 1), 3]
+            print("✅ Every row visited once in both directions")
+        finally:
+            db.drop_all()
+
+
+def test_null_sort_keys():
+    print("\n🔍 Testing NULL sort keys...")
+    app = create_app()
+    with app.app_context():
+        try:
+            patient, doctor = add_people()
+            for i in range(9):
+                db.session.add(Prescription(patient_id=patient.id, doctor_id=doctor.id, medication_name=f"Drug {i}",
+                                            dosage="1", frequency="daily", duration="7 days",
+                                            prescribed_date=date(2024, 1, 1) + timedelta(days=i // 2)))
+            db.session.commit()
+            # Undated prescriptions straddle the page boundaries below
+            undated = [p.id for p in Prescription.query.order_by(Prescription.id).limit(5)]
+            Prescription.query.filter(Prescription.id.in_(undated)).update({"prescribed_date": None})
+            db.session.commit()
+
+            columns = (Prescription.prescribed_date, Prescription.id)
+            dated = Prescription.query.filter(Prescription.prescribed_date.isnot(None))
+            expected = [p.id for p in dated.order_by(Prescription.prescribed_date.desc(), Prescription.id.desc())]
+            expected += sorted(undated, reverse=True)
+
+            seen, pages, cursor = [], [], None
+            while True:
+                page = keyset_paginate(Prescription.query, columns, per_page=2, after=cursor)
+                pages.append(page)
+                seen += [p.id for p in page]
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            assert seen == expected and len(pages) == 5
+
+            for i in range(1, len(pages)):
+                back = keyset_paginate(Prescription.query, columns, per_page=2, before=pages[i].prev_cursor)
+                assert [p.id for p in back] == [p.id for p in pages[i - 1]]
+
+            ascending = []
+            cursor = None
+            while True:
+                page = keyset_paginate(Prescription.query, columns, per_page=2, after=cursor, descending=False)
+                ascending += [p.id for p in page]
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            assert ascending == list(reversed(expected))
+
+            assert decode_cursor(encode_cursor([None, 5]), columns) == [None, 5]
+            print("✅ NULL sort keys paged through in both directions")
+        finally:
+            db.drop_all()
+
+
+def test_list_views():
+    print("\n🔍 Testing paginated list views...")
+    app = create_app()
+    app.config['LIST_PAGE_SIZE'] = 4
+    try:
+        with app.app_context():
+            patient, doctor = add_people()
+            add_records(patient, 6)
+            for i in range(6):
+                db.session.add(Consultation(patient_id=patient.id, doctor_id=doctor.id,
+                                            date=date(2024, 1, 1) + timedelta(days=i), time=datetime(2024, 1, 1, 9).time(), reason="checkup",
+                                            status="completed" if i % 2 else "scheduled"))
+            db.session.commit()
+            ids = {"patient": patient.user_id, "doctor": doctor.user_id}
+
+        def get(username, url):
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session["_user_id"] = str(ids[username])
+            return client.get(url)
+
+        first = get("patient", "/patient/records").get_data(as_text=True)
+        assert first.count("View Details") == 4 and "after=" in first
+        cursor = first.split("after=")[1].split('"')[0]
+        second = get("patient", f"/patient/records?after={cursor}").get_data(as_text=True)
+        assert second.count("View Details") == 2 and "before=" in second
+
+        consultations = get("doctor", "/doctor/consultations").get_data(as_text=True)
+        assert '<h4 class="mb-0">6</h4>' in consultations and '<h4 class="mb-0">3</h4>' in consultations
+        print("✅ Pages of LIST_PAGE_SIZE with totals across all pages")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Pagination Test")
+    print("=" * 40)
+    test_walk_pages()
+    test_null_sort_keys()
+    test_list_views()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test Perceptual Index
+This script checks pHash/dHash robustness to re-encoding, that BK-tree
+search returns the same nearest neighbour as a linear scan, that the index
+survives a save/load round trip, and that batch detection falls back to it
+for copies of known scans.
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import random
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from app.services.model_registry import RetinalModelRegistry
+from app.services.perceptual_index import (
+    PerceptualIndex, build_index_from_sources, dhash, hamming, phash
+)
+from app.services.retinal_detection import RetinalBatchDetector, path_sources
+
+
+def make_scan(seed, size=256):
+    """Smooth synthetic 'scan': random low-resolution pattern scaled up"""
+    rng = np.random.default_rng(seed)
+    small = Image.fromarray(rng.integers(0, 256, (8, 8), dtype=np.uint8))
+    return small.resize((size, size), Image.BICUBIC).convert('RGB')
+
+
+def encode(image, fmt='PNG', **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def test_hashes_survive_reencoding():
+    print("🔍 Testing perceptual hashes...")
+    for seed in range(5):
+        original = make_scan(seed)
+        copy = Image.open(io.BytesIO(encode(original.resize((200, 200)), 'JPEG', quality=70)))
+        other = make_scan(seed + 100)
+        for algorithm in (phash, dhash):
+            assert hamming(algorithm(original), algorithm(copy)) <= 6, algorithm.__name__
+            assert hamming(algorithm(original), algorithm(other)) > 12, algorithm.__name__
+    print("✅ Resized JPEG copies stay close, different scans stay far apart")
+
+
+def test_bk_tree_matches_linear_scan():
+    """Nearest neighbour within the radius agrees with brute force"""
+    print("\n🔍 Testing BK-tree search...")
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    index = PerceptualIndex.build((value, f"L{i % 5}", 1.0) for i, value in enumerate(hashes))
+    assert len(index) == 5000
+
+    for _ in range(200):
+        base = rng.choice(hashes)
+        query = base
+        for bit in rng.sample(range(64), rng.randint(0, 6)):
+            query ^= 1 << bit
+        best = min(hamming(query, value) for value in hashes)
+        match = index.nearest(query, max_distance=8)
+        if best <= 8:
+            assert match is not None and match[2] == best
+        else:
+            assert match is None
+    assert index.nearest(rng.getrandbits(64), max_distance=2) is None
+    print("✅ 200 queries agree with a linear scan")
+
+
+def test_save_and_load():
+    print("\n🔍 Testing save and load...")
+    rng = random.Random(3)
+    entries = [(rng.getrandbits(64), "CNV" if i % 2 else "DME", 0.5 + i % 2 * 0.5) for i in range(500)]
+    index = PerceptualIndex.build(entries, algorithm='dhash')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.phash")
+        index.save(path)
+        loaded = PerceptualIndex.load(path)
+        assert loaded.algorithm == 'dhash' and len(loaded) == 500
+        for value, label, confidence in entries[:50]:
+            assert loaded.nearest(value, 0) == (label, confidence, 0)
+        assert os.listdir(directory) == ["model.phash"]
+    print("✅ Index round-trips through disk")
+
+
+def test_detection_falls_back_to_index():
+    """Reference scans labelled by the exact model; re-encoded copies resolve through the index"""
+    print("\n🔍 Testing near-duplicate detection...")
+    with tempfile.TemporaryDirectory() as directory:
+        references = os.path.join(directory, "references")
+        os.makedirs(os.path.join(references, "DRUSEN"))
+        model = {}
+        for seed in range(6):
+            data = encode(make_scan(seed))
+            with open(os.path.join(references, f"ref_{seed}.png"), "wb") as f:
+                f.write(data)
+            model[hashlib.md5(data).hexdigest()] = "CNV" if seed % 2 else ("DME", 0.9)
+        with open(os.path.join(references, "DRUSEN", "extra.png"), "wb") as f:
+            f.write(encode(make_scan(50)))
+
+        model_path = os.path.join(directory, "model.pkl")
+        with open(model_path, "wb") as f:
+            pickle.dump(model, f)
+        registry = RetinalModelRegistry(model_path)
+        index, stats = build_index_from_sources(path_sources([references]), registry.get(), label_from_folder=True)
+        assert stats == {"images": 7, "indexed": 7, "unlabelled": 0, "unreadable": 0}
+        index.save(os.path.join(directory, "model.phash"))
+
+        queries = os.path.join(directory, "queries")
+        os.makedirs(queries)
+        for seed in (0, 1, 50, 200):
+            with open(os.path.join(queries, f"q_{seed:03d}.jpg"), "wb") as f:
+                f.write(encode(make_scan(seed).resize((224, 224)), 'JPEG', quality=75))
+
+        detector = RetinalBatchDetector(
+            registry,
+            perceptual_registry=RetinalModelRegistry(os.path.join(directory, "model.phash"),
+                                                     loader=PerceptualIndex.load, required=False)
+        )
+        results, summary = detector.detect_all(path_sources([queries]))
+        assert [r["diagnosis"] for r in results] == ["DME", "CNV", "DRUSEN", "Unknown"]
+        assert all(r["match"] == "perceptual" for r in results[:3]) and results[3]["match"] is None
+        assert 0.8 < results[0]["confidence"] <= 0.9
+        assert summary["classified"] == 3
+    print("✅ Re-encoded copies classified through the perceptual index")
+
+
+def main():
+    """Main test function"""
+    print("🧪 Perceptual Index Test")
+    print("=" * 40)
+    test_hashes_survive_reencoding()
+    test_bk_tree_matches_linear_scan()
+    test_save_and_load()
+    test_detection_falls_back_to_index()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test Query Counts
+This script renders the doctor, lab and patient pages that loop over related
+rows and counts the SQL statements each one runs. Every page must stay within
+its budget, and adding rows must not add statements, so a relationship that
+loses its eager loading (an N+1 query) fails here.
+"""
+
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, User, Patient, Doctor, Lab, Consultation, LabReport, LabRequest, MedicalRecord, Prescription
+
+# Most statements a page may run, however many rows it shows
+PAGE_BUDGETS = {
+    "doctor": {
+        "/doctor/dashboard": 4,
+        "/doctor/consultations": 3,
+        "/doctor/patients": 2,
+        "/doctor/lab-reports": 2,
+        # prescribed_date may be NULL, so the undated tail is a second range read
+        "/doctor/prescriptions": 3,
+    },
+    "lab": {
+        "/lab/dashboard": 6,
+        "/lab/reports": 2,
+        "/lab/requests": 4,
+    },
+    "patient": {
+        "/patient/consultations": 2,
+        "/patient/lab-reports": 2,
+        "/patient/prescriptions": 2,
+        "/patient/lab-requests": 2,
+    },
+}
+
+
+@contextmanager
+def count_statements(engine):
+    """Collect every statement sent to the database inside the block"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def add_user(role, name):
+    user = User(username=name, email=f"{name}@ehr.com", password_hash="x", role=role)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def seed(rows):
+    """
+    rows of everything, each related to a different doctor, lab or patient so
+    that lazy loading would cost one query per row
+    """
+    doctors, labs, patients = [], [], []
+    for i in range(rows):
+        user = add_user("doctor", f"doctor{i}")
+        doctors.append(Doctor(user_id=user.id, first_name="D", last_name=str(i), specialization="eye",
+                              license_number=f"D{i}", phone="1", address="a", experience_years=5, education="MD"))
+        user = add_user("lab", f"lab{i}")
+        labs.append(Lab(user_id=user.id, lab_name=f"Lab {i}", license_number=f"L{i}", phone="1", address="a",
+                        specialization="eye"))
+        user = add_user("patient", f"patient{i}")
+        patients.append(Patient(user_id=user.id, first_name="P", last_name=str(i), date_of_birth=date(1990, 1, 1),
+                                gender="F", phone="1", address="a", emergency_contact="2"))
+    db.session.add_all(doctors + labs + patients)
+    db.session.flush()
+
+    today = datetime.now().date()
+    start = datetime(2024, 1, 1)
+    doctor, lab, patient = doctors[0], labs[0], patients[0]
+    for i in range(rows):
+        when = start + timedelta(hours=i)
+        db.session.add_all([
+            # The first doctor and lab see every patient...
+            Consultation(patient_id=patients[i].id, doctor_id=doctor.id, date=today, time=when.time(),
+                         reason="checkup", status="scheduled"),
+            LabReport(patient_id=patients[i].id, doctor_id=doctors[i].id, lab_id=lab.id, report_type="retinal",
+                      created_at=when),
+            LabRequest(patient_id=patients[i].id, doctor_id=doctors[i].id, lab_id=lab.id, request_type="retinal",
+                       reason="scan", created_at=when),
+            Prescription(patient_id=patients[i].id, doctor_id=doctor.id, medication_name="m", dosage="1",
+                         frequency="daily", duration="7d", prescribed_date=when.date()),
+            MedicalRecord(patient_id=patients[i].id, record_type="consultation", record_id=i, title="Visit",
+                          description="d", created_at=when),
+            # ...and the first patient sees every doctor and lab
+            Consultation(patient_id=patient.id, doctor_id=doctors[i].id, date=when.date(), time=when.time(),
+                         reason="checkup", status="completed"),
+            LabReport(patient_id=patient.id, doctor_id=doctors[i].id, lab_id=labs[i].id, report_type="retinal",
+                      created_at=when),
+            LabRequest(patient_id=patient.id, doctor_id=doctors[i].id, lab_id=labs[i].id, request_type="retinal",
+                       reason="scan", created_at=when),
+            Prescription(patient_id=patient.id, doctor_id=doctors[i].id, medication_name="m", dosage="1",
+                         frequency="daily", duration="7d", prescribed_date=when.date()),
+        ])
+    db.session.commit()
+    return {"doctor": doctor.user_id, "lab": lab.user_id, "patient": patient.user_id}
+
+
+def page_counts(rows):
+    """Statements run by each budgeted page over a database with rows of everything"""
+    app = create_app()
+    try:
+        with app.app_context():
+            ids = seed(rows)
+            engine = db.engine
+        counts = {}
+        for role, budgets in PAGE_BUDGETS.items():
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session["_user_id"] = str(ids[role])
+            for url in budgets:
+                # Count a cold request, including loading the user and profile
+                app.extensions["identity_cache"].clear()
+                with count_statements(engine) as statements:
+                    response = client.get(url)
+                assert response.status_code == 200, (url, response.status_code)
+                counts[url] = len(statements)
+        return counts
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_pages_within_budget():
+    print("🔍 Testing statements per page...")
+    few, many = page_counts(3), page_counts(12)
+    for role, budgets in PAGE_BUDGETS.items():
+        for url, budget in budgets.items():
+            assert many[url] <= budget, f"{url} ran {many[url]} statements, budget {budget}"
+            assert many[url] == few[url], f"{url} ran {few[url]} statements for 3 rows but {many[url]} for 12"
+            print(f"   {url:<28}{many[url]:>3} statements (budget {budget})")
+    print("✅ Every page within budget, independent of row count")
+
+
+def main():
+    """Main test function"""
+    print("🧪 Query Counts Test")
+    print("=" * 40)
+    test_pages_within_budget()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
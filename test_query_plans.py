@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Test Query Plans
+This script checks that the hot dashboard and list routes stay on indexes:
+every SQL statement they run is re-run under EXPLAIN QUERY PLAN, and any
+full scan of a large table fails the test. Pages deep into a list must read
+their sort key as an index range, and the index migration must add missing
+indexes to an existing database.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from sqlalchemy import event, inspect
+
+from app import create_app
+from app.models import (db, User, Patient, Doctor, Lab, Consultation, LabReport, LabRequest, MedicalRecord, Prescription,
+                        ChainFileRecord)
+from app.services.pagination import encode_cursor
+from migrate_indexes import missing_indexes
+
+# Tables that grow with use; small lookup tables may be scanned
+LARGE_TABLES = {"user", "patient", "doctor", "lab", "consultation", "lab_report", "lab_request",
+                "medical_record", "prescription", "chain_file_record"}
+
+HOT_ROUTES = {
+    "doctor": ["/doctor/dashboard", "/doctor/consultations", "/doctor/lab-reports", "/doctor/patients",
+               "/doctor/prescriptions"],
+    "patient": ["/patient/dashboard", "/patient/records", "/patient/lab-reports", "/patient/prescriptions",
+                "/patient/consultations"],
+    "lab": ["/lab/dashboard", "/lab/reports", "/lab/requests"],
+}
+
+# Paged lists and the plan detail their sort key must show past a deep cursor
+DEEP_PAGES = [
+    ("lab", "/lab/reports", "created_at<?"),
+    ("lab", "/lab/requests", "created_at<?"),
+    ("patient", "/patient/records", "created_at<?"),
+    ("doctor", "/doctor/lab-reports", "created_at<?"),
+    ("doctor", "/doctor/prescriptions", "prescribed_date<?"),
+]
+
+
+def add_user(role, name):
+    user = User(username=name, email=f"{name}@ehr.com", password_hash="x", role=role)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def seed():
+    """A few profiles with enough rows that the planner has a real choice"""
+    labs, doctors, patients = [], [], []
+    for i in range(10):
+        user = add_user("lab", f"lab{i}")
+        labs.append(Lab(user_id=user.id, lab_name=f"Lab {i}", license_number=f"L{i}", phone="1", address="a",
+                        specialization="eye"))
+        user = add_user("doctor", f"doctor{i}")
+        doctors.append(Doctor(user_id=user.id, first_name="D", last_name=str(i), specialization="eye",
+                              license_number=f"D{i}", phone="1", address="a", experience_years=5, education="MD"))
+    for i in range(100):
+        user = add_user("patient", f"patient{i}")
+        patients.append(Patient(user_id=user.id, first_name="P", last_name=str(i), date_of_birth=date(1990, 1, 1),
+                                gender="F", phone="1", address="a", emergency_contact="2"))
+    db.session.add_all(labs + doctors + patients)
+    db.session.flush()
+
+    start = datetime(2024, 1, 1)
+    for i in range(500):
+        # Each patient sees one doctor and one lab, as most do
+        patient, doctor, lab = patients[i % 100], doctors[i % 10], labs[i % 10]
+        when = start + timedelta(hours=i)
+        consultation = Consultation(patient_id=patient.id, doctor_id=doctor.id, date=when.date(), time=when.time(),
+                                    reason="checkup", status=("scheduled", "completed")[i % 2])
+        db.session.add(consultation)
+        db.session.flush()
+        db.session.add_all([
+            LabReport(patient_id=patient.id, doctor_id=doctor.id, lab_id=lab.id, consultation_id=consultation.id,
+                      report_type="retinal", status=("pending", "completed")[i % 2], created_at=when),
+            LabRequest(patient_id=patient.id, doctor_id=doctor.id, lab_id=lab.id, request_type="retinal",
+                       reason="scan", created_at=when),
+            MedicalRecord(patient_id=patient.id, record_type="consultation", record_id=consultation.id,
+                          title="Visit", description="d", created_at=when),
+            Prescription(patient_id=patient.id, doctor_id=doctor.id, medication_name="m", dosage="1",
+                         frequency="daily", duration="7d", prescribed_date=when.date()),
+        ])
+    db.session.commit()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    return {"doctor": doctors[0].user_id, "patient": patients[0].user_id, "lab": labs[0].user_id}
+
+
+def full_scans(connection, statement, parameters):
+    """Plan lines of statement that read a whole large table"""
+    plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        if words[0] == "SCAN" and words[1] in LARGE_TABLES and "USING" not in words:
+            scans.append(detail)
+    return scans
+
+
+def test_hot_routes_use_indexes():
+    print("🔍 Testing query plans of hot routes...")
+    app = create_app()
+    try:
+        with app.app_context():
+            ids = seed()
+            engine = db.engine
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", record)
+        problems = []
+        try:
+            for role, urls in HOT_ROUTES.items():
+                for url in urls:
+                    client = app.test_client()
+                    with client.session_transaction() as session:
+                        session["_user_id"] = str(ids[role])
+                    del statements[:]
+                    response = client.get(url)
+                    assert response.status_code == 200, (url, response.status_code)
+                    with engine.connect() as connection:
+                        for statement, parameters in list(statements):
+                            for scan in full_scans(connection, statement, parameters):
+                                problems.append(f"{url}: {scan}\n    {statement}")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert not problems, "Full table scans:\n" + "\n".join(problems)
+        print(f"✅ {sum(len(urls) for urls in HOT_ROUTES.values())} routes, no full scans of large tables")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_deep_pages_use_ranges():
+    """A deep cursor must narrow the index scan, or each page costs more the further in it is"""
+    print("\n🔍 Testing query plans of deep pages...")
+    app = create_app()
+    try:
+        with app.app_context():
+            ids = seed()
+            engine = db.engine
+        # Only the oldest tenth of the seeded rows lie past this cursor
+        deep = datetime(2024, 1, 1) + timedelta(hours=50)
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "LIMIT" in statement:
+                statements.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", record)
+        problems = []
+        try:
+            for role, url, key_range in DEEP_PAGES:
+                value = deep.date() if "prescribed_date" in key_range else deep
+                client = app.test_client()
+                with client.session_transaction() as session:
+                    session["_user_id"] = str(ids[role])
+                del statements[:]
+                response = client.get(url, query_string={"after": encode_cursor([value, 10 ** 6])})
+                assert response.status_code == 200, (url, response.status_code)
+                with engine.connect() as connection:
+                    plans = [connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                             for statement, parameters in statements]
+                details = [row[-1] for plan in plans for row in plan]
+                if not any(key_range in detail for detail in details):
+                    problems.append(f"{url}: no {key_range} range in\n    " + "\n    ".join(details))
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert not problems, "Deep pages without a sort key range:\n" + "\n".join(problems)
+        print(f"✅ {len(DEEP_PAGES)} paged lists read deep pages as index ranges")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def test_file_hash_lookup_uses_index():
+    """Duplicate-upload checks and blob audits look chain files up by hash"""
+    print("\n🔍 Testing query plan of file hash lookups...")
+    app = create_app()
+    with app.app_context():
+        try:
+            db.session.add_all([ChainFileRecord(
+                contract_address="0xContract", file_id=i, file_name=f"scan_{i}.png", file_hash=f"{i:064x}",
+                ipfs_hash=f"Qm{i}", file_type="png", file_size=1, uploaded_by=f"0xUploader{i % 5}",
+                patient_address="0xPatient", timestamp=0, is_valid=True, file_metadata="{}", block_number=i,
+                transaction_hash=f"0x{i:064x}") for i in range(1, 501)])
+            db.session.commit()
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("ANALYZE")
+
+            query = ChainFileRecord.query.filter_by(contract_address="0xContract", file_hash=f"{7:064x}")
+            statement = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+            with db.engine.connect() as connection:
+                plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+                assert not full_scans(connection, str(statement), ()), plan
+            assert any("ix_chain_file_record_hash" in row[-1] for row in plan), plan
+            print("✅ File hash lookups use ix_chain_file_record_hash")
+        finally:
+            db.drop_all()
+
+
+def test_migration_adds_missing_indexes():
+    print("\n🔍 Testing index migration...")
+    app = create_app()
+    with app.app_context():
+        try:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("DROP INDEX ix_lab_report_lab_status")
+                connection.exec_driver_sql("DROP INDEX ix_patient_user_id")
+            missing = sorted(index.name for index in missing_indexes(db.engine))
+            assert missing == ["ix_lab_report_lab_status", "ix_patient_user_id"], missing
+
+            for index in missing_indexes(db.engine):
+                index.create(db.engine)
+            assert not missing_indexes(db.engine)
+            names = {index["name"] for index in inspect(db.engine).get_indexes("lab_report")}
+            assert "ix_lab_report_lab_status" in names
+            print("✅ Missing indexes found and created")
+        finally:
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Query Plans Test")
+    print("=" * 40)
+    test_hot_routes_use_indexes()
+    test_deep_pages_use_ranges()
+    test_file_hash_lookup_uses_index()
+    test_migration_adds_missing_indexes()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test Retinal Engine
+This script trains the NumPy classifier on synthetic scans, checks batched and
+single predictions agree, that concurrent requests are micro-batched, and
+that batch detection falls back to the engine when no hash matches.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+import numpy as np
+from PIL import Image
+
+from app.services.model_registry import RetinalModelRegistry
+from app.services.retinal_detection import RetinalBatchDetector, path_sources
+from app.services.retinal_engine import (
+    MicroBatcher, RetinalClassifierEngine, SoftmaxClassifier, preprocess
+)
+
+CLASSES = ["CNV", "DME", "DRUSEN", "NORMAL"]
+
+
+def make_scan(label, seed, size=128):
+    """Stripes whose orientation and frequency depend on the label, plus noise"""
+    rng = np.random.default_rng(seed)
+    k = CLASSES.index(label)
+    y, x = np.mgrid[0:size, 0:size] / size
+    pattern = np.sin(2 * np.pi * (k + 2) * (x if k % 2 else y))
+    pixels = 128 + 60 * pattern + rng.normal(0, 25, (size, size))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).convert('RGB')
+
+
+def train(samples=20):
+    images = [make_scan(label, seed) for label in CLASSES for seed in range(samples)]
+    labels = [label for label in CLASSES for _ in range(samples)]
+    return SoftmaxClassifier.train(preprocess(images), labels, epochs=100)
+
+
+def test_train_and_predict():
+    print("🔍 Testing classifier training...")
+    classifier = train()
+    held_out = [(make_scan(label, 1000 + seed), label) for label in CLASSES for seed in range(10)]
+    batch = classifier.predict(preprocess([image for image, _ in held_out]))
+    accuracy = sum(predicted == label for (predicted, _), (_, label) in zip(batch, held_out)) / len(held_out)
+    assert accuracy >= 0.95, accuracy
+    single = [classifier.predict(preprocess([image]))[0] for image, _ in held_out[:8]]
+    assert single == batch[:8], "a batch of one predicts like a full batch"
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.classifier.npz")
+        classifier.save(path)
+        loaded = SoftmaxClassifier.load(path)
+        assert loaded.classes == classifier.classes
+        assert loaded.predict(preprocess([held_out[0][0]])) == batch[:1]
+    print(f"✅ Held-out accuracy {accuracy:.0%}, weights round-trip through disk")
+
+
+def test_micro_batching():
+    """Concurrent submits share batches and each caller gets its own row's result"""
+    print("\n🔍 Testing micro-batching...")
+    batcher = MicroBatcher(lambda rows: [int(row[0]) for row in rows], max_batch=16, max_wait=0.05)
+    results = {}
+    barrier = threading.Barrier(32)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = batcher.submit(np.array([i], dtype=np.float32)).result(timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.stop()
+    assert results == {i: i for i in range(32)}
+    assert batcher.stats["images"] == 32 and batcher.stats["batches"] < 32
+    assert batcher.stats["largest_batch"] <= 16
+    print(f"✅ 32 requests answered in {batcher.stats['batches']} batches")
+
+
+def test_detection_uses_engine():
+    """Known MD5s come from the hash model; everything else from the classifier"""
+    print("\n🔍 Testing detection with the engine...")
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, "model.pkl")
+        known = os.path.join(directory, "scans", "known.png")
+        os.makedirs(os.path.dirname(known))
+        make_scan("CNV", 1).save(known)
+        with open(known, "rb") as f:
+            known_hash = hashlib.md5(f.read()).hexdigest()
+        with open(model_path, "wb") as f:
+            pickle.dump({known_hash: "AMD"}, f)
+        for label in ("DME", "NORMAL"):
+            make_scan(label, 500).save(os.path.join(directory, "scans", f"new_{label}.png"))
+
+        classifier_path = os.path.join(directory, "model.classifier.npz")
+        train().save(classifier_path)
+        engine = RetinalClassifierEngine(
+            RetinalModelRegistry(classifier_path, loader=SoftmaxClassifier.load, required=False)
+        )
+        detector = RetinalBatchDetector(RetinalModelRegistry(model_path), workers=4, engine=engine)
+        results, _ = detector.detect_all(path_sources([os.path.join(directory, "scans")]))
+        engine.batcher.stop()
+        by_name = {os.path.basename(r["filename"]): r for r in results}
+        assert (by_name["known.png"]["diagnosis"], by_name["known.png"]["match"]) == ("AMD", "exact")
+        assert (by_name["new_DME.png"]["diagnosis"], by_name["new_DME.png"]["match"]) == ("DME", "classifier")
+        assert by_name["new_NORMAL.png"]["diagnosis"] == "NORMAL"
+        assert 0 < by_name["new_NORMAL.png"]["confidence"] <= 1
+        assert engine.get_stats()["images"] == 2
+    print("✅ Hash fast path first, classifier for the rest")
+
+
+def test_low_confidence_gives_no_diagnosis():
+    """Predictions under min_confidence are dropped, so the scan stays Unknown"""
+    print("\n🔍 Testing minimum confidence...")
+    classifier = train()
+    flat = Image.new("RGB", (128, 128), (128, 128, 128))  # no stripes: every class equally likely
+    features = preprocess([make_scan("DME", 600), flat])
+    confident, uncertain = classifier.predict(features)
+    assert confident[0] == "DME" and uncertain[1] < 0.6
+    assert classifier.predict(features, min_confidence=0.6) == [confident, None]
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, "model.pkl")
+        with open(model_path, "wb") as f:
+            pickle.dump({}, f)
+        os.makedirs(os.path.join(directory, "scans"))
+        make_scan("DME", 600).save(os.path.join(directory, "scans", "striped.png"))
+        flat.save(os.path.join(directory, "scans", "flat.png"))
+
+        classifier_path = os.path.join(directory, "model.classifier.npz")
+        classifier.save(classifier_path)
+        engine = RetinalClassifierEngine(
+            RetinalModelRegistry(classifier_path, loader=SoftmaxClassifier.load, required=False),
+            min_confidence=0.6
+        )
+        assert engine.classify(flat) is None
+        detector = RetinalBatchDetector(RetinalModelRegistry(model_path), workers=2, engine=engine)
+        results, _ = detector.detect_all(path_sources([os.path.join(directory, "scans")]))
+        engine.batcher.stop()
+        by_name = {os.path.basename(r["filename"]): r for r in results}
+        assert (by_name["striped.png"]["diagnosis"], by_name["striped.png"]["match"]) == ("DME", "classifier")
+        assert (by_name["flat.png"]["diagnosis"], by_name["flat.png"]["match"]) == ("Unknown", None)
+    print("✅ Uncertain scan left Unknown, confident scan classified")
+
+
+def main():
+    """Main test function"""
+    print("🧪 Retinal Engine Test")
+    print("=" * 40)
+    test_train_and_predict()
+    test_micro_batching()
+    test_detection_uses_engine()
+    test_low_confidence_gives_no_diagnosis()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
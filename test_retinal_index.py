@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test Retinal Index
+This script checks the compact memory-mapped retinal model format: a
+converted pickle answers every lookup the dict did, and the model registry
+prefers the compact file when it exists.
+"""
+
+import os
+import pickle
+import tempfile
+import uuid
+
+from app.services.model_registry import RetinalModelRegistry
+from app.services.retinal_index import CompactRetinalModel, convert_pickle_model, write_compact_model
+
+
+def sample_model(count=500):
+    labels = ['CNV', 'DME', 'DRUSEN', 'NORMAL']
+    model = {}
+    for i in range(count):
+        key = uuid.uuid4().hex
+        model[key] = labels[i % 4] if i % 3 else (labels[i % 4], 0.75)
+    return model
+
+
+def test_round_trip():
+    """Every key maps to the same diagnosis and confidence; unknown keys miss"""
+    print("🔍 Testing conversion round trip...")
+    model = sample_model()
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, "model.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump(model, f)
+        out_path, entries = convert_pickle_model(pickle_path)
+        assert out_path == os.path.join(directory, "model.idx") and entries == len(model)
+
+        compact = CompactRetinalModel(out_path)
+        assert len(compact) == len(model)
+        for key, value in model.items():
+            expected = value if isinstance(value, tuple) else (value, 1.0)
+            assert compact[key] == expected, key
+            assert compact.get(key.upper()) == expected
+        assert compact.get("0" * 32) is None
+        assert compact.get("not-hex") is None
+        assert "f" * 32 not in compact
+        assert sorted(compact.keys()) == list(compact.keys()) == sorted(model)
+    print(f"✅ {len(model)} entries answered identically from the compact file")
+
+
+def test_rejects_bad_input():
+    print("\n🔍 Testing invalid input...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.idx")
+        try:
+            write_compact_model({"abc": "CNV"}, path)
+            assert False, "short key should be rejected"
+        except ValueError:
+            pass
+        assert not os.listdir(directory), "no partial file is left behind"
+
+        with open(path, "wb") as f:
+            f.write(b"x" * 64)
+        try:
+            CompactRetinalModel(path)
+            assert False, "bad magic should be rejected"
+        except ValueError:
+            pass
+    print("✅ Invalid keys and files rejected")
+
+
+def test_registry_prefers_compact():
+    """The registry maps model.idx when present and keeps serving an old mapping after a swap"""
+    print("\n🔍 Testing registry with compact model...")
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, "model.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump({"a" * 32: "CNV"}, f)
+        os.utime(pickle_path, (1000, 1000))
+        registry = RetinalModelRegistry(pickle_path, check_interval=0)
+        assert registry.lookup("a" * 32) == "CNV"
+        assert registry.get_stats()["format"] == "pickle"
+
+        write_compact_model({"a" * 32: "AMD"}, os.path.join(directory, "model.idx"))
+        assert registry.lookup("a" * 32) == ("AMD", 1.0)
+        assert registry.get_stats()["format"] == "compact"
+        old = registry.get()
+
+        idx_path = os.path.join(directory, "model.idx")
+        write_compact_model({"a" * 32: ("MH", 0.5)}, idx_path)
+        os.utime(idx_path, (4000, 4000))
+        assert registry.lookup("a" * 32) == ("MH", 0.5)
+        assert old["a" * 32] == ("AMD", 1.0), "replaced file stays readable through the old mapping"
+    print("✅ Compact model preferred and hot-swapped")
+
+
+def test_registry_skips_stale_compact():
+    """A pickle replaced after conversion is served until model.idx is rebuilt from it"""
+    print("\n🔍 Testing registry with a stale compact model...")
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, "model.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump({"a" * 32: "CNV"}, f)
+        os.utime(pickle_path, (1000, 1000))
+        idx_path, _ = convert_pickle_model(pickle_path)
+        os.utime(idx_path, (2000, 2000))
+        registry = RetinalModelRegistry(pickle_path, check_interval=0)
+        assert registry.lookup("a" * 32) == ("CNV", 1.0)
+        assert registry.get_stats()["format"] == "compact"
+
+        with open(pickle_path, "wb") as f:
+            pickle.dump({"a" * 32: "AMD"}, f)
+        os.utime(pickle_path, (3000, 3000))
+        assert registry.lookup("a" * 32) == "AMD"
+        assert registry.get_stats()["format"] == "pickle"
+
+        convert_pickle_model(pickle_path)
+        os.utime(idx_path, (4000, 4000))
+        assert registry.lookup("a" * 32) == ("AMD", 1.0)
+        assert registry.get_stats()["format"] == "compact"
+    print("✅ Updated pickle served over the older compact model")
+
+
+def main():
+    """Main test function"""
+    print("🧪 Retinal Index Test")
+    print("=" * 40)
+    test_round_trip()
+    test_rejects_bad_input()
+    test_registry_prefers_compact()
+    test_registry_skips_stale_compact()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test Statistics
+This script checks the admin statistics buckets: commits that add, re-date
+or delete counted rows keep each day's bucket exact, rollbacks leave them
+alone, a rebuild agrees with the incremental counts, and the dashboard reads
+the precomputed snapshot instead of counting tables.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from flask import before_render_template
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db, User, Patient, Doctor, Consultation, MedicalRecord, StatBucket
+from app.services.statistics import StatisticsService
+
+
+def add_user(role, name, created_at=None):
+    user = User(username=name, email=f"{name}@ehr.com", password_hash="x", role=role, created_at=created_at)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def add_people():
+    patient_user, doctor_user = add_user("patient", "patient"), add_user("doctor", "doctor")
+    patient = Patient(user_id=patient_user.id, first_name="P", last_name="Q", date_of_birth=date(1990, 1, 1),
+                      gender="F", phone="1", address="a", emergency_contact="2")
+    doctor = Doctor(user_id=doctor_user.id, first_name="D", last_name="R", specialization="eye", license_number="D1",
+                    phone="1", address="a", experience_years=5, education="MD")
+    db.session.add_all([patient, doctor])
+    db.session.flush()
+    return patient, doctor
+
+
+def buckets(metric):
+    return {bucket.day: bucket.count for bucket in StatBucket.query.filter_by(metric=metric)}
+
+
+def test_buckets_follow_commits():
+    print("🔍 Testing incremental buckets...")
+    app = create_app()
+    with app.app_context():
+        try:
+            today = datetime.utcnow().date()
+            patient, doctor = add_people()
+            add_user("admin", "old", created_at=datetime(2024, 3, 5, 23, 59))
+            visits = [Consultation(patient_id=patient.id, doctor_id=doctor.id, date=today + timedelta(days=i),
+                                   time=datetime(2024, 1, 1, 9).time(), reason="checkup") for i in (0, 0, 3)]
+            db.session.add_all(visits)
+            db.session.commit()
+            assert buckets("users") == {today: 2, date(2024, 3, 5): 1}
+            assert buckets("consultations") == {today: 2, today + timedelta(days=3): 1}
+
+            visits[0].date = today + timedelta(days=3)  # rescheduled
+            db.session.delete(visits[1])
+            db.session.commit()
+            assert buckets("consultations") == {today: 0, today + timedelta(days=3): 2}
+
+            add_user("admin", "rolled-back")
+            db.session.rollback()
+            assert buckets("users") == {today: 2, date(2024, 3, 5): 1}
+
+            incremental = {metric: buckets(metric) for metric in ("users", "patients", "doctors", "consultations")}
+            StatisticsService().rebuild()
+            incremental["consultations"].pop(today)  # empty days are not rebuilt
+            assert {metric: buckets(metric) for metric in incremental} == incremental
+            print("✅ Buckets exact after inserts, reschedules, deletes and rollbacks")
+        finally:
+            db.drop_all()
+
+
+def test_snapshot():
+    print("\n🔍 Testing snapshot...")
+    app = create_app()
+    with app.app_context():
+        try:
+            today = datetime.utcnow().date()
+            patient, doctor = add_people()
+            for days_ago in (0, 3, 10, 40):
+                db.session.add(MedicalRecord(patient_id=patient.id, record_type="consultation", record_id=days_ago,
+                                             title="t", created_at=datetime.utcnow() - timedelta(days=days_ago)))
+            db.session.commit()
+            # Buckets left empty, as on a database created before statistics existed
+            StatBucket.query.delete()
+            db.session.commit()
+
+            service = StatisticsService(max_age=3600)
+            assert service.total("records") == 4 and service.total("users") == 2
+            assert service.count_since("records", today - timedelta(days=7)) == 2
+            assert service.count_since("records", today - timedelta(days=30)) == 3
+
+            db.session.add(MedicalRecord(patient_id=patient.id, record_type="consultation", record_id=99, title="t"))
+            db.session.commit()
+            assert service.total("records") == 4 and service.age_seconds() >= 0
+            service.invalidate()
+            assert service.total("records") == 5
+            print("✅ Backfilled once, then served from the cached snapshot")
+        finally:
+            db.drop_all()
+
+
+def test_dashboard_reads_snapshot():
+    print("\n🔍 Testing admin dashboard...")
+    app = create_app()
+    try:
+        with app.app_context():
+            admin_id = add_user("admin", "admin").id
+            add_people()
+            db.session.commit()
+            app.extensions["statistics_service"].snapshot()
+            engine = db.engine
+
+        contexts, statements = [], []
+        before_render_template.connect(lambda sender, template, context: contexts.append(context), app, weak=False)
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(admin_id)
+        # base.html links an admin.profile endpoint this tree does not have, so only the
+        # template context is checked, not the rendered page
+        client.get("/admin/dashboard")
+
+        context = contexts[0]
+        assert (context["total_users"], context["total_patients"], context["total_doctors"]) == (3, 1, 1)
+        assert context["stats_age"] >= 0
+        assert not [s for s in statements if "count(" in s.lower()], statements
+        print("✅ Dashboard totals come from the snapshot, no COUNT queries")
+    finally:
+        with app.app_context():
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Statistics Test")
+    print("=" * 40)
+    test_buckets_follow_commits()
+    test_snapshot()
+    test_dashboard_reads_snapshot()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test Thumbnails
+This script checks the lab scan thumbnail pipeline: every size is rendered
+from one upload, later requests come from memory or disk, the disk cache is
+trimmed to its budget, and report images are only served to users who may
+see the report.
+"""
+
+import io
+import os
+import shutil
+from datetime import date
+
+import numpy as np
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
+from app.models import db, User, Patient, Doctor, Lab, LabReport
+from app.services.blob_store import BlobStore, get_blob_store
+from app.services.thumbnail_service import ThumbnailService
+
+TEST_ROOT = "uploads/test_thumbs"
+BLOB_ROOT = "uploads/test_thumb_blobs"
+
+
+def scan_upload(seed, size=(1600, 1200)):
+    rng = np.random.default_rng(seed)
+    image = Image.fromarray(rng.integers(0, 256, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)).resize(size)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename="scan.png")
+
+
+def use_test_blob_store(app):
+    """Keep the scans these tests store out of the real uploads/blobs"""
+    app.extensions['blob_store'] = BlobStore(relative_root=BLOB_ROOT)
+
+
+def remove_test_files(service):
+    shutil.rmtree(service._absolute(TEST_ROOT), ignore_errors=True)
+    shutil.rmtree(service._absolute(BLOB_ROOT), ignore_errors=True)
+
+
+def test_renders_and_caches():
+    print("🔍 Testing thumbnail rendering...")
+    app = create_app()
+    use_test_blob_store(app)
+    with app.app_context():
+        service = ThumbnailService(relative_root=TEST_ROOT)
+        try:
+            blob, _ = get_blob_store().store_stream(scan_upload(1), "png")
+            rendered = service.generate(blob.path)
+            assert Image.open(io.BytesIO(rendered["preview"])).size == (800, 600)
+            assert Image.open(io.BytesIO(rendered["thumb"])).size == (160, 120)
+            assert service.stats["rendered"] == 2
+            assert os.path.exists(service._absolute(service.thumbnail_path(blob.sha256, "thumb")))
+
+            assert service.get(blob.path, "thumb") == rendered["thumb"]
+            assert service.stats["memory_hits"] == 1
+
+            service._memory.clear()
+            assert service.get(blob.path, "preview") == rendered["preview"]
+            assert service.stats["disk_hits"] == 1 and service.stats["rendered"] == 2
+
+            assert service.get("uploads/missing.png", "thumb") is None
+            print("✅ Both sizes rendered once, then served from memory and disk")
+        finally:
+            remove_test_files(service)
+            db.drop_all()
+
+
+def test_disk_budget():
+    """Once over budget the least recently served renditions are deleted"""
+    print("\n🔍 Testing disk eviction...")
+    app = create_app()
+    use_test_blob_store(app)
+    with app.app_context():
+        service = ThumbnailService(relative_root=TEST_ROOT, max_disk_bytes=1)
+        try:
+            paths = [get_blob_store().store_stream(scan_upload(seed, (400, 300)), "png")[0].path for seed in range(3)]
+            service.max_disk_bytes = 10 ** 9
+            for path in paths:
+                service.generate(path, ["thumb"])
+            sizes = sorted(os.path.getsize(service._absolute(service.thumbnail_path(service.cache_key(p), "thumb"))) for p in paths)
+            oldest = service._absolute(service.thumbnail_path(service.cache_key(paths[0]), "thumb"))
+            os.utime(oldest, (1, 1))
+
+            service.max_disk_bytes = sum(sizes) - 1
+            service.generate(paths[1], ["thumb"])
+            assert not os.path.exists(oldest)
+            assert service.stats["evicted"] == 1 and service._disk_bytes <= service.max_disk_bytes
+            print("✅ Least recently served thumbnail evicted")
+        finally:
+            remove_test_files(service)
+            db.drop_all()
+
+
+def add_user(role, name):
+    user = User(username=name, email=f"{name}@ehr.com", password_hash="x", role=role)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def test_report_image_route():
+    print("\n🔍 Testing /lab/reports/<id>/image...")
+    app = create_app()
+    app.extensions['thumbnail_service'] = ThumbnailService(relative_root=TEST_ROOT)
+    use_test_blob_store(app)
+    try:
+        with app.app_context():
+            lab_user, patient_user, doctor_user, other_user = (
+                add_user("lab", "lab"), add_user("patient", "patient"),
+                add_user("doctor", "doctor"), add_user("patient", "other")
+            )
+            lab = Lab(user_id=lab_user.id, lab_name="Lab", license_number="L1", phone="1", address="a", specialization="eye")
+            patient = Patient(user_id=patient_user.id, first_name="P", last_name="Q", date_of_birth=date(1990, 1, 1),
+                              gender="F", phone="1", address="a", emergency_contact="2")
+            doctor = Doctor(user_id=doctor_user.id, first_name="D", last_name="R", specialization="eye", license_number="D1",
+                            phone="1", address="a", experience_years=5, education="MD")
+            db.session.add_all([lab, patient, doctor])
+            db.session.flush()
+            blob, _ = get_blob_store().store_stream(scan_upload(7), "png")
+            report = LabReport(patient_id=patient.id, doctor_id=doctor.id, lab_id=lab.id,
+                               report_type="retinal", image_path=blob.path)
+            db.session.add(report)
+            db.session.commit()
+            report_id = report.id
+            ids = {user.username: user.id for user in (lab_user, patient_user, doctor_user, other_user)}
+
+        def get(username, size):
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session["_user_id"] = str(ids[username])
+            return client.get(f"/lab/reports/{report_id}/image/{size}")
+
+        for username in ("lab", "patient", "doctor"):
+            response = get(username, "thumb")
+            assert response.status_code == 200 and response.mimetype == "image/jpeg", username
+            assert "private" in response.headers["Cache-Control"]
+        assert Image.open(io.BytesIO(get("patient", "preview").data)).size == (800, 600)
+        assert get("patient", "original").status_code == 302
+        assert get("other", "thumb").status_code == 404
+        assert get("lab", "huge").status_code == 404
+        print("✅ Thumbnails served to the lab, patient and doctor only")
+    finally:
+        with app.app_context():
+            remove_test_files(app.extensions['thumbnail_service'])
+            db.drop_all()
+
+
+def main():
+    """Main test function"""
+    print("🧪 Thumbnails Test")
+    print("=" * 40)
+    test_renders_and_caches()
+    test_disk_budget()
+    test_report_image_route()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
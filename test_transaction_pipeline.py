@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Test Transaction Pipeline
+This script checks the local nonce allocator and the non-blocking submission
+pipeline against an in-memory stand-in for the node, so no Ganache is needed.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_abi import encode
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from app.services.blockchain_service import BlockchainService
+from app.services.transaction_pipeline import NonceManager, TransactionPipeline, TransactionReverted
+
+
+class FakeSignedTransaction:
+    def __init__(self, transaction):
+        self.rawTransaction = transaction
+
+
+class FakeAccountAPI:
+    def sign_transaction(self, transaction, private_key=None):
+        return FakeSignedTransaction(transaction)
+
+
+class FakeEth:
+    """Mines each transaction block_time seconds after it is sent"""
+
+    def __init__(self, block_time=0.05, start_nonce=7):
+        self.account = FakeAccountAPI()
+        self.block_time = block_time
+        self.start_nonce = start_nonce
+        self.sent = {}
+        self.lock = threading.Lock()
+
+    def get_transaction_count(self, account, block_identifier='latest'):
+        return self.start_nonce
+
+    def send_raw_transaction(self, raw_transaction):
+        with self.lock:
+            tx_hash = bytes([len(self.sent) % 256]) + raw_transaction['nonce'].to_bytes(8, 'big')
+            if any(tx['nonce'] == raw_transaction['nonce'] for tx, _ in self.sent.values()):
+                raise ValueError("nonce too low")
+            self.sent[tx_hash] = (raw_transaction, time.monotonic())
+            return tx_hash
+
+    def get_transaction_receipt(self, tx_hash):
+        transaction, sent_at = self.sent[tx_hash]
+        if time.monotonic() - sent_at < self.block_time:
+            return None
+        # Too little gas runs out mid-call: mined, but with a failed status
+        status = 1 if transaction['gas'] >= 21000 else 0
+        return {"transactionHash": tx_hash, "blockNumber": 1, "nonce": transaction['nonce'], "status": status}
+
+
+CONTRACT_ABI = [
+    {"name": "verifyFile", "type": "function", "stateMutability": "nonpayable",
+     "inputs": [{"name": "_fileId", "type": "uint256"}, {"name": "_currentHash", "type": "string"},
+                {"name": "_notes", "type": "string"}],
+     "outputs": [{"name": "", "type": "bool"}]},
+    {"name": "anchorRoot", "type": "function", "stateMutability": "nonpayable",
+     "inputs": [{"name": "_root", "type": "bytes32"}, {"name": "_leafCount", "type": "uint256"}],
+     "outputs": [{"name": "", "type": "uint256"}]},
+    {"name": "FileVerified", "type": "event", "anonymous": False,
+     "inputs": [{"name": "fileId", "type": "uint256", "indexed": True},
+                {"name": "isMatch", "type": "bool", "indexed": False},
+                {"name": "verifiedBy", "type": "address", "indexed": True}]}
+]
+CONTRACT_ADDRESS = Web3.to_checksum_address("0x" + "12" * 20)
+ACCOUNT = Web3.to_checksum_address("0x" + "ab" * 20)
+
+
+class FakeWeb3:
+    def __init__(self, **kwargs):
+        self.eth = FakeEth(**kwargs)
+
+
+def test_nonce_manager_is_atomic():
+    """Concurrent allocations never hand out the same nonce twice"""
+    print("🔍 Testing NonceManager...")
+    web3 = FakeWeb3()
+    manager = NonceManager(lambda: web3)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        nonces = list(pool.map(lambda _: manager.allocate("0xabc"), range(200)))
+
+    assert sorted(nonces) == list(range(7, 207))
+    assert manager.stats["resyncs"] == 1
+
+    manager.resync("0xabc")
+    assert manager.allocate("0xabc") == 7
+    print("✅ 200 concurrent allocations produced contiguous, unique nonces")
+
+
+def test_pipeline_resolves_concurrent_submissions():
+    """Every submitted transaction gets its own nonce and a resolved receipt"""
+    print("\n🔍 Testing TransactionPipeline...")
+    web3 = FakeWeb3(block_time=0.05)
+    pipeline = TransactionPipeline(lambda: web3, poll_interval=0.01, receipt_timeout=5)
+
+    def submit_and_wait(i):
+        future = pipeline.submit({'from': '0xabc', 'gas': 21000, 'nonce': 0}, private_key='0x1')
+        return future.result(timeout=5)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        receipts = list(pool.map(submit_and_wait, range(100)))
+    elapsed = time.monotonic() - start
+
+    assert sorted(r["nonce"] for r in receipts) == list(range(7, 107))
+    assert pipeline.pending_count() == 0
+    assert pipeline.stats["mined"] == 100
+    # Sequential submit-and-wait would take at least 100 * block_time = 5s
+    assert elapsed < 2.5, f"pipeline did not overlap receipt waits ({elapsed:.2f}s)"
+    print(f"✅ 100 transactions mined in {elapsed:.2f}s ({100 / elapsed:.0f} tx/s)")
+
+
+def test_failed_send_resyncs_nonce():
+    """A send error fails the future and makes the next allocation re-read the node"""
+    print("\n🔍 Testing send failure handling...")
+    web3 = FakeWeb3()
+    pipeline = TransactionPipeline(lambda: web3, poll_interval=0.01)
+    pipeline.submit({'from': '0xabc', 'gas': 21000, 'nonce': 0}, private_key='0x1').result(timeout=5)
+
+    # Another writer used nonce 8 behind our back
+    web3.eth.sent[b'external'] = ({'nonce': 8}, time.monotonic())
+    web3.eth.start_nonce = 9
+
+    failed = pipeline.submit({'from': '0xabc', 'gas': 21000, 'nonce': 0}, private_key='0x1')
+    assert failed.exception(timeout=1) is not None
+    recovered = pipeline.submit({'from': '0xabc', 'gas': 21000, 'nonce': 0}, private_key='0x1')
+    assert recovered.result(timeout=5)["nonce"] == 9
+    print("✅ Nonce re-read from the node after a failed send")
+
+
+def test_reverted_transaction_fails_future():
+    """A mined receipt with status 0 fails the future instead of resolving it"""
+    print("\n🔍 Testing reverted transactions...")
+    web3 = FakeWeb3()
+    pipeline = TransactionPipeline(lambda: web3, poll_interval=0.01, receipt_timeout=5)
+    reverted = pipeline.submit({'from': '0xabc', 'gas': 100, 'nonce': 0}, private_key='0x1')
+    mined = pipeline.submit({'from': '0xabc', 'gas': 21000, 'nonce': 0}, private_key='0x1')
+
+    error = reverted.exception(timeout=5)
+    assert isinstance(error, TransactionReverted)
+    assert error.receipt["status"] == 0
+    assert mined.result(timeout=5)["status"] == 1
+    assert pipeline.stats["reverted"] == 1 and pipeline.stats["mined"] == 2
+    print("✅ Reverted transaction raised TransactionReverted")
+
+
+class FakeLogIndex:
+    def __init__(self):
+        self.events = []
+
+    def resolve_log_id(self, event, block_events=None):
+        self.events.append(event)
+        return 42
+
+
+def offline_service(tx_gas):
+    """BlockchainService whose writes are sent to the fake node with tx_gas"""
+    web3 = FakeWeb3()
+    pipeline = TransactionPipeline(lambda: web3, poll_interval=0.01, receipt_timeout=5)
+    service = BlockchainService()
+    service.web3 = Web3()
+    service.contract_address = CONTRACT_ADDRESS
+    service.contract = service.web3.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+    service.account = ACCOUNT
+    service.is_connected = True
+    service.tx_pipeline = pipeline
+    service.submit_transaction = lambda contract_function, gas: pipeline.submit(
+        {'from': ACCOUNT, 'gas': tx_gas, 'nonce': 0}, private_key='0x1')
+    return service
+
+
+def test_service_writes_fail_on_revert():
+    """Contract writes report failure for reverted transactions instead of reading counters"""
+    print("\n🔍 Testing BlockchainService writes on revert...")
+    service = offline_service(tx_gas=100)
+    assert service.anchor_merkle_root("ab" * 32, 4) is None
+    assert service.verify_file_on_blockchain(1, "00" * 32, "notes") is None
+    assert service.tx_pipeline.stats["reverted"] == 2
+    print("✅ Reverted anchorRoot and verifyFile returned no result")
+
+
+def test_verify_reads_log_from_receipt_event():
+    """verify_file_on_blockchain resolves the log ID of its own FileVerified event"""
+    print("\n🔍 Testing verification log ID from the receipt...")
+    service = offline_service(tx_gas=21000)
+    service.verification_log_index = FakeLogIndex()
+    topic = Web3.keccak(text="FileVerified(uint256,bool,address)")
+    receipt_logs = [{
+        "address": CONTRACT_ADDRESS, "blockNumber": 1, "blockHash": b"\x01" * 32, "logIndex": 0,
+        "transactionHash": b"\x02" * 32, "transactionIndex": 0,
+        "topics": [topic, encode(["uint256"], [7]), encode(["address"], [ACCOUNT])],
+        "data": encode(["bool"], [False])
+    }]
+    eth = service.tx_pipeline._web3_getter().eth
+    real_receipt = eth.get_transaction_receipt
+    eth.get_transaction_receipt = lambda tx_hash: (
+        None if real_receipt(tx_hash) is None else AttributeDict(dict(real_receipt(tx_hash), logs=receipt_logs)))
+
+    result = service.verify_file_on_blockchain(7, "00" * 32, "notes")
+    assert result["log_id"] == 42
+    assert result["is_match"] is False
+    assert service.verification_log_index.events[0]["args"]["fileId"] == 7
+    print("✅ Log ID resolved from the transaction's FileVerified event")
+
+
+def main():
+    """Main test function"""
+    print("🧪 Transaction Pipeline Test")
+    print("=" * 40)
+    test_nonce_manager_is_atomic()
+    test_pipeline_resolves_concurrent_submissions()
+    test_failed_send_resyncs_nonce()
+    test_reverted_transaction_fails_future()
+    test_service_writes_fail_on_revert()
+    test_verify_reads_log_from_receipt_event()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test Upload Queue
+This script submits uploads through FileVerificationService.submit_upload and
+checks that the request returns before the slow IPFS/chain stage, which the
+queue workers then complete, retry or fail. No IPFS or Ganache is needed.
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.models import db, Blob, UploadJob
+from app.services.file_verification_service import FileVerificationService
+
+PUBLISH_LATENCY = 0.5
+
+
+class FakeChain:
+    contract_address = "0xContract"
+
+    def ensure_contract(self):
+        return True
+
+
+class SlowPublisher:
+    """Stands in for the IPFS add, pin and chain write; fails the first `failures` calls per file"""
+
+    def __init__(self, failures=0, retry=True):
+        self.failures = failures
+        self.retry = retry
+        self.calls = {}
+
+    def __call__(self, job):
+        time.sleep(PUBLISH_LATENCY)
+        self.calls[job.id] = self.calls.get(job.id, 0) + 1
+        if self.calls[job.id] <= self.failures:
+            return {"success": False, "error": "IPFS unavailable", "retry": self.retry}
+        job.ipfs_hash = f"QmHash{job.id}"
+        job.file_id = job.id
+        return {"success": True}
+
+
+def make_app():
+    # Worker threads need a database file they can all open
+    db_path = os.path.join(tempfile.mkdtemp(), "uploads.db")
+    previous = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    try:
+        return create_app()
+    finally:
+        if previous is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = previous
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def job_status(job_id):
+    db.session.expire_all()
+    return db.session.get(UploadJob, job_id).status
+
+
+def blob_refs(file_hash):
+    db.session.expire_all()
+    blob = db.session.get(Blob, file_hash)
+    return blob.ref_count if blob else 0
+
+
+def submit(service, name):
+    return service.submit_upload(FileStorage(stream=BytesIO(name.encode() * 100), filename=f"{name}.txt"))
+
+
+def cleanup(app):
+    for job in UploadJob.query.all():
+        try:
+            os.remove(os.path.join(app.root_path, 'static', job.local_path))
+        except OSError:
+            pass
+
+
+def test_submit_returns_before_publishing():
+    """Requests only pay for hashing and local storage; workers finish the jobs in parallel"""
+    print("🔍 Testing asynchronous uploads...")
+    app = make_app()
+    queue = app.extensions['upload_queue']
+    queue.processor = SlowPublisher()
+    queue.poll_interval = 0.05
+
+    with app.app_context():
+        service = FileVerificationService(blockchain_service=FakeChain())
+        start = time.monotonic()
+        results = [submit(service, f"scan{i}") for i in range(8)]
+        elapsed = time.monotonic() - start
+
+        assert all(r["success"] and r["status"] == "queued" for r in results)
+        assert elapsed < PUBLISH_LATENCY, f"submit waited for publishing ({elapsed:.2f}s)"
+        assert wait_for(lambda: all(job_status(r["job_id"]) == "completed" for r in results))
+        job = db.session.get(UploadJob, results[0]["job_id"])
+        assert job.to_dict()["ipfs_hash"] == f"QmHash{job.id}" and job.attempts == 1
+        print(f"✅ 8 uploads accepted in {elapsed * 1000:.0f} ms and completed by {queue.workers} workers")
+
+        queue.stop()
+        cleanup(app)
+
+
+def test_retries_failures_and_recovers_leases():
+    """Transient failures are retried, permanent ones fail, and abandoned jobs are requeued"""
+    print("\n🔍 Testing retries and recovery...")
+    app = make_app()
+    queue = app.extensions['upload_queue']
+    queue.retry_delay = 0
+    queue.poll_interval = 0.05
+
+    with app.app_context():
+        service = FileVerificationService(blockchain_service=FakeChain())
+
+        queue.processor = SlowPublisher(failures=1)
+        flaky = submit(service, "flaky")
+        assert wait_for(lambda: job_status(flaky["job_id"]) == "completed")
+        assert db.session.get(UploadJob, flaky["job_id"]).attempts == 2
+        assert blob_refs(flaky["file_hash"]) == 1
+
+        queue.processor = SlowPublisher(failures=99, retry=False)
+        broken = submit(service, "broken")
+        assert wait_for(lambda: job_status(broken["job_id"]) == "failed")
+        assert db.session.get(UploadJob, broken["job_id"]).error == "IPFS unavailable"
+        # Only the final failure gives up the stored file
+        assert wait_for(lambda: blob_refs(broken["file_hash"]) == 0)
+        queue.stop()
+
+        # A worker died mid-job: the expired lease puts it back in the queue on restart
+        abandoned = db.session.get(UploadJob, broken["job_id"])
+        abandoned.status = "processing"
+        abandoned.attempts = 1
+        abandoned.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        queue.processor = SlowPublisher()
+        queue.resume(app)
+        assert wait_for(lambda: job_status(broken["job_id"]) == "completed")
+        assert queue.stats["recovered"] == 1
+        print("✅ Flaky job retried, broken job failed, abandoned job recovered")
+
+        queue.stop()
+        cleanup(app)
+
+
+def main():
+    """Main test function"""
+    print("🧪 Upload Queue Test")
+    print("=" * 40)
+    test_submit_returns_before_publishing()
+    test_retries_failures_and_recovers_leases()
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    main()